@@ -0,0 +1,106 @@
+"""
+Бенчмарк локального извлечения контактов (text_processing.extract_contacts) на корпусе data/.
+
+Измеряет скорость извлечения и согласованность с эталоном — контактами, которые возвращает ChatGPT.
+Эталон читается из JSON-файла вида {"resume1.txt": {"telephone": ..., "email": ..., "telegram": ...}}.
+С флагом --live эталон получается запросом к ChatGPT (как раньше в prepare_summary_request) и сохраняется
+в файл --reference для повторных запусков.
+
+Запуск из корня репозитория:
+    python -m benchmarks.bench_contact_extraction --reference bench_contacts_reference.json [--live]
+"""
+import argparse
+import json
+import os
+import re
+import time
+from moduls.text_processing import CONTACT_KEYS, extract_contacts, parse_chatgpt_response
+
+
+LEGACY_CONTACTS_PROMPT = (
+    "Анализируй предоставленный текст и верни строго JSON-объект с ключами "
+    "\"telephone\", \"email\", \"telegram\". Поля должны содержать предоставленные данные "
+    "или значение \"отсутствует\", если данных нет. Возвращай только JSON.\n\n"
+    "Вот текст для анализа:\n"
+)
+
+
+def load_corpus(folder: str) -> dict:
+    corpus = {}
+    for filename in sorted(os.listdir(folder)):
+        if filename.lower().endswith(".txt"):
+            with open(os.path.join(folder, filename), "r", encoding="utf-8") as f:
+                corpus[filename] = f.read().strip()
+    return corpus
+
+
+def canonical(key: str, value) -> str:
+    """Приводит значение контакта к виду, в котором сравниваются локальный и эталонный результаты."""
+    if not value or str(value).strip().lower() in ["отсутствует", "неизвестно", "null", "none"]:
+        return ""
+    value = str(value).strip().lower()
+    if key == "telephone":
+        digits = re.sub(r"\D", "", value)
+        return "7" + digits[1:] if len(digits) == 11 and digits[0] == "8" else digits
+    if key == "telegram":
+        return value.replace("https://", "").replace("t.me/", "").lstrip("@")
+    return value
+
+
+def build_live_reference(corpus: dict) -> dict:
+    from moduls.gpt_assist import GPTAssistant
+
+    assistant = GPTAssistant()
+    reference = {}
+    for filename, text in corpus.items():
+        started = time.perf_counter()
+        reference[filename] = parse_chatgpt_response(assistant.send_message(LEGACY_CONTACTS_PROMPT + text, caller="benchmark"))
+        reference[filename]["_latency_s"] = time.perf_counter() - started
+    return reference
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--data", default="data")
+    parser.add_argument("--reference", default=None, help="JSON-файл с эталонными контактами от ChatGPT")
+    parser.add_argument("--live", action="store_true", help="получить эталон запросами к ChatGPT")
+    parser.add_argument("--repeat", type=int, default=100)
+    args = parser.parse_args()
+
+    corpus = load_corpus(args.data)
+    started = time.perf_counter()
+    for _ in range(args.repeat):
+        local = {filename: extract_contacts(text) for filename, text in corpus.items()}
+    elapsed = time.perf_counter() - started
+    per_doc_us = elapsed / (args.repeat * len(corpus)) * 1e6
+    print(f"Документов: {len(corpus)}, извлечение: {per_doc_us:.1f} мкс на документ")
+
+    reference = None
+    if args.live:
+        reference = build_live_reference(corpus)
+        if args.reference:
+            with open(args.reference, "w", encoding="utf-8") as f:
+                json.dump(reference, f, ensure_ascii=False, indent=2)
+        latencies = [item["_latency_s"] for item in reference.values()]
+        print(f"ChatGPT: {sum(latencies) / len(latencies) * 1000:.0f} мс на документ")
+
+    elif args.reference and os.path.exists(args.reference):
+        with open(args.reference, "r", encoding="utf-8") as f:
+            reference = json.load(f)
+
+    if reference is None:
+        print("Эталон не задан (--reference/--live), согласованность не измерялась.")
+        return
+
+    for key in CONTACT_KEYS:
+        compared = [name for name in corpus if name in reference]
+        agreed = [name for name in compared
+                  if canonical(key, local[name][key]) == canonical(key, reference[name].get(key))]
+        print(f"{key}: совпадение {len(agreed)}/{len(compared)}")
+        for name in compared:
+            if name not in agreed:
+                print(f"    {name}: локально {local[name][key]!r}, ChatGPT {reference[name].get(key)!r}")
+
+
+if __name__ == "__main__":
+    main()
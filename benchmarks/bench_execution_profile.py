@@ -0,0 +1,79 @@
+"""
+Бенчмарк профиля выполнения (moduls.execution_profile): пропускная способность одновременно работающих
+этапов с потоками по умолчанию и с бюджетами профиля.
+
+Каждый этап пакетной загрузки моделируется отдельным процессом, который выполняет фиксированный объём
+матричных умножений (BLAS, как в torch и CTranslate2). В режиме "по умолчанию" каждый процесс, как и
+библиотеки пайплайна, занимает все ядра, что приводит к переподписке; в режиме "профиль" число потоков
+каждого процесса ограничено бюджетом его этапа. Объём работы этапа пропорционален его весу в профиле.
+
+Запуск из корня репозитория:
+    python -m benchmarks.bench_execution_profile [--units 40] [--size 512] [--workers transcribe=1,diarize=1]
+"""
+import argparse
+import os
+import subprocess
+import sys
+import time
+from moduls.batch_ingest import parse_workers
+from moduls.execution_profile import ExecutionProfile
+
+THREAD_VARIABLES = ("OMP_NUM_THREADS", "MKL_NUM_THREADS", "OPENBLAS_NUM_THREADS")
+# Этапы, нагружающие CPU (summary ждёт ответа ChatGPT и ядер не занимает).
+CPU_STAGES = ("audio", "separate", "transcribe", "diarize", "punctuate")
+
+
+def run_worker(units: int, size: int) -> None:
+    import numpy as np
+
+    rng = np.random.default_rng(0)
+    a, b = rng.random((size, size), dtype=np.float32), rng.random((size, size), dtype=np.float32)
+    for _ in range(units):
+        a = (a @ b) / size
+
+
+def run_stages(profile: ExecutionProfile, workers: dict, units: int, size: int) -> float:
+    processes = []
+    started = time.perf_counter()
+    for stage in CPU_STAGES:
+        for _ in range(workers.get(stage, 0)):
+            env = dict(os.environ)
+            for name in THREAD_VARIABLES:
+                env.pop(name, None)
+                if profile.enabled:
+                    env[name] = str(profile.threads(stage))
+            stage_units = max(int(units * profile.weights[stage] / max(profile.weights.values())), 1)
+            processes.append(subprocess.Popen(
+                [sys.executable, "-m", "benchmarks.bench_execution_profile", "--worker", str(stage_units),
+                 "--size", str(size)], env=env,
+            ))
+    for process in processes:
+        process.wait()
+    return time.perf_counter() - started
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--units", type=int, default=40, help="Объём работы самого тяжёлого этапа")
+    parser.add_argument("--size", type=int, default=512, help="Размер матриц")
+    parser.add_argument("--workers", default="", help="Потоки этапов в формате INGEST_WORKERS")
+    parser.add_argument("--repeats", type=int, default=3, help="Количество повторов каждого режима")
+    parser.add_argument("--worker", type=int, help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    if args.worker is not None:
+        run_worker(args.worker, args.size)
+        return
+
+    workers = parse_workers(args.workers)
+    profiled = ExecutionProfile(stage_workers=workers, enabled=True)
+    print(profiled.describe())
+    for name, profile in (("по умолчанию", ExecutionProfile(stage_workers=workers, enabled=False)),
+                          ("профиль", profiled)):
+        timings = [run_stages(profile, workers, args.units, args.size) for _ in range(args.repeats)]
+        best = min(timings)
+        print(f"{name:>14}: лучшее время {best:.2f} с, пропускная способность {3600 / best:.0f} партий/час")
+
+
+if __name__ == "__main__":
+    main()
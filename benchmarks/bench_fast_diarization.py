@@ -0,0 +1,83 @@
+"""
+Бенчмарк быстрого уровня диаризации: NeMo MSDD против fast_diarization.diarize_fast
+(Silero VAD + эмбеддинги TitaNet + агломеративная кластеризация) на одной записи.
+
+Для каждого уровня выводятся время, RTF (время / длительность записи) и число спикеров, для быстрого
+уровня — доля совпадения с MSDD: кадры по 10 мс, в которых хотя бы один уровень видит речь,
+сравниваются после оптимального сопоставления номеров спикеров (венгерский алгоритм).
+Модели загружаются до замера (прогревом на первых секундах записи), время загрузки в результат не входит.
+
+Запуск из корня репозитория:
+    python -m benchmarks.bench_fast_diarization --audio запись.wav [--device cpu] [--num-speakers 0]
+"""
+import argparse
+import time
+import numpy as np
+from scipy.optimize import linear_sum_assignment
+from moduls import video_processing as vp
+from moduls.audio_stream import SAMPLE_RATE, extract_audio_pcm
+from moduls.fast_diarization import diarize_fast
+from moduls.workspace import job_workspace
+
+FRAME_MS = 10
+WARMUP_SECONDS = 30
+
+
+def frame_labels(turns: np.ndarray, frames: int) -> np.ndarray:
+    """Номер спикера каждого кадра (-1 — тишина)."""
+    labels = np.full(frames, -1, dtype=np.int64)
+    for start, end, speaker in turns[["start", "end", "speaker"]].tolist():
+        labels[start // FRAME_MS:end // FRAME_MS] = speaker
+    return labels
+
+
+def agreement(reference: np.ndarray, hypothesis: np.ndarray, frames: int) -> float:
+    ref, hyp = frame_labels(reference, frames), frame_labels(hypothesis, frames)
+    voiced = (ref >= 0) | (hyp >= 0)
+    if not voiced.any():
+        return 1.0
+    # Матрица совпадений кадров (номер спикера + 1, чтобы тишина попала в нулевую строку/столбец)
+    counts = np.zeros((ref.max() + 2, hyp.max() + 2), dtype=np.int64)
+    np.add.at(counts, (ref[voiced] + 1, hyp[voiced] + 1), 1)
+    rows, cols = linear_sum_assignment(-counts[1:, 1:])
+    return counts[1:, 1:][rows, cols].sum() / voiced.sum()
+
+
+def run_msdd(audio: np.ndarray, device: str):
+    with job_workspace("bench") as temp_path:
+        vp.diarize_waveform(audio[:WARMUP_SECONDS * SAMPLE_RATE], temp_path, device, "msdd")
+        started = time.perf_counter()
+        turns = vp.read_rttm(vp.diarize_waveform(audio, temp_path, device, "msdd"))
+        return turns, time.perf_counter() - started
+
+
+def run_fast(audio: np.ndarray, device: str, num_speakers: int):
+    diarize_fast(audio[:WARMUP_SECONDS * SAMPLE_RATE], device, num_speakers)
+    started = time.perf_counter()
+    turns = diarize_fast(audio, device, num_speakers)
+    return turns, time.perf_counter() - started
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--audio", required=True, help="Аудио- или видеофайл с записью разговора")
+    parser.add_argument("--device", default="cpu", help="Устройство для моделей")
+    parser.add_argument("--num-speakers", type=int, default=0, help="Подсказка о числе спикеров для быстрого уровня")
+    args = parser.parse_args()
+
+    audio = extract_audio_pcm(args.audio)
+    duration = len(audio) / SAMPLE_RATE
+    frames = int(duration * 1000) // FRAME_MS + 1
+
+    reference, seconds = run_msdd(audio, args.device)
+    print(f"Длительность записи: {duration:.0f} с")
+    print(f"{'уровень':>8} {'время, с':>10} {'RTF':>8} {'спикеров':>9} {'совпадение':>11}")
+    print(f"{'msdd':>8} {seconds:>10.1f} {seconds / duration:>8.3f} {len(np.unique(reference['speaker'])):>9} "
+          f"{'—':>11}")
+    turns, seconds = run_fast(audio, args.device, args.num_speakers)
+    print(f"{'fast':>8} {seconds:>10.1f} {seconds / duration:>8.3f} {len(np.unique(turns['speaker'])):>9} "
+          f"{agreement(reference, turns, frames):>11.1%}")
+
+
+if __name__ == "__main__":
+    main()
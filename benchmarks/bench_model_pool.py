@@ -0,0 +1,78 @@
+"""
+Бенчмарк резидентного пула моделей (moduls.model_pool): время повторных извлечений в одном процессе
+с пулом и без него (MODEL_POOL_ENABLED=0, прежнее поведение — загрузка моделей на каждый вызов).
+
+По умолчанию замеряется только транскрибация faster-whisper на синтетическом клипе (ffmpeg, lavfi).
+С --video выполняется полный пайплайн video_processing.extraction_text (Whisper, NeMo MSDD, пунктуация)
+без кэша артефактов, чтобы каждый прогон действительно обращался к моделям.
+
+Запуск из корня репозитория:
+    python -m benchmarks.bench_model_pool [--model medium] [--runs 3] [--seconds 30] [--video clip.mp4]
+"""
+import argparse
+import os
+import sys
+import tempfile
+import time
+from moduls.audio_stream import SAMPLE_RATE, extract_audio_pcm, find_ffmpeg
+from moduls.model_pool import ModelPool
+
+
+def synthetic_clip(seconds: float) -> str:
+    import subprocess
+
+    path = os.path.join(tempfile.mkdtemp(), "clip.wav")
+    subprocess.run([
+        find_ffmpeg(), "-nostdin", "-v", "error", "-y",
+        "-f", "lavfi", "-i", f"anoisesrc=color=pink:amplitude=0.1:sample_rate={SAMPLE_RATE}:duration={seconds}",
+        "-ac", "1", "-c:a", "pcm_s16le", path,
+    ], check=True)
+    return path
+
+
+def run_whisper(pool: ModelPool, audio, model_name: str) -> None:
+    import faster_whisper
+
+    key = ("whisper", model_name, "cpu", "int8")
+    with pool.lease(key, lambda: faster_whisper.WhisperModel(model_name, device="cpu", compute_type="int8")) as model:
+        list(model.transcribe(audio)[0])
+
+
+def run_pipeline(pool: ModelPool, video: str, model_name: str) -> None:
+    from moduls import model_pool, video_processing
+
+    model_pool._model_pool = pool
+    video_processing.extraction_text(video, model_name=model_name, use_cache=False, streaming=False)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--model", default="medium", help="Модель faster-whisper")
+    parser.add_argument("--runs", type=int, default=3, help="Количество повторных извлечений")
+    parser.add_argument("--seconds", type=float, default=30, help="Длительность синтетического клипа")
+    parser.add_argument("--video", default="", help="Видео для полного пайплайна extraction_text")
+    args = parser.parse_args()
+
+    if args.video:
+        source, run = args.video, run_pipeline
+    else:
+        if find_ffmpeg() is None:
+            sys.exit("ffmpeg не найден ни в tools/, ни в PATH")
+        source, run = extract_audio_pcm(synthetic_clip(args.seconds)), run_whisper
+
+    print(f"{'режим':>8} " + " ".join(f"{'прогон ' + str(i + 1) + ', с':>12}" for i in range(args.runs))
+          + f" {'загрузка, с':>12}")
+    for enabled in (False, True):
+        pool = ModelPool(enabled=enabled)
+        timings = []
+        for _ in range(args.runs):
+            started = time.perf_counter()
+            run(pool, source, args.model)
+            timings.append(time.perf_counter() - started)
+        load = f"{pool.load_seconds:>12.1f}" if enabled else f"{'—':>12}"
+        print(f"{'пул' if enabled else 'без пула':>8} " + " ".join(f"{t:>12.1f}" for t in timings) + f" {load}")
+        pool.clear()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,75 @@
+"""
+Бенчмарк восстановления пунктуации: прежний вызов deepmultilingualpunctuation.PunctuationModel.predict
+(фрагменты по одному через pipeline transformers) против moduls.punctuation.iter_punctuation_labels
+(пакеты перекрывающихся фрагментов) в средах torch, int8 и onnx.
+
+Для каждой среды выводятся время, слов в секунду, прирост памяти процесса и доля меток, совпавших
+с прежним вызовом. Текст — сегменты из файла (--text, по строке на сегмент) или синтетические
+предложения из словаря. Модель загружается до замера, время загрузки в результат не входит.
+
+Запуск из корня репозитория:
+    python -m benchmarks.bench_punctuation [--words 20000] [--backends torch,int8,onnx] [--batch-size 8]
+"""
+import argparse
+import random
+import time
+from moduls import punctuation
+from moduls.model_pool import get_model_pool, memory_in_use
+
+VOCABULARY = (
+    "привет", "как", "дела", "хорошо", "спасибо", "мы", "обсудили", "проект", "сроки", "бюджет", "команда",
+    "задача", "вопрос", "ответ", "да", "нет", "когда", "почему", "the", "meeting", "is", "over", "we", "agree",
+)
+
+
+def synthetic(words: int, seed: int = 0):
+    rng = random.Random(seed)
+    return [" ".join(rng.choice(VOCABULARY) for _ in range(rng.randint(1, 12))) for _ in range(words // 6)]
+
+
+def run_legacy(segments, model_name: str):
+    from deepmultilingualpunctuation import PunctuationModel
+
+    model = PunctuationModel(model=model_name)
+    started, memory = time.perf_counter(), memory_in_use()
+    labels = [label for _, label, _ in model.predict(segments, chunk_size=230)]
+    return labels, time.perf_counter() - started, memory_in_use() - memory
+
+
+def run_backend(segments, model_name: str, backend: str, batch_size: int):
+    # Модель загружается в пул заранее под тем же ключом, что использует iter_punctuation_labels
+    with get_model_pool().lease(("punctuation", model_name, backend, "cpu"),
+                                lambda: punctuation.load_punctuation_runner(model_name, backend), exclusive=True):
+        pass
+    started, memory = time.perf_counter(), memory_in_use()
+    labels = list(punctuation.iter_punctuation_labels(iter(segments), "cpu", model_name, backend, batch_size))
+    return labels, time.perf_counter() - started, memory_in_use() - memory
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--words", type=int, default=20000, help="Примерное число слов синтетического текста")
+    parser.add_argument("--text", default="", help="Файл с сегментами (по строке на сегмент)")
+    parser.add_argument("--model", default=punctuation.PUNCTUATION_MODEL, help="Модель пунктуации")
+    parser.add_argument("--backends", default="torch,int8,onnx", help="Среды выполнения через запятую")
+    parser.add_argument("--batch-size", type=int, default=punctuation.PUNCTUATION_BATCH_SIZE)
+    args = parser.parse_args()
+
+    if args.text:
+        with open(args.text, "r", encoding="utf-8") as f:
+            segments = [line.strip() for line in f if line.strip()]
+    else:
+        segments = synthetic(args.words)
+    words = sum(len(segment.split()) for segment in segments)
+
+    expected, seconds, memory = run_legacy(segments, args.model)
+    print(f"{'среда':>10} {'время, с':>10} {'слов/с':>10} {'память, МБ':>11} {'совпадение':>11}")
+    print(f"{'прежняя':>10} {seconds:>10.2f} {words / seconds:>10.0f} {memory / 2**20:>11.0f} {'—':>11}")
+    for backend in filter(None, args.backends.split(",")):
+        labels, seconds, memory = run_backend(segments, args.model, backend, args.batch_size)
+        agreement = sum(a == b for a, b in zip(labels, expected)) / max(len(expected), 1)
+        print(f"{backend:>10} {seconds:>10.2f} {words / seconds:>10.0f} {memory / 2**20:>11.0f} {agreement:>11.1%}")
+
+
+if __name__ == "__main__":
+    main()
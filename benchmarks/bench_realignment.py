@@ -0,0 +1,40 @@
+"""
+Бенчмарк выравнивания спикеров по границам предложений: прежний обход (для каждой смены спикера
+заново сканируются окна слов и считаются голоса через list.count) против линейного
+helpers.get_realigned_ws_mapping_with_punctuation.
+
+Время замеряется на транскриптах растущей длины с длинными предложениями и частыми сменами спикеров;
+прежняя реализация и проверка совпадения на случайных транскриптах — в tests/test_realignment.py.
+
+Запуск из корня репозитория:
+    python -m benchmarks.bench_realignment [--words 20000,40000,80000] [--max-words 50]
+"""
+import argparse
+import random
+import time
+from moduls import helpers_diaraize as helpers
+from tests.test_realignment import legacy_realignment, synthetic
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--words", default="20000,40000,80000", help="Длины транскриптов через запятую")
+    parser.add_argument("--max-words", type=int, default=50, help="max_words_in_sentence для замеров")
+    args = parser.parse_args()
+
+    # Длинные предложения и частые смены спикеров
+    print(f"{'слов':>8} {'прежний, с':>12} {'линейный, с':>12} {'мкс/слово':>10}")
+    for words in (int(n) for n in args.words.split(",")):
+        mapping = synthetic(words, random.Random(words), sentence_words=args.max_words * 2, switch=0.3)
+        started = time.perf_counter()
+        expected = legacy_realignment(mapping, args.max_words)
+        legacy = time.perf_counter() - started
+        started = time.perf_counter()
+        result = helpers.get_realigned_ws_mapping_with_punctuation(mapping, args.max_words)
+        linear = time.perf_counter() - started
+        assert result == expected
+        print(f"{words:>8} {legacy:>12.3f} {linear:>12.3f} {linear / words * 1e6:>10.1f}")
+
+
+if __name__ == "__main__":
+    main()
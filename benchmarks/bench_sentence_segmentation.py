@@ -0,0 +1,89 @@
+"""
+Бенчмарк разбиения на предложения: прежняя проверка всего накопленного текста предложения
+(text_contains_sentbreak на каждое слово, квадратичное время на длинных предложениях) против
+инкрементальной helpers.get_sentences_speaker_mapping.
+
+Сначала на случайных текстах (сокращения, инициалы, многоточия, числа, "?!", кавычки, смена регистра,
+смена спикеров) проверяется совпадение результатов, затем замеряется время на транскриптах одного спикера
+растущей длины — самый тяжёлый для прежней проверки случай.
+
+Запуск из корня репозитория:
+    python -m benchmarks.bench_sentence_segmentation [--words 1000,2000,4000] [--fuzz 300]
+"""
+import argparse
+import random
+import time
+import nltk
+from moduls import helpers_diaraize as helpers
+
+VOCABULARY = (
+    "the", "a", "word", "Speaker", "meeting", "agenda", "yes", "no", "ok", "Hello", "World", "We", "i", "I",
+    "Mr.", "Mrs.", "Dr.", "etc.", "e.g.", "i.e.", "U.S.", "J.", "A.", "No.", "vs.", "p.m.", "3.5", "1990.",
+    "end.", "End.", "done!", "why?", "what?!", "so...", "Well...", "...", ".", "!", "?", ",", "\"quoted.\"",
+    "(aside).", "'tis", "Привет.", "мир", "Да.", "т.е.", "и", "Итак,", "12.", "IV.", "x", "",
+)
+
+
+def legacy_sentences(word_speaker_mapping, spk_ts):
+    sentence_checker = nltk.tokenize.PunktSentenceTokenizer().text_contains_sentbreak
+    s, e, spk = spk_ts[0]
+    prev_spk = spk
+    snts = []
+    snt = {"speaker": f"Speaker {spk}", "start_time": s, "end_time": e, "text": ""}
+
+    for wrd_dict in word_speaker_mapping:
+        wrd, spk = wrd_dict["word"], wrd_dict["speaker"]
+        s, e = wrd_dict["start_time"], wrd_dict["end_time"]
+        if spk != prev_spk or sentence_checker(snt["text"] + " " + wrd):
+            snts.append(snt)
+            snt = {"speaker": f"Speaker {spk}", "start_time": s, "end_time": e, "text": ""}
+        else:
+            snt["end_time"] = e
+        snt["text"] += wrd + " "
+        prev_spk = spk
+
+    snts.append(snt)
+    return snts
+
+
+def synthetic(words: int, speakers: int, rng: random.Random, vocabulary=VOCABULARY):
+    mapping, speaker = [], 0
+    for i in range(words):
+        if speakers > 1 and rng.random() < 0.05:
+            speaker = rng.randrange(speakers)
+        word = rng.choice(vocabulary)
+        if rng.random() < 0.1:
+            word = " " + word
+        mapping.append({"word": word, "start_time": i * 300, "end_time": i * 300 + 250, "speaker": speaker})
+    return mapping, [(0, words * 300, 0)]
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--words", default="1000,2000,4000", help="Длины транскриптов через запятую")
+    parser.add_argument("--fuzz", type=int, default=300, help="Количество случайных текстов для проверки")
+    args = parser.parse_args()
+
+    rng = random.Random(0)
+    for _ in range(args.fuzz):
+        mapping, spk_ts = synthetic(rng.randrange(1, 200), rng.choice((1, 3)), rng)
+        assert helpers.get_sentences_speaker_mapping(mapping, spk_ts) == legacy_sentences(mapping, spk_ts)
+    print(f"Результаты совпадают на {args.fuzz} случайных текстах")
+
+    # Слова без знаков конца предложения: одно предложение на весь транскрипт
+    plain = [word for word in VOCABULARY if word and word[-1] not in ".!?\""]
+    print(f"{'слов':>8} {'прежняя, с':>12} {'инкрем., с':>12} {'мкс/слово':>10}")
+    for words in (int(n) for n in args.words.split(",")):
+        mapping, spk_ts = synthetic(words, 1, random.Random(words), plain)
+        started = time.perf_counter()
+        expected = legacy_sentences(mapping, spk_ts)
+        legacy = time.perf_counter() - started
+        started = time.perf_counter()
+        result = helpers.get_sentences_speaker_mapping(mapping, spk_ts)
+        incremental = time.perf_counter() - started
+        assert result == expected
+        print(f"{words:>8} {legacy:>12.3f} {incremental:>12.3f} {incremental / words * 1e6:>10.1f}")
+
+
+if __name__ == "__main__":
+    main()
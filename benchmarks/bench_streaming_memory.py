@@ -0,0 +1,140 @@
+"""
+Бенчмарк пикового потребления памяти при чтении длинных записей: полная загрузка аудио
+(audio_stream.extract_audio_pcm, как в start_diarize) против потокового режима
+(audio_stream.iter_pcm_windows + IncrementalWavWriter + SegmentStitcher, как в start_diarize_streaming).
+
+Для каждой длительности генерируется синтетическая запись (ffmpeg, lavfi), затем каждый режим
+запускается в отдельном процессе и замеряется его пиковый RSS. В потоковом режиме пик должен
+оставаться постоянным при росте длительности, в полном — расти линейно.
+С флагом --whisper в обоих режимах дополнительно выполняется транскрибация faster-whisper
+(полный режим — целиком, потоковый — по окнам). С флагом --diarize msdd или fast после записи
+mono_file.wav выполняется диаризация по всей записи (video_processing.diarize_file, как при
+STREAM_DIARIZATION=full), поэтому её пик растёт с длительностью; --diarize windowed в потоковом режиме
+диаризирует запись по окнам (fast_diarization.StreamingDiarizer, как при STREAM_DIARIZATION=windowed).
+Для диаризации нужна речь: --audio задаёт запись, которая повторяется до нужной длительности
+(без него генерируется розовый шум).
+
+Запуск из корня репозитория:
+    python -m benchmarks.bench_streaming_memory [--minutes 10,30,90] [--window 600] [--overlap 10] [--whisper tiny]
+        [--diarize windowed] [--audio разговор.wav]
+"""
+import argparse
+import os
+import resource
+import subprocess
+import sys
+import tempfile
+import time
+from moduls.audio_stream import (SAMPLE_RATE, IncrementalWavWriter, SegmentStitcher, extract_audio_pcm, find_ffmpeg,
+                                 iter_pcm_windows)
+
+
+def generate_recording(path: str, minutes: float, audio: str = "") -> None:
+    """Генерирует моно WAV 16 кГц заданной длительности: запись audio по кругу или розовый шум."""
+    if audio:
+        source = ["-stream_loop", "-1", "-i", audio, "-t", str(minutes * 60), "-ar", str(SAMPLE_RATE)]
+    else:
+        source = ["-f", "lavfi", "-i",
+                  f"anoisesrc=color=pink:amplitude=0.1:sample_rate={SAMPLE_RATE}:duration={minutes * 60}"]
+    subprocess.run([find_ffmpeg(), "-nostdin", "-v", "error", "-y", *source, "-ac", "1", "-c:a", "pcm_s16le", path],
+                   check=True)
+
+
+def fake_segments(start_ms: int, length_ms: int) -> list:
+    """Сегменты по 5 секунд вместо Whisper, чтобы замерять только путь аудио."""
+    return [{"text": "", "start": t, "end": t + 5000, "speaker": "unknown"}
+            for t in range(start_ms, start_ms + length_ms - 5000, 5000)]
+
+
+def run_worker(mode: str, source: str, window: float, overlap: float, whisper: str, diarize: str) -> None:
+    model = None
+    if whisper:
+        import faster_whisper
+        model = faster_whisper.WhisperModel(whisper, device="cpu", compute_type="int8")
+
+    started = time.perf_counter()
+    wav_path = os.path.join(tempfile.mkdtemp(), "mono_file.wav")
+    segments_total = 0
+    diarizer = None
+    if diarize == "windowed" and mode == "stream":
+        from moduls.fast_diarization import StreamingDiarizer
+
+        diarizer = StreamingDiarizer("cpu", int(overlap * SAMPLE_RATE))
+
+    if mode == "full":
+        audio = extract_audio_pcm(source)
+        with IncrementalWavWriter(wav_path) as writer:
+            writer.write(0, audio)
+        if model is not None:
+            segments_total = len(list(model.transcribe(audio)[0]))
+        del audio
+    else:
+        stitcher = SegmentStitcher(int(overlap * 1000))
+        with IncrementalWavWriter(wav_path) as writer:
+            for start, samples in iter_pcm_windows(source, window, overlap):
+                writer.write(start, samples)
+                if diarizer is not None:
+                    diarizer.add(start, samples)
+                start_ms, length_ms = start * 1000 // SAMPLE_RATE, len(samples) * 1000 // SAMPLE_RATE
+                if model is not None:
+                    segments = [{"text": s.text, "start": start_ms + int(s.start * 1000),
+                                 "end": start_ms + int(s.end * 1000)} for s in model.transcribe(samples)[0]]
+                else:
+                    segments = fake_segments(start_ms, length_ms)
+                stitcher.add(segments, start_ms, start_ms + length_ms)
+        segments_total = len(stitcher.finish())
+
+    if diarizer is not None:
+        diarizer.finish()
+    elif diarize:
+        from moduls import video_processing as vp
+
+        vp.diarize_file(os.path.dirname(wav_path), "cpu", tier="fast" if diarize == "windowed" else diarize)
+    os.remove(wav_path)
+    peak_mb = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024
+    print(f"{peak_mb:.1f} {time.perf_counter() - started:.2f} {segments_total}")
+
+
+def measure(mode: str, source: str, args) -> tuple:
+    command = [sys.executable, "-m", "benchmarks.bench_streaming_memory", "--worker", mode, source,
+               "--window", str(args.window), "--overlap", str(args.overlap)]
+    if args.whisper:
+        command += ["--whisper", args.whisper]
+    if args.diarize:
+        command += ["--diarize", args.diarize]
+    output = subprocess.run(command, check=True, capture_output=True, text=True).stdout.split()
+    return float(output[0]), float(output[1]), int(output[2])
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--minutes", default="10,30,90", help="Длительности синтетических записей через запятую")
+    parser.add_argument("--window", type=float, default=600, help="Длина окна в секундах")
+    parser.add_argument("--overlap", type=float, default=10, help="Перекрытие окон в секундах")
+    parser.add_argument("--whisper", default="", help="Модель faster-whisper для транскрибации (по умолчанию без неё)")
+    parser.add_argument("--diarize", default="", choices=("", "msdd", "fast", "windowed"),
+                        help="Уровень диаризации после записи WAV (по умолчанию без неё)")
+    parser.add_argument("--audio", default="", help="Запись с речью, повторяемая до нужной длительности")
+    parser.add_argument("--worker", nargs=2, metavar=("MODE", "SOURCE"), help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    if args.worker:
+        run_worker(args.worker[0], args.worker[1], args.window, args.overlap, args.whisper, args.diarize)
+        return
+
+    if find_ffmpeg() is None:
+        sys.exit("ffmpeg не найден ни в tools/, ни в PATH")
+
+    print(f"{'минут':>6} {'режим':>8} {'пик RSS, МБ':>12} {'время, с':>9} {'сегментов':>10}")
+    with tempfile.TemporaryDirectory() as folder:
+        for minutes in [float(m) for m in args.minutes.split(",")]:
+            source = os.path.join(folder, f"recording_{minutes:g}.wav")
+            generate_recording(source, minutes, args.audio)
+            for mode in ("full", "stream"):
+                peak_mb, elapsed, segments = measure(mode, source, args)
+                print(f"{minutes:>6g} {mode:>8} {peak_mb:>12.1f} {elapsed:>9.2f} {segments:>10}")
+            os.remove(source)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,108 @@
+"""
+Бенчмарк сопоставления слов со спикерами: последовательный обход helpers.get_words_speaker_mapping
+против векторизованного timeline.assign_speakers, а также разбор RTTM (построчный split против timeline.load_rttm).
+
+Генерируется синтетическая запись: реплики спикеров со случайными паузами и перекрытиями, слова по всей
+длительности. Для якорей start/mid/end проверяется совпадение результатов с последовательным обходом,
+для "overlap" — с прямым перебором пересечений на первых --check словах.
+
+Запуск из корня репозитория:
+    python -m benchmarks.bench_timeline [--words 100000] [--turns 5000] [--speakers 4]
+"""
+import argparse
+import os
+import tempfile
+import time
+import numpy as np
+from moduls import helpers_diaraize as helpers, timeline
+
+
+def synthetic(words: int, turns: int, speakers: int, seed: int = 0):
+    rng = np.random.default_rng(seed)
+    turn_starts = np.cumsum(rng.integers(500, 20000, turns))
+    turn_ends = turn_starts + rng.integers(300, 25000, turns)  # часть реплик перекрывается со следующими
+    turn_speakers = rng.integers(0, speakers, turns)
+    word_starts = np.sort(rng.integers(0, int(turn_ends.max()) + 5000, words))
+    word_ends = word_starts + rng.integers(100, 900, words)
+    word_timestamps = [{"text": f"w{i}", "start": int(s), "end": int(e)}
+                       for i, (s, e) in enumerate(zip(word_starts, word_ends))]
+    speaker_ts = [[int(s), int(e), int(sp)] for s, e, sp in zip(turn_starts, turn_ends, turn_speakers)]
+    return word_timestamps, speaker_ts
+
+
+def write_rttm(path: str, speaker_ts) -> None:
+    with open(path, "w") as f:
+        for s, e, sp in speaker_ts:
+            # Формат NeMo: между полями времени по три пробела
+            f.write(f"SPEAKER mono_file 1   {s / 1000:.3f}   {(e - s) / 1000:.3f} <NA> <NA> speaker_{sp} <NA> <NA>\n")
+
+
+def legacy_read_rttm(path: str):
+    speaker_ts = []
+    with open(path, "r") as f:
+        for line in f.readlines():
+            line_list = line.split(" ")
+            s = int(float(line_list[5]) * 1000)
+            e = s + int(float(line_list[8]) * 1000)
+            speaker_ts.append([s, e, int(line_list[11].split("_")[-1])])
+    return speaker_ts
+
+
+def brute_force_overlap(word, turns, fallback):
+    totals = {}
+    for s, e, sp in turns:
+        overlap = min(word["end"], e) - max(word["start"], s)
+        if overlap > 0:
+            totals[sp] = totals.get(sp, 0) + overlap
+    if not totals:
+        return fallback
+    best = max(totals.values())
+    return min(sp for sp, total in totals.items() if total == best)
+
+
+def timed(func, *args):
+    started = time.perf_counter()
+    result = func(*args)
+    return result, time.perf_counter() - started
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--words", type=int, default=100_000)
+    parser.add_argument("--turns", type=int, default=5_000)
+    parser.add_argument("--speakers", type=int, default=4)
+    parser.add_argument("--check", type=int, default=2_000, help="Сколько слов сверять с перебором для overlap")
+    args = parser.parse_args()
+
+    word_timestamps, speaker_ts = synthetic(args.words, args.turns, args.speakers)
+    print(f"Слов: {len(word_timestamps)}, реплик: {len(speaker_ts)}")
+
+    with tempfile.TemporaryDirectory() as folder:
+        rttm_path = os.path.join(folder, "mono_file.rttm")
+        write_rttm(rttm_path, speaker_ts)
+        legacy_turns, legacy_time = timed(legacy_read_rttm, rttm_path)
+        turns, numpy_time = timed(timeline.load_rttm, rttm_path)
+        assert turns.tolist() == [tuple(t) for t in legacy_turns], "RTTM разобран по-разному"
+        print(f"RTTM:      split {legacy_time * 1000:8.1f} мс, numpy {numpy_time * 1000:8.1f} мс")
+
+    starts = np.array([w["start"] for w in word_timestamps])
+    ends = np.array([w["end"] for w in word_timestamps])
+    for anchor in ("start", "mid", "end"):
+        legacy, legacy_time = timed(helpers.get_words_speaker_mapping, word_timestamps, legacy_turns, anchor)
+        mapped, mapping_time = timed(timeline.words_speaker_mapping, word_timestamps, turns, anchor)
+        speakers, numpy_time = timed(timeline.assign_speakers, starts, ends, turns, anchor)
+        assert [w["speaker"] for w in legacy] == [w["speaker"] for w in mapped], f"Расхождение для {anchor}"
+        assert speakers.tolist() == [w["speaker"] for w in legacy], f"Расхождение для {anchor}"
+        print(f"{anchor:<9} цикл {legacy_time * 1000:8.1f} мс, numpy {numpy_time * 1000:8.1f} мс "
+              f"(x{legacy_time / numpy_time:.0f}), со словарями {mapping_time * 1000:8.1f} мс; результаты совпадают")
+
+    _, numpy_time = timed(timeline.assign_speakers, starts, ends, turns, "overlap")
+    mapped = timeline.words_speaker_mapping(word_timestamps, turns, "overlap")
+    fallback = timeline.words_speaker_mapping(word_timestamps, turns, "start")
+    for word, result, default in list(zip(word_timestamps, mapped, fallback))[:args.check]:
+        assert result["speaker"] == brute_force_overlap(word, legacy_turns, default["speaker"]), word
+    print(f"overlap   numpy {numpy_time * 1000:8.1f} мс, первые {args.check} слов совпадают с перебором")
+
+
+if __name__ == "__main__":
+    main()
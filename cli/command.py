@@ -40,6 +40,9 @@ def cli_command(assistant):
       2 - Удалить кандидата
       3 - Показать имеющиеся данные
       4 - Подбор проектов \\ кандидатов
+      5 - Отчёт по использованию ChatGPT
+      6 - Пакетная загрузка видео
+      7 - Подготовка моделей для работы без сети
       10 - Загрузить тестовые данные
       0 - Выход
     """
@@ -49,6 +52,9 @@ def cli_command(assistant):
         "2": delete_object,
         "3": show_objects,
         "4": match_and_delete_object,
+        "5": usage_report,
+        "6": batch_ingest,
+        "7": prewarm_models,
         "10": load_test_data
     }
     
@@ -75,6 +81,9 @@ def print_menu():
     2 - Удалить кандидата
     3 - Показать имеющиеся данные
     4 - Подбор проектов \\ кандидатов
+    5 - Отчёт по использованию ChatGPT
+    6 - Пакетная загрузка видео
+    7 - Подготовка моделей для работы без сети
     10 - Загрузить тестовые данные
     0 - Выход"""
     print(text)
@@ -121,8 +130,9 @@ def load_test_data(assistant) -> str:
     
     Для каждого файла с расширением .txt:
       1. Считывает содержимое файла.
-      2. Если файл не пустой, передаёт текст в process_text_summary (из moduls.text_processing)
-         для получения структурированного словаря.
+      2. Непустые тексты передаются в process_text_summaries_packed (из moduls.text_processing),
+         которая объединяет короткие документы в пакетные запросы к ChatGPT и возвращает
+         структурированный словарь для каждого файла.
       3. Вызывает RAG.add_object для добавления объекта в индекс.
       4. Формирует итоговое сообщение для каждого файла.
       
@@ -137,6 +147,7 @@ def load_test_data(assistant) -> str:
         return "Папка /data пуста."
     
     messages = []
+    contents = {}
     for filename in files:
         if not filename.lower().endswith(".txt"):
             continue  # Обрабатываем только текстовые файлы
@@ -150,22 +161,29 @@ def load_test_data(assistant) -> str:
                 messages.append(f"{filename}: файл пустой.")
                 continue
             
+            contents[filename] = content
             print(f"{filename}: данные из файла получены.")
         
         except Exception as e:
             messages.append(f"{filename}: ошибка при чтении файла: {e}")
             continue
+    
+    try:
+        from moduls.text_processing import process_text_summaries_packed
+        parsed_dicts = process_text_summaries_packed(contents, assistant)
+    
+    except Exception as e:
+        messages.append(f"Ошибка при обработке текстов: {e}")
+        return "\n".join(messages)
+    
+    for filename in contents:
+        if filename not in parsed_dicts:
+            messages.append(f"{filename}: не обработан (ошибка ChatGPT или исчерпан бюджет токенов).")
+            continue
         
-        try:
-            from moduls.text_processing import process_text_summary
-            parsed_dict = process_text_summary(content, assistant)
-            
-            if not parsed_dict:
-                messages.append(f"{filename}: парсер вернул пустой результат.")
-                continue
-        
-        except Exception as e:
-            messages.append(f"{filename}: ошибка при обработке текста: {e}")
+        parsed_dict = parsed_dicts[filename]
+        if not parsed_dict:
+            messages.append(f"{filename}: парсер вернул пустой результат.")
             continue
         
         try:
@@ -183,6 +201,40 @@ def load_test_data(assistant) -> str:
     return "\n".join(messages)
 
 
+def usage_report(assistant: GPTAssistant) -> str:
+    """
+    Выводит отчёт по использованию ChatGPT: токены, задержки и вызовы по дням,
+    вызывающей стороне (summary/match) и модели, а также расход текущего запуска и бюджеты.
+    """
+    return assistant.usage.format_report()
+
+
+def batch_ingest(assistant: GPTAssistant) -> str:
+    """
+    Пакетная загрузка видео: запрашивает каталог или список путей через запятую и прогоняет
+    все видео через конвейер moduls.batch_ingest, в котором этапы (ffmpeg, demucs, Whisper, NeMo,
+    пунктуация, ChatGPT, индексирование) разных видео выполняются одновременно.
+    Возвращает результат по каждому видео и отчёт о загрузке этапов и пропускной способности.
+    """
+    answer = input("Введите каталог с видео или пути к видео через запятую: ").strip()
+    sources = [path.strip().strip('"') for path in answer.split(",") if path.strip()]
+    if not sources:
+        return "Ни один источник не выбран. Возврат в главное меню."
+
+    from moduls.batch_ingest import ingest_videos
+    return ingest_videos(assistant, sources, RAG.add_object)
+
+
+def prewarm_models(assistant: GPTAssistant) -> str:
+    """
+    Скачивает в локальный реестр все модели пайплайна (NeMo, Whisper, пунктуация, эмбеддинги, demucs),
+    сверяет их с lock-файлом и загружает каждую один раз, чтобы последующие запросы не ждали сети.
+    То же без запуска CLI: python main.py prewarm.
+    """
+    from moduls.model_registry import prewarm
+    return prewarm()[1]
+
+
 def match_and_delete_object(assistant: GPTAssistant) -> str:
     """
     Тестовый цикл для проверки автоматизированного подбора:
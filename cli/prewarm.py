@@ -0,0 +1,35 @@
+"""
+Подготовка моделей для работы без сети.
+
+Запуск из корня репозитория:
+    python main.py prewarm [--verify] [--no-warm] [--update-lock]
+"""
+import argparse
+import logging
+import sys
+from moduls.model_registry import prewarm
+
+
+logger = logging.getLogger(__name__)
+logging.basicConfig(level=logging.INFO)
+
+
+def run_prewarm(argv=None) -> None:
+    """
+    Скачивает модели реестра (moduls.model_registry) и загружает каждую один раз;
+    с --verify только сверяет уже скачанные модели с lock-файлом, с --update-lock добавляет в lock-файл
+    отсутствующие в нём модели.
+    Код возврата 1, если хотя бы одна модель не подготовлена.
+    """
+    parser = argparse.ArgumentParser(prog="main.py prewarm", description=__doc__,
+                                     formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--verify", action="store_true", help="Только проверить контрольные суммы, без скачивания")
+    parser.add_argument("--no-warm", action="store_true", help="Не загружать модели после скачивания")
+    parser.add_argument("--update-lock", action="store_true",
+                        help="Закрепить в lock-файле текущие ревизии моделей, которых в нём нет")
+    args = parser.parse_args(argv)
+
+    ready, report = prewarm(verify_only=args.verify, warm=not args.no_warm, update_lock=args.update_lock)
+    print(report)
+    if not ready:
+        sys.exit(1)
@@ -1,12 +1,22 @@
 import logging
 import time
-from typing import Dict, Any, Tuple
+from typing import Dict, Any, Optional, Tuple
 from core.storage.faiss_controller import add_document, delete_object, search_object
 from core.storage.faiss_db import FaissDB
+from moduls.token_budget import count_tokens, truncate_to_tokens
 
 logger = logging.getLogger(__name__)
 logging.basicConfig(level=logging.INFO)
 
+# Бюджет токенов на одну карточку найденного объекта в prompt подбора.
+MATCH_CARD_TOKENS = 200
+# Доля бюджета карточки, до которой обрезается каждое из полей Stack и Skils.
+MATCH_FIELD_SHARE = 0.25
+# Описание добавляется в карточку, только если после остальных полей под него остаётся не меньше этого числа токенов.
+MATCH_MIN_DESCRIPTION_TOKENS = 40
+# Ограничение размера всего prompt подбора.
+MATCH_PROMPT_TOKENS = 2000
+
 
 class RAG:
     """
@@ -20,6 +30,8 @@ class RAG:
       
     Предполагается, что данные уже корректно обработаны (например, нормализация ключей произведена в text_processing).
     """
+    # Кэш подбора: (ID исходного объекта, обратный тип) -> версии коллекций, ранжированные ID и текст ChatGPT
+    _match_cache: Dict[Tuple[Any, str], Dict[str, Any]] = {}
 
     @staticmethod
     def add_object(data: Dict[str, Any]) -> Tuple[bool, Any]:
@@ -110,25 +122,43 @@ class RAG:
         return f"Объект успешно добавлен, ID: {obj_id}"
     
     @staticmethod
-    def generate_match_prompt(source_obj: dict, results: list) -> str:
+    def render_match_card(idx: int, meta: dict, card_token_budget: int = MATCH_CARD_TOKENS) -> str:
         """
-        Формирует prompt для генерации итогового текста подбора объектов.
+        Формирует компактную карточку одного найденного объекта для prompt подбора.
+        Пустые поля опускаются, стек и навыки обрезаются до доли MATCH_FIELD_SHARE бюджета, описание — до
+        остатка бюджета (если остаток меньше MATCH_MIN_DESCRIPTION_TOKENS, описание опускается), поэтому
+        карточка не превышает card_token_budget токенов, если его хватает хотя бы на имя и контакты.
         """
-        source_type = source_obj.get("type", "").lower().strip()
-        source_name = source_obj.get("name", "Неизвестно")
-        source_stack = source_obj.get("stack", "отсутствует")
-        source_skils = source_obj.get("skils", "отсутствует")
+        # Маркер обрезки truncate_to_tokens может занять ещё один токен
+        field_tokens = int(card_token_budget * MATCH_FIELD_SHARE) - 1
+        lines = [f"{idx}. {meta.get('name', 'Неизвестно')}"]
+        for label, key in (("Stack", "stack"), ("Skils", "skils")):
+            if meta.get(key):
+                lines.append(f"{label}: {truncate_to_tokens(str(meta[key]), field_tokens)}")
 
-        if source_type == "kandidate":
-            source_label = "кандидата"
-            result_label = "проекты"
-        elif source_type == "project":
-            source_label = "проекта"
-            result_label = "кандидаты"
-        else:
-            source_label = "объекта"
-            result_label = "результаты"
+        contacts = ", ".join(
+            str(meta[key]) for key in ("telephone", "email", "telegram")
+            if meta.get(key) and str(meta[key]).lower() not in ("неизвестно", "отсутствует")
+        )
+        if contacts:
+            lines.append(f"Контакты: {contacts}")
 
+        card = "\n".join("   " + line for line in lines)
+        description = meta.get("description")
+        if description:
+            description_tokens = card_token_budget - count_tokens(card + "\n   Description: ") - 1
+            if description_tokens >= MATCH_MIN_DESCRIPTION_TOKENS:
+                card += f"\n   Description: {truncate_to_tokens(str(description), description_tokens)}"
+
+        return card
+
+    @staticmethod
+    def _legacy_match_prompt(source_name: str, source_stack: str, source_skils: str, source_label: str,
+                             result_label: str, results: list) -> str:
+        """
+        Воспроизводит прежний формат prompt подбора (все поля каждой карточки, список карточек встроен
+        в текст четыре раза). Используется только для сравнения размеров в логе.
+        """
         cards = []
         for idx, res in enumerate(results, start=1):
             meta = res.get("metadata", {})
@@ -145,7 +175,7 @@ class RAG:
 
         cards_text = "\n".join(cards)
 
-        prompt = (
+        return (
             f"Ты — эксперт по подбору {result_label}. У тебя есть данные {source_label} \"{source_name}\" "
             f"со стеком: {source_stack};\n "
             f"и скилами {source_skils}.\n\n"
@@ -160,14 +190,167 @@ class RAG:
             f"и краткое объяснение, без лишних комментариев. "
             f"Учти, что ответ пишешь беспристрастному лицу, осуществляющему подбор"
         )
+
+    @staticmethod
+    def generate_match_prompt(
+        source_obj: dict,
+        results: list,
+        card_token_budget: int = MATCH_CARD_TOKENS,
+        max_prompt_tokens: int = MATCH_PROMPT_TOKENS,
+    ) -> str:
+        """
+        Формирует prompt для генерации итогового текста подбора объектов.
+
+        Каждая карточка найденного объекта выводится в prompt один раз и ограничена бюджетом
+        card_token_budget; карточки добавляются в порядке релевантности, пока общий размер prompt
+        не превысит max_prompt_tokens: карточка, которая не помещается в остаток бюджета даже в сжатом
+        виде, пропускается (в том числе первая). В лог пишется размер prompt, размер того же prompt со всеми
+        карточками без сжатия и размер prompt в прежнем формате (все посчитаны токенизатором).
+        """
+        source_type = source_obj.get("type", "").lower().strip()
+        source_name = source_obj.get("name", "Неизвестно")
+        source_stack = source_obj.get("stack", "отсутствует")
+        source_skils = source_obj.get("skils", "отсутствует")
+
+        if source_type == "kandidate":
+            source_label = "кандидата"
+            result_label = "проекты"
+        elif source_type == "project":
+            source_label = "проекта"
+            result_label = "кандидаты"
+        else:
+            source_label = "объекта"
+            result_label = "результаты"
+
+        header = (
+            f"Ты — эксперт по подбору {result_label}. У тебя есть данные {source_label} \"{source_name}\" "
+            f"со стеком: {source_stack};\n "
+            f"и скилами {source_skils}.\n\n"
+            f"Вот список подходящих {result_label}:\n"
+        )
+        instructions = (
+            f"\n\nСформируй краткий и человечный ответ, который будет выглядеть так: "
+            f"\"Для {source_label} {source_name} подходят следующие {result_label}:\n"
+            f"1. [Имя из списка выше] со стеком [Стек из списка выше]. "
+            f"[Краткое объяснение, почему один из {result_label} подходит {source_label}].  \n"
+            f"Контакты: [Контакты из списка выше].\n\""
+            f"Далее в таком же формате перечисляй все остальные {result_label} из списка, если они есть. \n"
+            f"Используй более разговорный стиль, указывая название/имя, стек, скилы, "
+            f"и краткое объяснение, без лишних комментариев. "
+            f"Учти, что ответ пишешь беспристрастному лицу, осуществляющему подбор"
+        )
+
+        budget = max_prompt_tokens - count_tokens(header) - count_tokens(instructions)
+        cards, full_cards = [], []
+        for idx, res in enumerate(results, start=1):
+            meta = res.get("metadata", {})
+            full_cards.append(RAG.render_match_card(idx, meta, card_token_budget=10 ** 9))
+            card = RAG.render_match_card(len(cards) + 1, meta, min(card_token_budget, budget))
+            # Плюс перевод строки между карточками
+            card_tokens = count_tokens(card) + 1
+            if card_tokens > budget:
+                logger.info("Карточка %d не помещается в бюджет prompt и пропущена.", idx)
+                continue
+
+            cards.append(card)
+            budget -= card_tokens
+
+        prompt = header + "\n".join(cards) + instructions
+        logger.info(
+            "Prompt подбора: карточек %d из %d, токенов %d (без сжатия карточек: %d, прежний формат: %d).",
+            len(cards), len(results), count_tokens(prompt),
+            count_tokens(header + "\n".join(full_cards) + instructions),
+            count_tokens(RAG._legacy_match_prompt(source_name, source_stack, source_skils, source_label,
+                                                  result_label, results)),
+        )
         return prompt
 
+    @staticmethod
+    def _match_versions() -> Tuple[int, int]:
+        """
+        Текущие версии обеих коллекций: подбор зависит и от исходного объекта, и от найденных.
+        """
+        return (FaissDB.get_version("kandidate"), FaissDB.get_version("project"))
+
+    @staticmethod
+    def _get_cached_match(object_id: Any, reverse_type: str) -> Optional[Dict[str, Any]]:
+        """
+        Возвращает запись кэша подбора, если она построена на текущих версиях коллекций.
+        """
+        entry = RAG._match_cache.get((object_id, reverse_type))
+        if entry is None or entry["versions"] != RAG._match_versions():
+            return None
+        return entry
+
+    @staticmethod
+    def _search_matches(object_id: Any, doc_type: str) -> Tuple[Optional[dict], Optional[str], list]:
+        """
+        Находит исходный объект и выполняет поиск объектов обратного типа.
+
+        :return: (исходный объект, обратный тип, результаты поиска); при ошибке объект или тип равны None.
+        """
+        source_obj = RAG.get_object_by_id(object_id, doc_type)
+        if not source_obj:
+            return None, None, []
+
+        # Определяем обратный тип для подбора
+        if doc_type in ["kandidate", "программист"]:
+            reverse_type = "project"
+
+        elif doc_type in ["project", "проект"]:
+            reverse_type = "kandidate"
+
+        else:
+            return source_obj, None, []
+
+        query = {
+            "type": reverse_type,
+            "stack": source_obj.get("stack", ""),
+            "skils": source_obj.get("skils", ""),
+            "description": source_obj.get("description", "")
+        }
+        return source_obj, reverse_type, search_object(query, top_k=5)
+
+    @staticmethod
+    def get_match_ids(object_id: Any, doc_type: str) -> list:
+        """
+        Возвращает ранжированный список ID подобранных объектов (без форматирования через ChatGPT).
+        Если подбор уже выполнялся и коллекции с тех пор не менялись, результат берётся из кэша.
+
+        :param object_id: ID объекта, по которому осуществляется подбор.
+        :param doc_type: Оригинальный тип объекта ("kandidate" или "project").
+        :return: Список ID в порядке убывания релевантности (пустой, если объект не найден).
+        """
+        reverse_type = "project" if doc_type in ["kandidate", "программист"] else "kandidate"
+        entry = RAG._get_cached_match(object_id, reverse_type)
+        if entry is not None:
+            return list(entry["ranked_ids"])
+
+        versions = RAG._match_versions()
+        source_obj, reverse_type, results = RAG._search_matches(object_id, doc_type)
+        if not source_obj or reverse_type is None:
+            return []
+
+        ranked_ids = [res.get("metadata", {}).get("id") for res in results]
+        RAG._match_cache[(object_id, reverse_type)] = {"versions": versions, "ranked_ids": ranked_ids, "text": None}
+        return ranked_ids
+
+    @staticmethod
+    def clear_match_cache() -> None:
+        """
+        Очищает кэш подбора.
+        """
+        RAG._match_cache.clear()
+
     @staticmethod
     def match_object(assistant: Any, object_id: Any, doc_type: str) -> str:
         """
         Подбирает обратный тип объектов для заданного объекта по его ID.
         Формирует запрос на основе полей "stack", "skils" и "description",
         затем генерирует prompt для ChatGPT и отправляет его через assistant.send_message.
+
+        Результат кэшируется по ID объекта и версиям коллекций FaissDB: пока ни одна коллекция
+        не изменилась, повторный подбор возвращается из кэша без поиска и обращения к ChatGPT.
         
         :param assistant: Объект GPTAssistant.
         :param object_id: ID объекта, по которому осуществляется подбор.
@@ -175,29 +358,28 @@ class RAG:
         :return: Форматированный результат подбора или сообщение об ошибке.
         """
         try:
-            source_obj = RAG.get_object_by_id(object_id, doc_type)
+            reverse_type = "project" if doc_type in ["kandidate", "программист"] else "kandidate"
+            entry = RAG._get_cached_match(object_id, reverse_type)
+            if entry is not None and entry["text"] is not None:
+                logger.info("Подбор для объекта %s взят из кэша.", object_id)
+                return "\n\n" + entry["text"]
+
+            # Версии фиксируются до поиска, чтобы изменение коллекции во время подбора инвалидировало запись
+            versions = RAG._match_versions()
+            source_obj, reverse_type, results = RAG._search_matches(object_id, doc_type)
             if not source_obj:
                 return f"Объект с id {object_id} не найден."
-            
-            # Определяем обратный тип для подбора
-            if doc_type in ["kandidate", "программист"]:
-                reverse_type = "project"
-
-            elif doc_type in ["project", "проект"]:
-                reverse_type = "kandidate"
 
-            else:
+            if reverse_type is None:
                 return "Invalid document type."
-            
-            query = {
-                "type": reverse_type,
-                "stack": source_obj.get("stack", ""),
-                "skils": source_obj.get("skils", ""),
-                "description": source_obj.get("description", "")
-            }
-            results = search_object(query, top_k=5)
+
             prompt = RAG.generate_match_prompt(source_obj, results)
-            formatted_message = assistant.send_message(prompt)
+            formatted_message = assistant.send_message(prompt, caller="match")
+            RAG._match_cache[(object_id, reverse_type)] = {
+                "versions": versions,
+                "ranked_ids": [res.get("metadata", {}).get("id") for res in results],
+                "text": formatted_message,
+            }
             return "\n\n" + formatted_message
         
         except Exception as e:
@@ -5,15 +5,17 @@ from langchain_huggingface import HuggingFaceEmbeddings
 from langchain.schema import Document
 from langchain_community.vectorstores import FAISS
 from core.storage.faiss_db import FaissDB
+from moduls.model_registry import FAISS_EMBEDDINGS_MODEL, resolve
 
 
 logger = logging.getLogger(__name__)
 logging.basicConfig(level=logging.INFO)
 
 
-# Инициализация эмбеддингов: используем модель "sentence-transformers/paraphrase-multilingual-MiniLM-L12-v2"
+# Инициализация эмбеддингов: модель FAISS_EMBEDDINGS_MODEL (по умолчанию
+# "sentence-transformers/paraphrase-multilingual-MiniLM-L12-v2") из локального реестра моделей
 try:
-    embeddings = HuggingFaceEmbeddings(model_name="sentence-transformers/paraphrase-multilingual-MiniLM-L12-v2")
+    embeddings = HuggingFaceEmbeddings(model_name=resolve("hf", FAISS_EMBEDDINGS_MODEL))
     logger.info("HuggingFace embeddings initialized successfully.")
 
 except Exception as e:
@@ -76,6 +78,7 @@ def add_document(data: Dict[str, Any]) -> None:
         FaissDB.projects_index = vector_store.index
         FaissDB.save_index(FaissDB.projects_index, FaissDB.PROJECTS_INDEX_FILE)
 
+    FaissDB.bump_version(doc_type)
     FaissDB.save_all()
 
 
@@ -109,6 +112,8 @@ def delete_object(doc_id: Any, doc_type: str) -> None:
     else:
         raise ValueError("Invalid document type for deletion")
 
+    FaissDB.bump_version(doc_type)
+
 
 def search_object(query_data: Dict[str, Any], top_k = None, threshold: float = 0.6) -> List[Dict[str, Any]]:
     query_type = (query_data.get("type") or query_data.get("Type") or "").lower().strip()
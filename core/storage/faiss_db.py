@@ -33,6 +33,11 @@ class FaissDB:
     candidates_data: Optional[faiss.Index] = []
     projects_data: Optional[faiss.Index] = []    
 
+    # Счётчики версий коллекций: увеличиваются при каждом добавлении и удалении объекта
+    # (используются для инвалидации кэша подбора в RAG.match_object)
+    candidates_version: int = 0
+    projects_version: int = 0
+
 
     @staticmethod
     def load_index(file_path) -> Optional[faiss.Index]:
@@ -82,6 +87,32 @@ class FaissDB:
         except Exception as e: logger.error(f"Error deleting index file {file_path}: {e}")
 
 
+    @classmethod
+    def bump_version(cls, doc_type: str) -> int:
+        """
+        Увеличивает счётчик версии коллекции после изменения её содержимого.
+
+        :param doc_type: Тип коллекции ("kandidate"/"программист" или "project"/"проект").
+        :return: Новая версия коллекции.
+        """
+        if doc_type in ["программист", "kandidate"]:
+            cls.candidates_version += 1
+            return cls.candidates_version
+
+        cls.projects_version += 1
+        return cls.projects_version
+
+
+    @classmethod
+    def get_version(cls, doc_type: str) -> int:
+        """
+        Возвращает текущую версию коллекции заданного типа.
+        """
+        if doc_type in ["программист", "kandidate"]:
+            return cls.candidates_version
+        return cls.projects_version
+
+
     @classmethod
     def initialize(cls):
         # Загрузка индексов
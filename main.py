@@ -1,5 +1,18 @@
-from cli.command import run_cli
+import sys
+from moduls.execution_profile import get_execution_profile
+from moduls.model_registry import apply_environment
+
+# Потоки OpenMP/MKL задаются через переменные окружения, поэтому профиль применяется до загрузки torch
+get_execution_profile().apply()
+# Кэши моделей и офлайн-режим huggingface_hub тоже задаются переменными окружения до импорта библиотек
+apply_environment()
 
 
 if __name__ == '__main__':
-    run_cli()
\ No newline at end of file
+    # python main.py prewarm — подготовка моделей без запуска CLI (индексы FAISS и ChatGPT не нужны)
+    if sys.argv[1:2] == ["prewarm"]:
+        from cli.prewarm import run_prewarm
+        run_prewarm(sys.argv[2:])
+    else:
+        from cli.command import run_cli
+        run_cli()
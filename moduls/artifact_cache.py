@@ -0,0 +1,251 @@
+import contextlib
+import hashlib
+import json
+import logging
+import os
+import shutil
+import threading
+import time
+from typing import Any, Dict, Iterator, Optional
+
+try:
+    import fcntl
+except ImportError:  # Windows
+    fcntl = None
+    import msvcrt
+
+# Ограничение размера кэша артефактов видео-пайплайна (в байтах), при превышении удаляются
+# давно не использовавшиеся записи (LRU).
+ARTIFACT_CACHE_MAX_BYTES = int(os.environ.get("ARTIFACT_CACHE_MAX_BYTES", 20 * 1024 ** 3))
+# Записи, к которым обращались за последние ARTIFACT_CACHE_GRACE_SECONDS секунд, не вытесняются: путь из get
+# мог быть выдан другому потоку (пакетная загрузка), который ещё не открыл файл.
+ARTIFACT_CACHE_GRACE_SECONDS = float(os.environ.get("ARTIFACT_CACHE_GRACE_SECONDS", 10 * 60))
+HASH_BLOCK_SIZE = 1 << 20
+
+logger = logging.getLogger(__name__)
+
+
+@contextlib.contextmanager
+def index_file_lock(path: str) -> Iterator[None]:
+    """
+    Межпроцессная блокировка индекса кэша: fcntl.flock, на Windows — msvcrt.locking первого байта файла path.
+    """
+    with open(path, "a+b") as f:
+        if fcntl is not None:
+            fcntl.flock(f, fcntl.LOCK_EX)
+        else:
+            f.seek(0)
+            while True:
+                try:
+                    msvcrt.locking(f.fileno(), msvcrt.LK_LOCK, 1)
+                    break
+                except OSError:
+                    # LK_LOCK сдаётся после 10 попыток по секунде; ждём, пока другой процесс сохранит индекс
+                    continue
+        try:
+            yield
+        finally:
+            if fcntl is not None:
+                fcntl.flock(f, fcntl.LOCK_UN)
+            else:
+                f.seek(0)
+                msvcrt.locking(f.fileno(), msvcrt.LK_UNLCK, 1)
+
+
+def file_sha256(path: str) -> str:
+    """
+    Считает SHA-256 содержимого файла блоками, не загружая его в память целиком.
+    """
+    digest = hashlib.sha256()
+    with open(path, "rb") as f:
+        for block in iter(lambda: f.read(HASH_BLOCK_SIZE), b""):
+            digest.update(block)
+    return digest.hexdigest()
+
+
+class ArtifactCache:
+    """
+    Кэш промежуточных артефактов видео-пайплайна (аудио, вокал, сегменты, RTTM, итоговый текст).
+
+    Каждая запись — каталог <root>/<key>/ с файлами этапа. Ключ этапа строится из хэша содержимого
+    видео, названия этапа и параметров, от которых зависит результат (см. stage_key), поэтому
+    этапы с неизменившимися параметрами при повторной обработке того же видео пропускаются.
+    Учёт размеров и времени последнего обращения хранится в index.json; при превышении квоты удаляются записи,
+    к которым дольше всего не обращались, кроме использованных за последние grace_seconds.
+    Кэш может использоваться несколькими процессами: индекс сохраняется под блокировкой index.json.lock,
+    а перед сохранением перечитывается с диска, и в него вносятся только изменения этого процесса.
+    """
+
+    def __init__(self, root: str, max_bytes: int = ARTIFACT_CACHE_MAX_BYTES,
+                 grace_seconds: float = ARTIFACT_CACHE_GRACE_SECONDS):
+        self.root = root
+        self.max_bytes = max_bytes
+        self.grace_seconds = grace_seconds
+        self.index_path = os.path.join(root, "index.json")
+        self._lock = threading.Lock()
+        # Записи, записанные или прочитанные этим процессом после последнего сохранения индекса
+        self._touched = set()
+        # Время обращения к записи, последним сохранённое этим процессом в index.json
+        self._saved_access: Dict[str, float] = {}
+        os.makedirs(root, exist_ok=True)
+        self._index = self._load_index()
+
+    def _load_index(self) -> Dict[str, Any]:
+        if os.path.exists(self.index_path):
+            try:
+                with open(self.index_path, "r", encoding="utf-8") as f:
+                    return json.load(f)
+            except Exception as e:
+                logger.error("Не удалось прочитать индекс кэша артефактов: %s", e)
+        return {"entries": {}, "hashes": {}}
+
+    def _save_index(self, evict: bool = False, keep: Optional[str] = None) -> None:
+        """
+        Сохраняет индекс (вызывается под self._lock). Под межпроцессной блокировкой индекс перечитывается
+        с диска, в него переносятся записи, изменённые этим процессом (списки файлов объединяются, время
+        обращения берётся последнее), и хэши; записи, вытесненные другими процессами, из памяти уходят.
+        При evict квота проверяется уже по объединённому индексу.
+        """
+        with index_file_lock(self.index_path + ".lock"):
+            merged = self._load_index()
+            entries = merged["entries"]
+            for key in self._touched:
+                mine = self._index["entries"].get(key)
+                if mine is None:
+                    continue
+                theirs = entries.get(key)
+                if theirs is not None:
+                    mine["files"] += [name for name in theirs["files"] if name not in mine["files"]]
+                    mine["size"] = self._entry_size(key, mine["files"])
+                    mine["last_access"] = max(mine.get("last_access", 0), theirs.get("last_access", 0))
+                entries[key] = mine
+            merged["hashes"].update(self._index["hashes"])
+            self._index = merged
+            if evict:
+                self._evict(keep=keep)
+
+            tmp_path = f"{self.index_path}.{os.getpid()}.tmp"
+            with open(tmp_path, "w", encoding="utf-8") as f:
+                json.dump(self._index, f, ensure_ascii=False)
+            os.replace(tmp_path, self.index_path)
+
+        for key in self._touched:
+            if key in entries:
+                self._saved_access[key] = entries[key].get("last_access", 0)
+        self._touched.clear()
+
+    def _entry_size(self, key: str, filenames: list) -> int:
+        directory = os.path.join(self.root, key)
+        return sum(os.path.getsize(os.path.join(directory, name)) for name in filenames
+                   if os.path.exists(os.path.join(directory, name)))
+
+    def content_hash(self, path: str) -> str:
+        """
+        Хэш содержимого файла. Результат запоминается по (пути, размеру, времени изменения),
+        чтобы не перечитывать многогигабайтное видео при каждом запуске.
+        """
+        stat = os.stat(path)
+        memo_key = os.path.abspath(path)
+        with self._lock:
+            memo = self._index["hashes"].get(memo_key)
+            if memo and memo["size"] == stat.st_size and memo["mtime_ns"] == stat.st_mtime_ns:
+                return memo["sha256"]
+
+        digest = file_sha256(path)
+        with self._lock:
+            self._index["hashes"][memo_key] = {"size": stat.st_size, "mtime_ns": stat.st_mtime_ns, "sha256": digest}
+            self._save_index()
+        return digest
+
+    @staticmethod
+    def stage_key(stage: str, content_hash: str, **params: Any) -> str:
+        """
+        Ключ артефакта этапа: хэш от содержимого входа, названия этапа и его параметров.
+        """
+        payload = json.dumps({"stage": stage, "input": content_hash, "params": params}, sort_keys=True)
+        return f"{stage}-{hashlib.sha256(payload.encode('utf-8')).hexdigest()[:32]}"
+
+    def entry_dir(self, key: str) -> str:
+        """
+        Каталог записи (создаётся при необходимости); файлы этапа пишутся сюда, затем вызывается commit.
+        """
+        path = os.path.join(self.root, key)
+        os.makedirs(path, exist_ok=True)
+        return path
+
+    def get(self, key: str, filename: str) -> Optional[str]:
+        """
+        Возвращает путь к артефакту, если он есть в кэше, и отмечает обращение к записи.
+        Время обращения сохраняется в индекс при первом обращении процесса к записи и затем не реже чем
+        раз в половину grace_seconds, чтобы другие процессы не вытеснили используемую запись.
+        """
+        with self._lock:
+            entry = self._index["entries"].get(key)
+            path = os.path.join(self.root, key, filename)
+            if entry is None or filename not in entry["files"] or not os.path.exists(path):
+                return None
+
+            now = time.time()
+            entry["last_access"] = now
+            self._touched.add(key)
+            if now - self._saved_access.get(key, 0) >= self.grace_seconds / 2:
+                self._save_index()
+        logger.info("Артефакт %s/%s взят из кэша.", key, filename)
+        return path
+
+    def commit(self, key: str, *filenames: str) -> None:
+        """
+        Регистрирует записанные в entry_dir(key) файлы и при превышении квоты вытесняет старые записи.
+        """
+        with self._lock:
+            entry = self._index["entries"].setdefault(key, {"files": [], "size": 0})
+            for filename in filenames:
+                if filename not in entry["files"]:
+                    entry["files"].append(filename)
+            entry["size"] = self._entry_size(key, entry["files"])
+            entry["last_access"] = time.time()
+            self._touched.add(key)
+            self._save_index(evict=True, keep=key)
+
+    def put_file(self, key: str, filename: str, source_path: str) -> str:
+        """
+        Копирует готовый файл в кэш и возвращает путь к копии.
+        """
+        target = os.path.join(self.entry_dir(key), filename)
+        if os.path.abspath(source_path) != os.path.abspath(target):
+            shutil.copyfile(source_path, target)
+        self.commit(key, filename)
+        return target
+
+    def get_text(self, key: str, filename: str) -> Optional[str]:
+        path = self.get(key, filename)
+        if path is None:
+            return None
+        with open(path, "r", encoding="utf-8") as f:
+            return f.read()
+
+    def put_text(self, key: str, filename: str, text: str) -> str:
+        target = os.path.join(self.entry_dir(key), filename)
+        with open(target, "w", encoding="utf-8") as f:
+            f.write(text)
+        self.commit(key, filename)
+        return target
+
+    def total_bytes(self) -> int:
+        return sum(entry["size"] for entry in self._index["entries"].values())
+
+    def _evict(self, keep: Optional[str] = None) -> None:
+        entries = self._index["entries"]
+        total = sum(entry["size"] for entry in entries.values())
+        recent = time.time() - self.grace_seconds
+        for key in sorted(entries, key=lambda k: entries[k].get("last_access", 0)):
+            if total <= self.max_bytes:
+                break
+            # Недавно выданные записи могут ещё читаться; квота временно превышается
+            if key == keep or entries[key].get("last_access", 0) >= recent:
+                continue
+
+            total -= entries[key]["size"]
+            shutil.rmtree(os.path.join(self.root, key), ignore_errors=True)
+            del entries[key]
+            logger.info("Запись %s вытеснена из кэша артефактов (квота %d байт).", key, self.max_bytes)
@@ -0,0 +1,293 @@
+import logging
+import os
+import re
+import shutil
+import subprocess
+import tempfile
+import wave
+from typing import Iterator, List, Optional, Tuple, Union
+import numpy as np
+from moduls.execution_profile import get_execution_profile
+
+
+# Параметры аудио, которые ожидают Whisper и NeMo.
+SAMPLE_RATE = 16000
+# Размер блока чтения PCM из stdout ffmpeg (в байтах).
+PCM_READ_BLOCK = 1 << 20
+
+# Потоковый режим: длина окна, которое целиком передаётся в Whisper, и перекрытие соседних окон (в секундах).
+STREAM_WINDOW_SECONDS = int(os.environ.get("STREAM_WINDOW_SECONDS", 600))
+STREAM_OVERLAP_SECONDS = int(os.environ.get("STREAM_OVERLAP_SECONDS", 10))
+# Записи длиннее этого порога (в секундах) по умолчанию обрабатываются в потоковом режиме.
+STREAM_MIN_DURATION_SECONDS = int(os.environ.get("STREAM_MIN_DURATION_SECONDS", 3600))
+# Диаризация в потоковом режиме: "windowed" — VAD и эмбеддинги спикеров по окнам с глобальной кластеризацией
+# (fast_diarization.StreamingDiarizer, память не растёт с длительностью записи), "full" — уровень
+# DIARIZATION_TIER один раз по всему записанному на диск WAV после транскрибации.
+STREAM_DIARIZATION = os.environ.get("STREAM_DIARIZATION", "windowed").lower()
+
+DURATION_PATTERN = re.compile(r"Duration:\s*(\d+):(\d+):(\d+(?:\.\d+)?)")
+
+logger = logging.getLogger(__name__)
+
+
+def find_ffmpeg() -> Optional[str]:
+    """
+    Возвращает путь к ffmpeg: локальный tools/ffmpeg.exe (Windows) или системный ffmpeg из PATH.
+
+    :return: Путь к исполняемому файлу или None, если ffmpeg не найден.
+    """
+    local_ffmpeg = os.path.abspath(os.path.join("tools", "ffmpeg.exe"))
+    if os.name == "nt" and os.path.exists(local_ffmpeg):
+        return local_ffmpeg
+    return shutil.which("ffmpeg")
+
+
+def _pcm_command(source: str, sample_rate: int) -> List[str]:
+    ffmpeg_path = find_ffmpeg()
+    if ffmpeg_path is None:
+        raise FileNotFoundError("ffmpeg не найден ни в tools/, ни в PATH")
+
+    threads = get_execution_profile().threads("audio")
+    return [
+        ffmpeg_path, "-nostdin", "-v", "error",
+        *(["-threads", str(threads)] if threads else []),
+        "-i", source,
+        "-vn",  # без видео
+        "-ac", "1",  # моно
+        "-ar", str(sample_rate),
+        "-f", "f32le",
+    ]
+
+
+def _read_stderr(stderr_file) -> str:
+    """
+    Читает вывод ffmpeg из временного файла. stderr пишется в файл, а не в канал: ffmpeg, заполнивший
+    буфер канала stderr (например, сообщениями о повреждённых кадрах), блокировался бы, пока читается
+    stdout, и чтение никогда бы не завершилось.
+    """
+    stderr_file.seek(0)
+    return stderr_file.read().decode(errors="ignore").strip()
+
+
+def extract_audio_pcm(video: str, output_path: Optional[str] = None,
+                      sample_rate: int = SAMPLE_RATE) -> Union[np.ndarray, str]:
+    """
+    Извлекает звуковую дорожку из видео сразу в 16 кГц моно float32 PCM, без промежуточного MP3.
+
+    ffmpeg декодирует и ресэмплирует дорожку за один проход. Без output_path PCM читается из
+    stdout ffmpeg блоками в numpy-буфер; с output_path ffmpeg пишет сырой PCM (f32le) в файл,
+    который затем можно открыть через numpy.memmap.
+
+    :param video: Путь к видеофайлу.
+    :param output_path: Необязательный путь к файлу для сырого PCM.
+    :param sample_rate: Частота дискретизации на выходе.
+    :return: Массив float32 с аудио или путь к файлу с сырым PCM.
+    :raises FileNotFoundError: Если ffmpeg не найден.
+    :raises RuntimeError: Если ffmpeg завершился с ошибкой.
+    """
+    command = _pcm_command(video, sample_rate)
+
+    if output_path is not None:
+        os.makedirs(os.path.dirname(os.path.abspath(output_path)), exist_ok=True)
+        result = subprocess.run(command + ["-y", output_path], stdout=subprocess.DEVNULL, stderr=subprocess.PIPE)
+        if result.returncode != 0:
+            raise RuntimeError(f"Ошибка ffmpeg при извлечении аудио: {result.stderr.decode(errors='ignore').strip()}")
+        return output_path
+
+    buffer = bytearray()
+    with tempfile.TemporaryFile() as stderr_file, \
+            subprocess.Popen(command + ["pipe:1"], stdout=subprocess.PIPE, stderr=stderr_file) as process:
+        while True:
+            block = process.stdout.read(PCM_READ_BLOCK)
+            if not block:
+                break
+            buffer += block
+        process.wait()
+        stderr = _read_stderr(stderr_file)
+
+    if process.returncode != 0:
+        raise RuntimeError(f"Ошибка ffmpeg при извлечении аудио: {stderr}")
+
+    return np.frombuffer(buffer, dtype=np.float32)
+
+
+def probe_duration(source: str) -> Optional[float]:
+    """
+    Возвращает длительность медиафайла в секундах по выводу ffmpeg или None, если её не удалось определить.
+    """
+    ffmpeg_path = find_ffmpeg()
+    if ffmpeg_path is None:
+        return None
+
+    result = subprocess.run([ffmpeg_path, "-nostdin", "-hide_banner", "-i", source],
+                            stdout=subprocess.DEVNULL, stderr=subprocess.PIPE)
+    match = DURATION_PATTERN.search(result.stderr.decode(errors="ignore"))
+    if match is None:
+        return None
+
+    hours, minutes, seconds = match.groups()
+    return int(hours) * 3600 + int(minutes) * 60 + float(seconds)
+
+
+def iter_pcm_windows(
+    source: str,
+    window_seconds: float = STREAM_WINDOW_SECONDS,
+    overlap_seconds: float = STREAM_OVERLAP_SECONDS,
+    sample_rate: int = SAMPLE_RATE,
+) -> Iterator[Tuple[int, np.ndarray]]:
+    """
+    Читает звуковую дорожку через ffmpeg окнами фиксированной длины с перекрытием.
+
+    В памяти одновременно находится не больше одного окна, поэтому потребление памяти не зависит
+    от длительности записи. Каждое следующее окно начинается за overlap_seconds до конца предыдущего.
+
+    :param source: Путь к видео- или аудиофайлу.
+    :param window_seconds: Длина окна в секундах.
+    :param overlap_seconds: Перекрытие соседних окон в секундах.
+    :param sample_rate: Частота дискретизации на выходе.
+    :return: Итератор пар (номер первого сэмпла окна, массив float32 окна).
+    :raises FileNotFoundError: Если ffmpeg не найден.
+    :raises RuntimeError: Если ffmpeg завершился с ошибкой.
+    """
+    window = int(window_seconds * sample_rate)
+    overlap = int(overlap_seconds * sample_rate)
+    if not 0 <= overlap < window:
+        raise ValueError("Перекрытие должно быть неотрицательным и меньше длины окна")
+
+    buffer = np.empty(window, dtype=np.float32)
+    filled, start = 0, 0
+    tail = b""
+
+    with tempfile.TemporaryFile() as stderr_file, \
+            subprocess.Popen(_pcm_command(source, sample_rate) + ["pipe:1"],
+                             stdout=subprocess.PIPE, stderr=stderr_file) as process:
+        try:
+            while True:
+                block = process.stdout.read(min(PCM_READ_BLOCK, (window - filled) * 4) or 4)
+                if not block:
+                    break
+
+                # Блок может оборваться посреди сэмпла: остаток переносим в следующий блок
+                block = tail + block
+                usable = len(block) - len(block) % 4
+                tail = block[usable:]
+                samples = np.frombuffer(block[:usable], dtype=np.float32)
+                buffer[filled:filled + len(samples)] = samples
+                filled += len(samples)
+
+                if filled == window:
+                    yield start, buffer.copy()
+                    buffer[:overlap] = buffer[window - overlap:]
+                    filled, start = overlap, start + window - overlap
+
+            # Последнее неполное окно отдаём, только если в нём есть что-то кроме уже отданного перекрытия
+            if filled > overlap or (start == 0 and filled > 0):
+                yield start, buffer[:filled].copy()
+            process.wait()
+            stderr = _read_stderr(stderr_file)
+        finally:
+            if process.poll() is None:
+                process.kill()
+
+    if process.returncode != 0:
+        raise RuntimeError(f"Ошибка ffmpeg при извлечении аудио: {stderr}")
+
+
+class IncrementalWavWriter:
+    """
+    Пишет моно WAV (16 бит) по частям, не держа всю запись в памяти.
+
+    Окна из iter_pcm_windows передаются в write вместе с номером первого сэмпла;
+    уже записанная часть перекрытия пропускается.
+    """
+
+    def __init__(self, path: str, sample_rate: int = SAMPLE_RATE):
+        os.makedirs(os.path.dirname(os.path.abspath(path)), exist_ok=True)
+        self.path = path
+        self.written = 0
+        self._wav = wave.open(path, "wb")
+        self._wav.setnchannels(1)
+        self._wav.setsampwidth(2)
+        self._wav.setframerate(sample_rate)
+
+    def write(self, start: int, samples: np.ndarray) -> None:
+        new_samples = samples[max(self.written - start, 0):]
+        pcm = (np.clip(new_samples, -1.0, 1.0) * 32767).astype("<i2")
+        self._wav.writeframes(pcm.tobytes())
+        self.written += len(new_samples)
+
+    def close(self) -> None:
+        self._wav.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        self.close()
+
+
+def open_wav_memmap(path: str) -> np.ndarray:
+    """
+    Отображает PCM 16 бит моно WAV (например, записанный IncrementalWavWriter) в память без чтения файла целиком.
+
+    :return: np.memmap int16 с сэмплами.
+    """
+    with wave.open(path, "rb") as wav:
+        if wav.getsampwidth() != 2 or wav.getnchannels() != 1:
+            raise ValueError(f"Ожидается PCM 16 бит моно: {path}")
+        frames = wav.getnframes()
+    # Данные — последний блок файла (заголовок IncrementalWavWriter — стандартные 44 байта)
+    offset = os.path.getsize(path) - frames * 2
+    return np.memmap(path, dtype="<i2", mode="r", offset=offset, shape=(frames,))
+
+
+class SegmentStitcher:
+    """
+    Склеивает сегменты Whisper, полученные по перекрывающимся окнам, без дублей на границах.
+
+    Граница между окнами проходит по середине перекрытия: сегмент принадлежит окну, в чью часть
+    попадает его середина. Сегменты после границы откладываются и отбрасываются, когда приходит
+    следующее окно (в нём они распознаны с полным контекстом), или добавляются в finish,
+    если окно оказалось последним. Сегмент, который почти целиком перекрывается с уже принятым,
+    тоже отбрасывается.
+    """
+
+    def __init__(self, overlap_ms: int):
+        self.overlap_ms = overlap_ms
+        self.segments: List[dict] = []
+        self._boundary = 0
+        self._pending: List[dict] = []
+
+    def _accept(self, segment: dict) -> None:
+        if self.segments:
+            previous = self.segments[-1]
+            duration = max(segment["end"] - segment["start"], 1)
+            overlap = min(previous["end"], segment["end"]) - max(previous["start"], segment["start"])
+            if overlap > duration / 2:
+                return
+        self.segments.append(segment)
+
+    def add(self, segments: List[dict], window_start_ms: int, window_end_ms: int) -> None:
+        """
+        Добавляет сегменты окна (тайминги в мс от начала записи).
+        """
+        cut = window_end_ms - self.overlap_ms // 2
+        self._pending = []
+        for segment in segments:
+            middle = (segment["start"] + segment["end"]) / 2
+            if middle < self._boundary:
+                continue
+            if middle < cut:
+                self._accept(segment)
+            else:
+                self._pending.append(segment)
+        self._boundary = cut
+
+    def finish(self) -> List[dict]:
+        """
+        Добавляет отложенные сегменты последнего окна и возвращает итоговый список.
+        """
+        for segment in self._pending:
+            self._accept(segment)
+        self._pending = []
+        return self.segments
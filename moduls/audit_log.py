@@ -0,0 +1,146 @@
+import atexit
+import gzip
+import hashlib
+import json
+import logging
+import logging.handlers
+import os
+import queue
+import shutil
+import threading
+import time
+from typing import Any, Dict, Optional
+from dotenv import load_dotenv
+
+
+load_dotenv()
+
+# Настройки журнала аудита ответов ChatGPT (переопределяются переменными окружения).
+AUDIT_LOG_PATH = os.getenv("GPT_AUDIT_LOG_PATH", os.path.join(os.getcwd(), "logs", "gpt_audit.jsonl"))
+AUDIT_MAX_BYTES = int(os.getenv("GPT_AUDIT_MAX_BYTES", 10 * 1024 * 1024))
+AUDIT_ROTATE_SECONDS = int(os.getenv("GPT_AUDIT_ROTATE_SECONDS", 24 * 60 * 60))
+AUDIT_BACKUP_COUNT = int(os.getenv("GPT_AUDIT_BACKUP_COUNT", 5))
+AUDIT_COMPRESS = os.getenv("GPT_AUDIT_COMPRESS", "1") == "1"
+# Полный исходный текст сохраняется только при явном включении, по умолчанию пишется лишь его хэш.
+AUDIT_KEEP_TEXT = os.getenv("GPT_AUDIT_KEEP_TEXT", "0") == "1"
+
+logger = logging.getLogger(__name__)
+
+
+class SizeAndTimeRotatingFileHandler(logging.handlers.RotatingFileHandler):
+    """
+    RotatingFileHandler, который ротирует файл не только по размеру, но и по возрасту.
+    При включённом сжатии архивные файлы сохраняются как .gz.
+    """
+
+    def __init__(self, filename: str, max_bytes: int, rotate_seconds: int, backup_count: int, compress: bool):
+        super().__init__(filename, maxBytes=max_bytes, backupCount=backup_count, encoding="utf-8", delay=True)
+        self.rotate_seconds = rotate_seconds
+        self.opened_at = time.time()
+        if compress:
+            self.namer = lambda name: name + ".gz"
+            self.rotator = self._compress
+
+    @staticmethod
+    def _compress(source: str, dest: str) -> None:
+        with open(source, "rb") as src, gzip.open(dest, "wb") as dst:
+            shutil.copyfileobj(src, dst)
+        os.remove(source)
+
+    def shouldRollover(self, record: logging.LogRecord) -> bool:
+        if self.rotate_seconds > 0 and time.time() - self.opened_at >= self.rotate_seconds:
+            if os.path.exists(self.baseFilename) and os.path.getsize(self.baseFilename) > 0:
+                return True
+        return super().shouldRollover(record)
+
+    def doRollover(self) -> None:
+        super().doRollover()
+        self.opened_at = time.time()
+
+
+class GPTAuditLog:
+    """
+    Неблокирующий структурированный журнал ответов ChatGPT в формате JSONL.
+
+    Вызов record только кладёт запись в очередь; запись на диск, ротация по размеру/времени
+    и сжатие архивов выполняются в фоновом потоке (logging.handlers.QueueListener).
+    Вместо исходного текста сохраняется его SHA-256 и длина; полный текст пишется только
+    при keep_text=True.
+    """
+
+    def __init__(
+        self,
+        path: str = AUDIT_LOG_PATH,
+        max_bytes: int = AUDIT_MAX_BYTES,
+        rotate_seconds: int = AUDIT_ROTATE_SECONDS,
+        backup_count: int = AUDIT_BACKUP_COUNT,
+        compress: bool = AUDIT_COMPRESS,
+        keep_text: bool = AUDIT_KEEP_TEXT,
+    ):
+        self.path = path
+        self.keep_text = keep_text
+        os.makedirs(os.path.dirname(os.path.abspath(path)), exist_ok=True)
+
+        file_handler = SizeAndTimeRotatingFileHandler(path, max_bytes, rotate_seconds, backup_count, compress)
+        file_handler.setFormatter(logging.Formatter("%(message)s"))
+
+        self._queue = queue.SimpleQueue()
+        self._listener = logging.handlers.QueueListener(self._queue, file_handler)
+        self._logger = logging.getLogger(f"{__name__}.{os.path.abspath(path)}")
+        self._logger.setLevel(logging.INFO)
+        self._logger.propagate = False
+        self._logger.addHandler(logging.handlers.QueueHandler(self._queue))
+        self._listener.start()
+        self._running = True
+        self._close_lock = threading.Lock()
+        atexit.register(self.close)
+
+    def record(self, text: str, data: Dict[str, Any], **extra: Any) -> None:
+        """
+        Добавляет запись в журнал, не дожидаясь записи на диск.
+
+        :param text: Исходный текст, отправленный на анализ.
+        :param data: Итоговый словарь, полученный от ChatGPT.
+        :param extra: Дополнительные поля записи (например, режим обработки).
+        """
+        entry = {
+            "ts": time.strftime("%Y-%m-%dT%H:%M:%S%z"),
+            "input_sha256": hashlib.sha256(text.encode("utf-8")).hexdigest(),
+            "input_chars": len(text),
+            "output": data,
+            **extra,
+        }
+        if self.keep_text:
+            entry["input_text"] = text
+
+        try:
+            self._logger.info(json.dumps(entry, ensure_ascii=False, default=str))
+        except Exception as e:
+            logger.error("Ошибка при записи в журнал аудита: %s", e)
+
+    def close(self) -> None:
+        """
+        Дописывает накопившиеся записи и останавливает фоновый поток.
+        """
+        with self._close_lock:
+            if not self._running:
+                return
+            self._running = False
+        self._listener.stop()
+        for handler in self._listener.handlers:
+            handler.close()
+
+
+_audit_log: Optional[GPTAuditLog] = None
+_audit_log_lock = threading.Lock()
+
+
+def get_audit_log() -> GPTAuditLog:
+    """
+    Возвращает общий для процесса журнал аудита (создаётся при первом обращении).
+    """
+    global _audit_log
+    with _audit_log_lock:
+        if _audit_log is None:
+            _audit_log = GPTAuditLog()
+    return _audit_log
@@ -0,0 +1,368 @@
+import logging
+import os
+import queue
+import threading
+import time
+from typing import Any, Callable, Dict, Iterable, List, Optional, Tuple
+from moduls.execution_profile import ExecutionProfile, set_execution_profile
+
+
+# Количество потоков на этап пакетной загрузки видео, например "audio=2,summary=4".
+# Не указанные этапы получают DEFAULT_STAGE_WORKERS.
+INGEST_WORKERS = os.environ.get("INGEST_WORKERS", "")
+# Ёмкость очереди между соседними этапами: ограничивает число видео, ожидающих обработки
+# (и держащих аудио в памяти) перед каждым этапом.
+INGEST_QUEUE_SIZE = int(os.environ.get("INGEST_QUEUE_SIZE", 2))
+DEFAULT_STAGE_WORKERS = {
+    "audio": 2, "separate": 1, "transcribe": 1, "diarize": 1, "punctuate": 1, "summary": 4, "index": 1,
+}
+VIDEO_EXTENSIONS = (".mp4", ".mkv", ".avi", ".mov", ".webm", ".m4v", ".mp3", ".wav", ".m4a")
+
+logger = logging.getLogger(__name__)
+
+_DONE = object()
+
+
+class PipelineStage:
+    """
+    Этап конвейера: функция job -> job и число потоков, которые её выполняют.
+    Собирает статистику: обработанные и упавшие задачи, суммарное время работы потоков.
+    """
+
+    def __init__(self, name: str, func: Callable[[dict], dict], workers: int = 1):
+        self.name = name
+        self.func = func
+        self.workers = max(int(workers), 1)
+        self.processed = 0
+        self.failed = 0
+        self.busy_seconds = 0.0
+        self._lock = threading.Lock()
+
+    def process(self, job: dict) -> dict:
+        # Задача, упавшая на одном из предыдущих этапов, проходит дальше без обработки
+        if job.get("error"):
+            return job
+
+        started = time.perf_counter()
+        try:
+            job = self.func(job)
+            failed = False
+        except Exception as e:
+            logger.error("Этап %s, %s: %s", self.name, job.get("name"), e)
+            job["error"] = f"{self.name}: {e}"
+            failed = True
+
+        with self._lock:
+            self.busy_seconds += time.perf_counter() - started
+            self.processed += 1
+            self.failed += int(failed)
+        return job
+
+
+class StagedPipeline:
+    """
+    Конвейер из этапов, соединённых ограниченными очередями.
+
+    У каждого этапа свой пул потоков, поэтому разные этапы одновременно обрабатывают разные задачи
+    (например, ffmpeg для видео N+1 идёт параллельно с Whisper для видео N), а ограниченные очереди
+    не дают быстрым этапам накопить в памяти больше queue_size задач перед медленным.
+    Ошибка на этапе не останавливает конвейер: задача помечается полем "error" и проходит дальше без обработки.
+    """
+
+    def __init__(self, stages: List[PipelineStage], queue_size: int = INGEST_QUEUE_SIZE):
+        self.stages = stages
+        self.queue_size = max(queue_size, 1)
+        self.wall_seconds = 0.0
+
+    def _worker(self, stage: PipelineStage, inbox: queue.Queue, outbox: queue.Queue,
+                remaining: List[int], lock: threading.Lock, next_workers: int) -> None:
+        while True:
+            job = inbox.get()
+            if job is _DONE:
+                break
+            outbox.put(stage.process(job))
+
+        # Последний завершившийся поток этапа сообщает о конце потока задач следующему этапу
+        with lock:
+            remaining[0] -= 1
+            last = remaining[0] == 0
+        if last:
+            for _ in range(next_workers):
+                outbox.put(_DONE)
+
+    def run(self, jobs: Iterable[dict]) -> List[dict]:
+        """
+        Прогоняет задачи через все этапы.
+
+        :param jobs: Задачи (словари); поле "name" используется в логах.
+        :return: Задачи после последнего этапа в порядке завершения.
+        """
+        queues = [queue.Queue(self.queue_size) for _ in self.stages] + [queue.Queue()]
+        threads = []
+        for i, stage in enumerate(self.stages):
+            next_workers = self.stages[i + 1].workers if i + 1 < len(self.stages) else 1
+            remaining, lock = [stage.workers], threading.Lock()
+            for n in range(stage.workers):
+                thread = threading.Thread(
+                    target=self._worker, name=f"ingest-{stage.name}-{n}", daemon=True,
+                    args=(stage, queues[i], queues[i + 1], remaining, lock, next_workers),
+                )
+                thread.start()
+                threads.append(thread)
+
+        started = time.perf_counter()
+
+        def feed():
+            for job in jobs:
+                queues[0].put(job)
+            for _ in range(self.stages[0].workers):
+                queues[0].put(_DONE)
+
+        feeder = threading.Thread(target=feed, name="ingest-feeder", daemon=True)
+        feeder.start()
+
+        results = []
+        while True:
+            job = queues[-1].get()
+            if job is _DONE:
+                break
+            results.append(job)
+            logger.info("Пакетная загрузка: %s завершено (%d)", job.get("name"), len(results))
+
+        for thread in threads + [feeder]:
+            thread.join()
+        self.wall_seconds = time.perf_counter() - started
+        return results
+
+    def format_report(self, results: List[dict]) -> str:
+        """
+        Отчёт о прогоне: загрузка каждого этапа (доля времени, которую его потоки были заняты)
+        и пропускная способность в видео в час.
+        """
+        wall = max(self.wall_seconds, 1e-9)
+        succeeded = sum(1 for job in results if not job.get("error"))
+        lines = [f"Обработано {succeeded} из {len(results)} за {wall:.1f} с "
+                 f"({succeeded / wall * 3600:.1f} видео/час)"]
+        for stage in self.stages:
+            avg = stage.busy_seconds / stage.processed if stage.processed else 0
+            lines.append(
+                f"    {stage.name:<10} потоков {stage.workers}, задач {stage.processed} (ошибок {stage.failed}), "
+                f"ср. {avg:.1f} с, загрузка {stage.busy_seconds / (wall * stage.workers):.0%}"
+            )
+        return "\n".join(lines)
+
+
+def parse_workers(spec: str = INGEST_WORKERS) -> Dict[str, int]:
+    """
+    Разбирает строку вида "audio=2,summary=4" поверх DEFAULT_STAGE_WORKERS.
+    """
+    workers = dict(DEFAULT_STAGE_WORKERS)
+    for item in filter(None, (part.strip() for part in spec.split(","))):
+        name, _, count = item.partition("=")
+        workers[name.strip()] = int(count)
+    return workers
+
+
+def collect_videos(sources: Iterable[str]) -> List[str]:
+    """
+    Разворачивает список путей: каталоги заменяются содержащимися в них видео- и аудиофайлами.
+    """
+    videos = []
+    for source in sources:
+        if os.path.isdir(source):
+            videos.extend(
+                os.path.join(source, name) for name in sorted(os.listdir(source))
+                if name.lower().endswith(VIDEO_EXTENSIONS)
+            )
+        elif os.path.isfile(source):
+            videos.append(source)
+        else:
+            logger.warning("Пакетная загрузка: %s не найден", source)
+    return videos
+
+
+def build_video_ingest_stages(
+    assistant: Any,
+    index: Callable[[dict], Tuple[bool, Any]],
+    workers: Optional[Dict[str, int]] = None,
+    model_name: str = "large",
+    language: Optional[str] = "ru",
+    no_stem: bool = True,
+    batch_size: int = 8,
+    suppress_numerals: bool = False,
+    use_cache: bool = True,
+) -> List[PipelineStage]:
+    """
+    Этапы пакетной загрузки видео, повторяющие extraction_text + process_text_summary + add_object:
+    audio (ffmpeg) -> separate (demucs) -> transcribe (Whisper) -> diarize (NeMo) -> punctuate -> summary (GPT) -> index.
+
+    Этапы используют те же записи кэша артефактов, что extraction_text и start_diarize: готовый текст
+    пропускает этапы до summary, а аудио, вокал, сегменты Whisper и RTTM из кэша — соответствующие этапы
+    (аудио не извлекается вовсе, если сегменты и RTTM уже есть). Посчитанные этапы сохраняются в кэш.
+
+    :param assistant: Объект GPTAssistant.
+    :param index: Функция добавления словаря в индекс (RAG.add_object).
+    :param workers: Число потоков по этапам (по умолчанию parse_workers()).
+    :return: Список этапов для StagedPipeline.
+    """
+    import json
+    import faster_whisper
+    import numpy as np
+    import torch
+    from moduls import helpers_diaraize as helpers
+    from moduls import video_processing as vp
+    from moduls.source_separation import isolate_vocals, needs_separation
+    from moduls.text_processing import process_text_summary
+    from moduls.workspace import job_workspace
+
+    workers = workers or parse_workers()
+    device = "cuda" if torch.cuda.is_available() else "cpu"
+    language = helpers.process_language_arg(language, model_name)
+    cache = vp.get_artifact_cache() if use_cache else None
+
+    def cached(job, stage, filename):
+        return cache.get(job["keys"][stage], filename) if cache is not None else None
+
+    def audio(job):
+        if cache is not None:
+            job["keys"] = vp.stage_keys(cache.content_hash(job["video"]), no_stem, model_name, language,
+                                        batch_size, suppress_numerals)
+            job["text"] = cache.get_text(job["keys"]["transcript"], "transcript.txt")
+        if job.get("text") is not None:
+            return job
+
+        segments_path, rttm_path = cached(job, "segments", "segments.json"), cached(job, "rttm", "mono_file.rttm")
+        if segments_path is not None:
+            with open(segments_path, "r", encoding="utf-8") as f:
+                segments = json.load(f)
+            job["segments"], job["language"] = segments["segments"], segments["language"]
+        if rttm_path is not None:
+            job["speaker_ts"] = vp.read_rttm(rttm_path)
+        # Аудио нужно только если сегменты или RTTM не взяты из кэша
+        job["needs_audio"] = segments_path is None or rttm_path is None
+        if not job["needs_audio"]:
+            return job
+
+        vocals_path = cached(job, "vocals", "vocals.npy") if no_stem else None
+        audio_path = cached(job, "audio", "audio.npy")
+        if vocals_path is not None:
+            job["audio"], job["separated"] = np.load(vocals_path), True
+        elif audio_path is not None:
+            job["audio"] = np.load(audio_path)
+        elif vp.find_ffmpeg() is not None:
+            job["audio"] = vp.extract_audio_pcm(job["video"])
+            if cache is not None:
+                np.save(os.path.join(cache.entry_dir(job["keys"]["audio"]), "audio.npy"), job["audio"])
+                cache.commit(job["keys"]["audio"], "audio.npy")
+        else:
+            with job_workspace("audio") as audio_dir:
+                job["audio"] = faster_whisper.decode_audio(vp.start_extract_audio(job["video"], audio_dir))
+        return job
+
+    def separate(job):
+        if job.get("needs_audio") and no_stem and not job.get("separated") and needs_separation(job["audio"]):
+            separated = isolate_vocals(job["audio"], device, skip_snr_db=0)
+            if separated is not job["audio"] and cache is not None:
+                np.save(os.path.join(cache.entry_dir(job["keys"]["vocals"]), "vocals.npy"), separated)
+                cache.commit(job["keys"]["vocals"], "vocals.npy")
+            job["audio"] = separated
+        return job
+
+    def transcribe(job):
+        if job.get("needs_audio"):
+            # Общий VAD (SHARED_VAD=1): те же участки речи затем получает диаризация
+            job["speech"], job["vad_report"] = vp.detect_speech(job["audio"])
+        if job.get("text") is None and "segments" not in job:
+            job["segments"], job["language"] = vp.transcribe(job["audio"], model_name, language, batch_size,
+                                                             suppress_numerals, device, job["speech"])
+            if cache is not None:
+                cache.put_text(job["keys"]["segments"], "segments.json",
+                               json.dumps({"language": job["language"], "segments": job["segments"]},
+                                          ensure_ascii=False))
+        return job
+
+    def diarize(job):
+        if job.get("text") is None and "speaker_ts" not in job:
+            # У каждой задачи свой слот рабочего каталога; модель NeMo в пуле хранится по слоту и переиспользуется
+            with job_workspace("diarize") as temp_path:
+                rttm_path = vp.diarize_waveform(job["audio"], temp_path, device, speech=job["speech"])
+                job["speaker_ts"] = vp.read_rttm(rttm_path)
+                if cache is not None:
+                    cache.put_file(job["keys"]["rttm"], "mono_file.rttm", rttm_path)
+        job.pop("audio", None)
+        job.pop("speech", None)
+        return job
+
+    def punctuate(job):
+        if job.get("text") is None:
+            sentences = vp.build_sentences(job.pop("segments"), job.pop("speaker_ts"), job["language"], device)
+            job["text"] = vp.emit_transcript(sentences, cache=cache,
+                                             key=job["keys"]["transcript"] if cache is not None else None)
+        return job
+
+    def summary(job):
+        text = job["text"]
+        if job.get("txt"):
+            with open(job["txt"], "r", encoding="utf-8") as f:
+                text += "\n" + f.read().strip()
+        job["summary"] = process_text_summary(text, assistant)
+        if not job["summary"]:
+            raise ValueError("парсер вернул пустой результат")
+        return job
+
+    def add(job):
+        success, result = index(job["summary"])
+        if not success:
+            raise RuntimeError(result)
+        job["object_id"] = result
+        return job
+
+    funcs = [("audio", audio), ("separate", separate), ("transcribe", transcribe), ("diarize", diarize),
+             ("punctuate", punctuate), ("summary", summary), ("index", add)]
+    return [PipelineStage(name, func, workers.get(name, 1)) for name, func in funcs]
+
+
+def ingest_videos(assistant: Any, sources: Iterable[str], index: Callable[[dict], Tuple[bool, Any]],
+                  **options: Any) -> str:
+    """
+    Пакетно добавляет видео в индекс через конвейер build_video_ingest_stages.
+
+    Рядом с видео может лежать одноимённый .txt с дополнительным описанием — он добавляется к тексту.
+
+    :param assistant: Объект GPTAssistant.
+    :param sources: Пути к видео и/или каталогам с видео.
+    :param index: Функция добавления словаря в индекс (RAG.add_object).
+    :param options: Параметры build_video_ingest_stages.
+    :return: Итоговое сообщение: результат по каждому видео и отчёт о загрузке этапов.
+    """
+    videos = collect_videos(sources)
+    if not videos:
+        return "Видео для загрузки не найдены."
+
+    jobs = []
+    for n, video in enumerate(videos):
+        txt_path = os.path.splitext(video)[0] + ".txt"
+        jobs.append({"id": f"job{n}", "name": os.path.basename(video), "video": video,
+                     "txt": txt_path if os.path.exists(txt_path) else None})
+
+    # Все этапы работают одновременно: ядра делятся между ними по профилю выполнения
+    workers = options.pop("workers", None) or parse_workers()
+    profile = ExecutionProfile(stage_workers=workers)
+    previous_profile = set_execution_profile(profile)
+    try:
+        pipeline = StagedPipeline(build_video_ingest_stages(assistant, index, workers=workers, **options))
+        results = pipeline.run(jobs)
+    finally:
+        set_execution_profile(previous_profile)
+
+    messages = []
+    for job in sorted(results, key=lambda j: int(j["id"][3:])):
+        if job.get("error"):
+            messages.append(f"{job['name']}: ошибка ({job['error']})")
+        else:
+            messages.append(f"{job['name']}: объект успешно добавлен, ID: {job['object_id']}")
+            if job.get("vad_report"):
+                messages.append(f"    {job['vad_report']}")
+    messages.append(pipeline.format_report(results))
+    messages.append(profile.describe())
+    return "\n".join(messages)
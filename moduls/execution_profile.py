@@ -0,0 +1,172 @@
+import logging
+import os
+import sys
+import threading
+from typing import Dict, Optional
+
+
+# Профиль выполнения на CPU: распределение ядер между этапами пайплайна.
+#   EXEC_PROFILE=auto - ядра определяются автоматически и делятся между этапами (по умолчанию);
+#   EXEC_PROFILE=off  - каждая библиотека выбирает число потоков сама (прежнее поведение).
+EXEC_PROFILE = os.environ.get("EXEC_PROFILE", "auto").lower()
+# Явное число ядер (0 — определить по affinity и квоте cgroup).
+EXEC_CORES = int(os.environ.get("EXEC_CORES", 0))
+# Относительная доля ядер этапов при одновременной работе, например "transcribe=4,diarize=2".
+EXEC_STAGE_WEIGHTS = os.environ.get("EXEC_STAGE_WEIGHTS", "")
+
+DEFAULT_STAGE_WEIGHTS = {
+    "audio": 0.5, "separate": 2, "transcribe": 4, "diarize": 2, "punctuate": 1, "summary": 0, "index": 0.5,
+}
+# Этапы, которые считают через torch: у torch один пул потоков на процесс, поэтому их бюджеты складываются.
+TORCH_STAGES = ("separate", "diarize", "punctuate", "index")
+
+logger = logging.getLogger(__name__)
+
+
+def available_cores() -> int:
+    """
+    Количество ядер, доступных процессу: с учётом привязки к ядрам (sched_getaffinity)
+    и квоты CPU в cgroup v2 (cpu.max) для контейнеров.
+    """
+    if EXEC_CORES > 0:
+        return EXEC_CORES
+
+    cores = len(os.sched_getaffinity(0)) if hasattr(os, "sched_getaffinity") else (os.cpu_count() or 1)
+    try:
+        with open("/sys/fs/cgroup/cpu.max") as f:
+            quota, period = f.read().split()[:2]
+        if quota != "max":
+            cores = min(cores, max(int(int(quota) / int(period)), 1))
+    except (OSError, ValueError):
+        pass
+    return max(cores, 1)
+
+
+def parse_weights(spec: str = EXEC_STAGE_WEIGHTS) -> Dict[str, float]:
+    """
+    Разбирает строку вида "transcribe=4,diarize=2" поверх DEFAULT_STAGE_WEIGHTS.
+    """
+    weights = dict(DEFAULT_STAGE_WEIGHTS)
+    for item in filter(None, (part.strip() for part in spec.split(","))):
+        name, _, weight = item.partition("=")
+        weights[name.strip()] = float(weight)
+    return weights
+
+
+class ExecutionProfile:
+    """
+    Бюджеты потоков для этапов пайплайна.
+
+    Без stage_workers этапы выполняются по очереди (extraction_text), и каждому достаются все ядра.
+    Со stage_workers (пакетная загрузка, все этапы работают одновременно) ядра делятся между этапами
+    пропорционально весам, а доля этапа — между его параллельными задачами. Whisper (CTranslate2) получает
+    свой бюджет через cpu_threads; этапы на torch делят общий пул intra-op потоков torch, размер которого —
+    сумма их бюджетов. Загрузчики данных NeMo в этом режиме не порождают дополнительных процессов.
+    """
+
+    def __init__(self, cores: Optional[int] = None, stage_workers: Optional[Dict[str, int]] = None,
+                 weights: Optional[Dict[str, float]] = None, enabled: bool = EXEC_PROFILE != "off"):
+        self.cores = cores or available_cores()
+        self.stage_workers = stage_workers
+        self.weights = weights or parse_weights()
+        self.enabled = enabled
+        self.budgets = self._partition()
+
+    def _partition(self) -> Dict[str, int]:
+        if self.stage_workers is None:
+            return {stage: self.cores for stage in self.weights}
+
+        active = {stage: weight for stage, weight in self.weights.items()
+                  if weight > 0 and self.stage_workers.get(stage, 0) > 0}
+        total = sum(active.values()) or 1
+        budgets = {}
+        for stage, weight in self.weights.items():
+            share = self.cores * weight / total if stage in active else 0
+            budgets[stage] = max(int(share // self.stage_workers.get(stage, 1)), 1)
+        return budgets
+
+    def threads(self, stage: str) -> int:
+        """
+        Число потоков для одной задачи этапа; 0 — выбор оставляется библиотеке (профиль выключен).
+        """
+        if not self.enabled:
+            return 0
+        return self.budgets.get(stage, 1)
+
+    @property
+    def torch_threads(self) -> int:
+        if not self.enabled:
+            return 0
+        if self.stage_workers is None:
+            return self.cores
+        torch_total = sum(self.budgets[stage] * self.stage_workers.get(stage, 1) for stage in TORCH_STAGES
+                          if stage in self.budgets and self.stage_workers.get(stage, 0) > 0)
+        return max(min(torch_total, self.cores), 1)
+
+    @property
+    def dataloader_workers(self) -> int:
+        """
+        Число процессов загрузки данных NeMo: только при последовательной работе и достаточном числе ядер.
+        """
+        if not self.enabled or self.stage_workers is not None:
+            return 0
+        return min(self.cores // 8, 2)
+
+    def apply(self) -> None:
+        """
+        Применяет профиль к библиотекам, которые выбирают число потоков на процесс:
+        переменные окружения OpenMP/MKL/OpenBLAS (действуют на ещё не загруженные библиотеки)
+        и пул потоков torch (если torch уже загружен).
+        """
+        if not self.enabled:
+            return
+
+        threads = str(self.torch_threads)
+        for name in ("OMP_NUM_THREADS", "MKL_NUM_THREADS", "OPENBLAS_NUM_THREADS"):
+            os.environ.setdefault(name, threads)
+        # Токенизаторы HuggingFace иначе запускают собственный пул на все ядра
+        os.environ.setdefault("TOKENIZERS_PARALLELISM", "false")
+
+        torch = sys.modules.get("torch")
+        if torch is not None:
+            torch.set_num_threads(self.torch_threads)
+            try:
+                torch.set_num_interop_threads(1)
+            except RuntimeError:
+                # Межоперационный пул можно задать только до первой параллельной операции
+                pass
+        logger.info("Профиль выполнения: %d ядер, потоки по этапам %s, torch %d.",
+                    self.cores, self.budgets, self.torch_threads)
+
+    def describe(self) -> str:
+        if not self.enabled:
+            return "Профиль выполнения выключен (EXEC_PROFILE=off)."
+        stages = ", ".join(f"{stage}={threads}" for stage, threads in self.budgets.items()
+                           if self.stage_workers is None or self.stage_workers.get(stage, 0) > 0)
+        return f"Ядер: {self.cores}; потоков на задачу: {stages}; torch: {self.torch_threads}"
+
+
+_execution_profile: Optional[ExecutionProfile] = None
+_execution_profile_lock = threading.Lock()
+
+
+def get_execution_profile() -> ExecutionProfile:
+    """
+    Возвращает текущий профиль выполнения (по умолчанию — для последовательной работы этапов).
+    """
+    global _execution_profile
+    with _execution_profile_lock:
+        if _execution_profile is None:
+            _execution_profile = ExecutionProfile()
+    return _execution_profile
+
+
+def set_execution_profile(profile: ExecutionProfile) -> ExecutionProfile:
+    """
+    Делает профиль текущим и применяет его. Возвращает предыдущий профиль.
+    """
+    global _execution_profile
+    with _execution_profile_lock:
+        previous, _execution_profile = _execution_profile, profile
+    profile.apply()
+    return previous or ExecutionProfile()
@@ -0,0 +1,231 @@
+import logging
+import os
+from typing import List, Optional, Tuple
+import numpy as np
+from moduls.audio_stream import SAMPLE_RATE
+from moduls.model_pool import get_model_pool
+from moduls.model_registry import load_nemo_model
+from moduls.speech_activity import as_float, silent_turns, speech_regions
+from moduls.timeline import TURN_DTYPE
+
+
+# Уровень диаризации: "msdd" — NeMo MSDD (точнее, по умолчанию), "fast" — кластеризация эмбеддингов
+# спикеров по участкам речи (в разы быстрее на CPU, для предварительного разбора).
+DIARIZATION_TIER = os.environ.get("DIARIZATION_TIER", "msdd").lower()
+# Известное число спикеров (0 — определить по порогу кластеризации).
+DIARIZATION_NUM_SPEAKERS = int(os.environ.get("DIARIZATION_NUM_SPEAKERS", 0))
+
+# Модель эмбеддингов NeMo (titanet_large уже скачана для MSDD).
+FAST_EMBEDDING_MODEL = os.environ.get("FAST_EMBEDDING_MODEL", "titanet_large")
+# Окно и шаг эмбеддингов внутри участков речи (в секундах).
+FAST_WINDOW_SECONDS = float(os.environ.get("FAST_WINDOW_SECONDS", 1.5))
+FAST_HOP_SECONDS = float(os.environ.get("FAST_HOP_SECONDS", 0.75))
+# Порог косинусного расстояния при объединении кластеров (если число спикеров не задано).
+FAST_CLUSTER_THRESHOLD = float(os.environ.get("FAST_CLUSTER_THRESHOLD", 0.7))
+# Больше окон кластеризуется по равномерной выборке, остальные относятся к ближайшему центроиду.
+FAST_MAX_CLUSTER_WINDOWS = int(os.environ.get("FAST_MAX_CLUSTER_WINDOWS", 4000))
+# Кластеры меньше этой доли окон считаются выбросами и присоединяются к ближайшему крупному.
+FAST_MIN_CLUSTER_SHARE = float(os.environ.get("FAST_MIN_CLUSTER_SHARE", 0.02))
+
+EMBEDDING_BATCH_SIZE = 64
+MIN_SEGMENT_SECONDS = 0.25
+
+logger = logging.getLogger(__name__)
+
+
+def embedding_windows(regions: List[Tuple[int, int]], window_seconds: float = FAST_WINDOW_SECONDS,
+                      hop_seconds: float = FAST_HOP_SECONDS) -> np.ndarray:
+    """
+    Окна эмбеддингов внутри участков речи.
+
+    :return: Массив (N, 4): начало и конец окна, начало и конец интервала, за который окно «отвечает»
+        (середина шага вокруг центра окна, в пределах участка), в сэмплах.
+    """
+    window, hop = int(window_seconds * SAMPLE_RATE), int(hop_seconds * SAMPLE_RATE)
+    windows = []
+    for start, end in regions:
+        if end - start < MIN_SEGMENT_SECONDS * SAMPLE_RATE:
+            continue
+        starts = np.arange(start, max(end - window, start) + 1, hop)
+        ends = np.minimum(starts + window, end)
+        centers = (starts + ends) // 2
+        own_starts = np.maximum(centers - hop // 2, start)
+        own_starts[0] = start
+        own_ends = np.append(own_starts[1:], end)
+        windows.append(np.stack([starts, ends, own_starts, own_ends], axis=1))
+    return np.concatenate(windows) if windows else np.empty((0, 4), dtype=np.int64)
+
+
+def _load_embedding_model(model_name: str, device: str):
+    model = load_nemo_model(model_name, "EncDecSpeakerLabelModel", device)
+    model.eval()
+    return model
+
+
+def extract_embeddings(audio: np.ndarray, windows: np.ndarray, device: str,
+                       model_name: str = FAST_EMBEDDING_MODEL) -> np.ndarray:
+    """
+    Эмбеддинги спикера для окон (модель NeMo из пула моделей), нормированные по длине.
+    """
+    import torch
+
+    embeddings = []
+    with get_model_pool().lease(("speaker_embedding", model_name, device),
+                                lambda: _load_embedding_model(model_name, device), exclusive=True) as model:
+        for batch_start in range(0, len(windows), EMBEDDING_BATCH_SIZE):
+            batch = windows[batch_start:batch_start + EMBEDDING_BATCH_SIZE]
+            lengths = batch[:, 1] - batch[:, 0]
+            signal = np.zeros((len(batch), int(lengths.max())), dtype=np.float32)
+            for i, (start, end) in enumerate(batch[:, :2]):
+                signal[i, :end - start] = as_float(audio[start:end])
+            with torch.no_grad():
+                _, embs = model.forward(input_signal=torch.from_numpy(signal).to(device),
+                                        input_signal_length=torch.from_numpy(lengths).to(device))
+            embeddings.append(embs.cpu().numpy())
+
+    embeddings = np.concatenate(embeddings) if embeddings else np.empty((0, 1), dtype=np.float32)
+    return embeddings / np.maximum(np.linalg.norm(embeddings, axis=1, keepdims=True), 1e-8)
+
+
+def cluster_embeddings(embeddings: np.ndarray, num_speakers: int = 0, threshold: float = FAST_CLUSTER_THRESHOLD,
+                       max_windows: int = FAST_MAX_CLUSTER_WINDOWS,
+                       min_cluster_share: float = FAST_MIN_CLUSTER_SHARE) -> np.ndarray:
+    """
+    Агломеративная кластеризация (average linkage, косинусное расстояние) нормированных эмбеддингов.
+
+    При num_speakers > 0 дерево режется на это число кластеров, иначе — по порогу threshold, после чего
+    мелкие кластеры (меньше min_cluster_share окон) присоединяются к ближайшим крупным. Если окон больше
+    max_windows, кластеризуется равномерная выборка, а все окна относятся к ближайшему центроиду.
+
+    :return: Номера спикеров окон (0, 1, ... в порядке первого появления).
+    """
+    from scipy.cluster.hierarchy import fcluster, linkage
+
+    if len(embeddings) < 2:
+        return np.zeros(len(embeddings), dtype=np.int32)
+
+    sample = np.linspace(0, len(embeddings) - 1, min(len(embeddings), max_windows)).astype(np.int64)
+    tree = linkage(embeddings[sample], method="average", metric="cosine")
+    if num_speakers > 0:
+        sample_labels = fcluster(tree, num_speakers, criterion="maxclust")
+    else:
+        sample_labels = fcluster(tree, threshold, criterion="distance")
+
+    clusters, counts = np.unique(sample_labels, return_counts=True)
+    centroids = np.stack([embeddings[sample][sample_labels == c].mean(axis=0) for c in clusters])
+    if num_speakers <= 0 and len(clusters) > 1:
+        large = counts >= max(min_cluster_share * len(sample), 1)
+        if large.any():
+            centroids = centroids[large]
+
+    labels = np.argmax(embeddings @ centroids.T, axis=1)
+    _, first, relabeled = np.unique(labels, return_index=True, return_inverse=True)
+    order = np.argsort(np.argsort(first))
+    return order[relabeled.ravel()].astype(np.int32)
+
+
+def windows_to_turns(windows: np.ndarray, labels: np.ndarray, max_gap_ms: int = 500) -> np.ndarray:
+    """
+    Склеивает интервалы окон одного спикера в реплики (TURN_DTYPE, мс); паузы до max_gap_ms внутри
+    реплики одного спикера заполняются.
+    """
+    if not len(windows):
+        return np.empty(0, dtype=TURN_DTYPE)
+
+    starts = windows[:, 2] * 1000 // SAMPLE_RATE
+    ends = windows[:, 3] * 1000 // SAMPLE_RATE
+    new_turn = np.r_[True, (labels[1:] != labels[:-1]) | (starts[1:] - ends[:-1] > max_gap_ms)]
+    turn_idx = np.cumsum(new_turn) - 1
+    turns = np.empty(turn_idx[-1] + 1, dtype=TURN_DTYPE)
+    turns["start"] = starts[new_turn]
+    turns["end"] = np.maximum.reduceat(ends, np.flatnonzero(new_turn))
+    turns["speaker"] = labels[new_turn]
+    return turns
+
+
+class StreamingDiarizer:
+    """
+    Диаризация по окнам потокового режима: VAD и эмбеддинги считаются для каждого окна записи сразу после
+    его чтения, а в памяти остаются только эмбеддинги (192 float32 на шаг FAST_HOP_SECONDS, ~4 МБ на час).
+    Кластеризация глобальна: finish кластеризует выборку не более FAST_MAX_CLUSTER_WINDOWS эмбеддингов
+    и относит остальные к ближайшему центроиду (cluster_embeddings), поэтому номера спикеров согласованы
+    по всей записи.
+
+    Окна эмбеддингов, центр которых попадает во вторую половину перекрытия со следующим окном записи,
+    откладываются: следующее окно посчитает их заново с полным контекстом, а для последнего окна они
+    принимаются в finish.
+    """
+
+    def __init__(self, device: str, overlap_samples: int, num_speakers: int = DIARIZATION_NUM_SPEAKERS):
+        self.device = device
+        self.overlap_samples = overlap_samples
+        self.num_speakers = num_speakers
+        self.windows: List[np.ndarray] = []
+        self.embeddings: List[np.ndarray] = []
+        self.pending: Tuple[np.ndarray, np.ndarray] = (np.empty((0, 4), dtype=np.int64), np.empty((0, 1)))
+        self.next_from = 0
+        self.total_samples = 0
+
+    def add(self, start: int, audio: np.ndarray, regions: Optional[List[Tuple[int, int]]] = None) -> None:
+        """
+        Обрабатывает окно записи.
+
+        :param start: Начало окна в сэмплах записи.
+        :param audio: Аудио окна 16 кГц моно.
+        :param regions: Участки речи окна (относительно его начала); по умолчанию VAD выполняется здесь.
+        """
+        regions = speech_regions(audio) if regions is None else regions
+        windows = embedding_windows(regions)
+        embeddings = extract_embeddings(audio, windows, self.device)
+        windows = windows + start
+
+        cut = start + len(audio) - self.overlap_samples // 2
+        centers = (windows[:, 2] + windows[:, 3]) // 2
+        accepted = (centers >= self.next_from) & (centers < cut)
+        deferred = centers >= cut
+        self.windows.append(windows[accepted])
+        self.embeddings.append(embeddings[accepted])
+        self.pending = (windows[deferred], embeddings[deferred])
+        self.next_from = cut
+        self.total_samples = start + len(audio)
+
+    def finish(self) -> np.ndarray:
+        """
+        Кластеризует эмбеддинги всей записи и возвращает реплики спикеров (TURN_DTYPE).
+        """
+        windows = np.concatenate(self.windows + [self.pending[0]])
+        logger.info("Диаризация по окнам: %d окон эмбеддингов.", len(windows))
+        if not len(windows):
+            return silent_turns(self.total_samples)
+        embeddings = np.concatenate([e for e in self.embeddings + [self.pending[1]] if len(e)])
+        return windows_to_turns(windows, cluster_embeddings(embeddings, self.num_speakers))
+
+
+def diarization_params(tier: str = DIARIZATION_TIER) -> dict:
+    """
+    Параметры уровня диаризации для ключей кэша RTTM и транскрипта (для MSDD пусто, ключи не меняются).
+    """
+    if tier not in ("fast", "windowed"):
+        return {}
+    return {"diarization": tier, "num_speakers": DIARIZATION_NUM_SPEAKERS, "embedding_model": FAST_EMBEDDING_MODEL,
+            "window": FAST_WINDOW_SECONDS, "hop": FAST_HOP_SECONDS, "threshold": FAST_CLUSTER_THRESHOLD}
+
+
+def diarize_fast(audio: np.ndarray, device: str, num_speakers: int = DIARIZATION_NUM_SPEAKERS,
+                 regions: Optional[List[Tuple[int, int]]] = None) -> np.ndarray:
+    """
+    Быстрая диаризация: Silero VAD -> эмбеддинги спикера по скользящим окнам -> кластеризация.
+
+    :param audio: Аудио 16 кГц моно (float32 или int16, в том числе np.memmap).
+    :param num_speakers: Подсказка о числе спикеров (0 — определить автоматически).
+    :param regions: Участки речи общего VAD (speech_activity.speech_regions); по умолчанию VAD выполняется здесь.
+    :return: Реплики спикеров (TURN_DTYPE), как timeline.load_rttm для RTTM NeMo.
+    """
+    regions = speech_regions(audio) if regions is None else regions
+    windows = embedding_windows(regions)
+    logger.info("Быстрая диаризация: %d участков речи, %d окон.", len(regions), len(windows))
+    if not len(windows):
+        return silent_turns(len(audio))
+
+    labels = cluster_embeddings(extract_embeddings(audio, windows, device), num_speakers)
+    return windows_to_turns(windows, labels)
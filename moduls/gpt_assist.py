@@ -1,7 +1,11 @@
 import os
-from openai import OpenAI
 import logging
+import time
+from typing import Iterator
 from dotenv import load_dotenv
+from moduls.gpt_backends import AssistantBackend, create_backend
+from moduls.gpt_usage import UsageTracker, get_usage_tracker
+from moduls.token_budget import count_tokens
 
 
 class GPTAssistant:
@@ -10,25 +14,34 @@ class GPTAssistant:
     
     При инициализации класс:
       - Загружает API-ключ из переменных окружения (например, OPENAI_API_KEY).
-      - Устанавливает ключ для библиотеки openai.
+      - Создаёт бэкенд, выполняющий запросы (по умолчанию OpenAI API, см. moduls.gpt_backends;
+        для офлайн-прогонов можно передать запись/воспроизведение или задать GPT_BACKEND).
       
     Метод send_message отправляет сообщение в ChatGPT и возвращает ответ в виде строки.
+    Метод stream_message возвращает ответ по частям по мере генерации.
+    Каждый вызов учитывается в UsageTracker (токены, задержка, модель, вызывающая сторона),
+    а при исчерпании бюджета токенов запрос не отправляется (BudgetExceededError).
     """
     load_dotenv() 
-    client = OpenAI(api_key=os.getenv("OPENAI_API_KEY"))
+    model = "gpt-3.5-turbo"
+    system_prompt = "Ты ассистент, помогающий анализировать и структурировать текст."
     
-    def __init__(self):
+    def __init__(self, backend: AssistantBackend = None, usage_tracker: UsageTracker = None):
         """
         Инициализирует объект GPTAssistant.
         
-        Загружает API-ключ из переменной окружения OPENAI_API_KEY и настраивает openai.
-        Если ключ не найден, выбрасывает исключение.
+        Если бэкенд не передан, он создаётся по переменной окружения GPT_BACKEND
+        (для бэкендов, обращающихся к OpenAI, требуется OPENAI_API_KEY, иначе выбрасывается исключение).
+
+        :param backend: Необязательный бэкенд, выполняющий запросы к модели.
+        :param usage_tracker: Необязательный учёт использования (по умолчанию общий для процесса).
         """
+        self.backend = backend if backend is not None else create_backend()
+        self.usage = usage_tracker if usage_tracker is not None else get_usage_tracker()
         self.api_key = os.getenv("OPENAI_API_KEY")
-        if not self.api_key: raise ValueError("OPENAI_API_KEY не найден в переменных окружения")
-        logging.info("GPTAssistant инициализирован с использованием API-ключа.")
+        logging.info("GPTAssistant инициализирован с бэкендом %s.", type(self.backend).__name__)
 
-    def send_message(self, message: str) -> str:
+    def send_message(self, message: str, caller: str = "summary") -> str:
         """
         Отправляет сообщение в ChatGPT и возвращает ответ в виде строки.
         
@@ -36,20 +49,70 @@ class GPTAssistant:
         Метод формирует системное сообщение (можно изменить или расширить) и сообщение пользователя.
         
         :param message: Строка с запросом для ChatGPT.
+        :param caller: Вызывающая сторона для учёта использования ("summary", "match").
         :return: Строка с ответом от ChatGPT.
+        :raises BudgetExceededError: Если исчерпан бюджет токенов.
         :raises Exception: При ошибке запроса выбрасывается исключение.
         """
+        self.usage.check_budget(caller)
+        messages = self._build_messages(message)
+        started = time.perf_counter()
         try:
-            response = GPTAssistant.client.chat.completions.create(
-                model="gpt-3.5-turbo",
-                messages=[
-                    {"role": "system", "content": "Ты ассистент, помогающий анализировать и структурировать текст."},
-                    {"role": "user", "content": message}
-                ])
-            # Извлекаем текст ответа из полученного объекта
-            answer = response.choices[0].message.content
+            answer, usage = self.backend.complete(self.model, messages)
+            self._record_usage(caller, messages, answer, usage, time.perf_counter() - started)
             return answer
 
         except Exception as e:
+            self._record_usage(caller, messages, "", None, time.perf_counter() - started, error=True)
+            logging.error("Ошибка при отправке сообщения в ChatGPT: %s", e)
+            raise
+
+    def stream_message(self, message: str, caller: str = "summary") -> Iterator[str]:
+        """
+        Отправляет сообщение в ChatGPT в потоковом режиме и возвращает ответ по частям.
+
+        Генератор отдаёт фрагменты текста по мере их генерации моделью. Если потребитель закрывает
+        генератор раньше времени (например, обнаружив некорректный ответ), HTTP-поток закрывается,
+        и генерация оставшихся токенов прекращается.
+
+        :param message: Строка с запросом для ChatGPT.
+        :param caller: Вызывающая сторона для учёта использования ("summary", "match").
+        :return: Итератор фрагментов ответа.
+        :raises BudgetExceededError: Если исчерпан бюджет токенов.
+        :raises Exception: При ошибке запроса выбрасывается исключение.
+        """
+        self.usage.check_budget(caller)
+        messages = self._build_messages(message)
+        usage, parts, error = {}, [], False
+        started = time.perf_counter()
+        stream = self.backend.stream(self.model, messages, usage)
+        try:
+            for part in stream:
+                parts.append(part)
+                yield part
+
+        except Exception as e:
+            error = True
             logging.error("Ошибка при отправке сообщения в ChatGPT: %s", e)
             raise
+
+        finally:
+            stream.close()
+            self._record_usage(caller, messages, "".join(parts), usage or None, time.perf_counter() - started, error)
+
+    def _record_usage(self, caller: str, messages: list, answer: str, usage: dict, latency: float, error: bool = False):
+        """
+        Учитывает вызов; если бэкенд не сообщил использование токенов, оно оценивается по текстам.
+        """
+        if not usage:
+            usage = {
+                "prompt_tokens": sum(count_tokens(item["content"], self.model) for item in messages),
+                "completion_tokens": count_tokens(answer, self.model),
+            }
+        self.usage.record(caller, self.model, usage["prompt_tokens"], usage["completion_tokens"], latency, error)
+
+    def _build_messages(self, message: str) -> list:
+        return [
+            {"role": "system", "content": self.system_prompt},
+            {"role": "user", "content": message}
+        ]
@@ -0,0 +1,221 @@
+import hashlib
+import json
+import logging
+import os
+import threading
+import time
+from abc import ABC, abstractmethod
+from typing import Dict, Iterator, List, Optional, Tuple
+from dotenv import load_dotenv
+
+
+load_dotenv()
+
+# Выбор бэкенда GPTAssistant через переменные окружения:
+#   GPT_BACKEND=openai  - обращение к OpenAI API (по умолчанию);
+#   GPT_BACKEND=record  - обращение к OpenAI API с записью пар запрос/ответ в GPT_RECORD_PATH;
+#   GPT_BACKEND=replay  - воспроизведение ранее записанных ответов из GPT_RECORD_PATH без сети.
+GPT_BACKEND = os.getenv("GPT_BACKEND", "openai").lower()
+GPT_RECORD_PATH = os.getenv("GPT_RECORD_PATH", os.path.join(os.getcwd(), "logs", "gpt_recordings.jsonl"))
+# Искусственная задержка воспроизведения: фиксированная часть и часть на 1000 символов ответа (в секундах).
+GPT_REPLAY_LATENCY = float(os.getenv("GPT_REPLAY_LATENCY", 0))
+GPT_REPLAY_LATENCY_PER_1K_CHARS = float(os.getenv("GPT_REPLAY_LATENCY_PER_1K_CHARS", 0))
+
+# Размер фрагмента, которым ReplayBackend отдаёт ответ в потоковом режиме.
+REPLAY_STREAM_CHUNK_CHARS = 16
+
+logger = logging.getLogger(__name__)
+
+
+def request_key(model: str, messages: List[Dict[str, str]]) -> str:
+    """
+    Детерминированный ключ запроса: SHA-256 от модели и сообщений.
+    """
+    payload = json.dumps({"model": model, "messages": messages}, ensure_ascii=False, sort_keys=True)
+    return hashlib.sha256(payload.encode("utf-8")).hexdigest()
+
+
+class AssistantBackend(ABC):
+    """
+    Интерфейс бэкенда GPTAssistant: выполняет запрос к языковой модели.
+
+    Реализации должны определить complete (ответ целиком и использование токенов) и stream
+    (ответ по частям; использование токенов записывается в переданный словарь usage, если бэкенд его знает).
+    Использование токенов — словарь {"prompt_tokens": ..., "completion_tokens": ...} или None.
+    """
+
+    @abstractmethod
+    def complete(self, model: str, messages: List[Dict[str, str]]) -> Tuple[str, Optional[Dict[str, int]]]:
+        ...
+
+    @abstractmethod
+    def stream(self, model: str, messages: List[Dict[str, str]], usage: Optional[dict] = None) -> Iterator[str]:
+        ...
+
+
+class OpenAIBackend(AssistantBackend):
+    """
+    Бэкенд, обращающийся к OpenAI Chat Completions API.
+    """
+
+    def __init__(self, api_key: str = None):
+        from openai import OpenAI
+
+        self.api_key = api_key or os.getenv("OPENAI_API_KEY")
+        if not self.api_key: raise ValueError("OPENAI_API_KEY не найден в переменных окружения")
+        self.client = OpenAI(api_key=self.api_key)
+
+    @staticmethod
+    def _usage(response_usage) -> Optional[Dict[str, int]]:
+        if response_usage is None:
+            return None
+        return {"prompt_tokens": response_usage.prompt_tokens, "completion_tokens": response_usage.completion_tokens}
+
+    def complete(self, model: str, messages: List[Dict[str, str]]) -> Tuple[str, Optional[Dict[str, int]]]:
+        response = self.client.chat.completions.create(model=model, messages=messages)
+        return response.choices[0].message.content, self._usage(response.usage)
+
+    def stream(self, model: str, messages: List[Dict[str, str]], usage: Optional[dict] = None) -> Iterator[str]:
+        stream = self.client.chat.completions.create(
+            model=model, messages=messages, stream=True, stream_options={"include_usage": True}
+        )
+        try:
+            for chunk in stream:
+                # Последний фрагмент потока содержит только использование токенов
+                if chunk.usage is not None and usage is not None:
+                    usage.update(self._usage(chunk.usage))
+                if chunk.choices and chunk.choices[0].delta.content:
+                    yield chunk.choices[0].delta.content
+        finally:
+            stream.close()
+
+
+class RecordingBackend(AssistantBackend):
+    """
+    Бэкенд-обёртка, который передаёт запросы во вложенный бэкенд и дописывает пары
+    запрос/ответ (с задержкой ответа) в JSONL-файл для последующего воспроизведения.
+    """
+
+    def __init__(self, inner: AssistantBackend, path: str = GPT_RECORD_PATH):
+        self.inner = inner
+        self.path = path
+        self._lock = threading.Lock()
+        os.makedirs(os.path.dirname(os.path.abspath(path)), exist_ok=True)
+
+    def _record(
+        self,
+        model: str,
+        messages: List[Dict[str, str]],
+        response: str,
+        usage: Optional[Dict[str, int]],
+        latency: float,
+        **extra,
+    ) -> None:
+        entry = {
+            "key": request_key(model, messages),
+            "model": model,
+            "messages": messages,
+            "response": response,
+            "usage": usage,
+            "latency_s": round(latency, 4),
+            **extra,
+        }
+        with self._lock, open(self.path, "a", encoding="utf-8") as f:
+            f.write(json.dumps(entry, ensure_ascii=False) + "\n")
+
+    def complete(self, model: str, messages: List[Dict[str, str]]) -> Tuple[str, Optional[Dict[str, int]]]:
+        started = time.perf_counter()
+        response, usage = self.inner.complete(model, messages)
+        self._record(model, messages, response, usage, time.perf_counter() - started)
+        return response, usage
+
+    def stream(self, model: str, messages: List[Dict[str, str]], usage: Optional[dict] = None) -> Iterator[str]:
+        started, parts, finished = time.perf_counter(), [], False
+        usage = usage if usage is not None else {}
+        try:
+            for part in self.inner.stream(model, messages, usage):
+                parts.append(part)
+                yield part
+            finished = True
+        finally:
+            # Оборванный потребителем поток тоже записывается, но с пометкой truncated
+            self._record(
+                model, messages, "".join(parts), usage or None, time.perf_counter() - started, truncated=not finished
+            )
+
+
+class ReplayBackend(AssistantBackend):
+    """
+    Детерминированный офлайн-бэкенд: отвечает записанными RecordingBackend ответами по ключу запроса.
+
+    Задержка ответа задаётся явно (latency + latency_per_1k_chars * len(ответа) / 1000), что позволяет
+    профилировать пайплайн как без сетевых задержек, так и с их стабильной имитацией.
+    Запрос, которого нет в записи, вызывает KeyError.
+    """
+
+    def __init__(
+        self,
+        path: str = GPT_RECORD_PATH,
+        latency: float = GPT_REPLAY_LATENCY,
+        latency_per_1k_chars: float = GPT_REPLAY_LATENCY_PER_1K_CHARS,
+    ):
+        self.path = path
+        self.latency = latency
+        self.latency_per_1k_chars = latency_per_1k_chars
+        self.responses: Dict[str, Tuple[str, Optional[Dict[str, int]]]] = {}
+
+        with open(path, "r", encoding="utf-8") as f:
+            for line in f:
+                if not line.strip():
+                    continue
+                entry = json.loads(line)
+                # Полный ответ имеет приоритет над оборванным потоковым
+                if not entry.get("truncated") or entry["key"] not in self.responses:
+                    self.responses[entry["key"]] = (entry["response"], entry.get("usage"))
+
+        logger.info("ReplayBackend: загружено %d записанных ответов из %s", len(self.responses), path)
+
+    def _lookup(self, model: str, messages: List[Dict[str, str]]) -> Tuple[str, Optional[Dict[str, int]]]:
+        key = request_key(model, messages)
+        if key not in self.responses:
+            raise KeyError(f"Запрос {key[:12]} отсутствует в записи {self.path}")
+        return self.responses[key]
+
+    def _delay(self, response: str) -> float:
+        return self.latency + self.latency_per_1k_chars * len(response) / 1000
+
+    def complete(self, model: str, messages: List[Dict[str, str]]) -> Tuple[str, Optional[Dict[str, int]]]:
+        response, usage = self._lookup(model, messages)
+        delay = self._delay(response)
+        if delay > 0:
+            time.sleep(delay)
+        return response, usage
+
+    def stream(self, model: str, messages: List[Dict[str, str]], usage: Optional[dict] = None) -> Iterator[str]:
+        response, recorded_usage = self._lookup(model, messages)
+        if usage is not None and recorded_usage:
+            usage.update(recorded_usage)
+        chunks = [response[i:i + REPLAY_STREAM_CHUNK_CHARS] for i in range(0, len(response), REPLAY_STREAM_CHUNK_CHARS)]
+        delay = self._delay(response) / max(len(chunks), 1)
+        for chunk in chunks:
+            if delay > 0:
+                time.sleep(delay)
+            yield chunk
+
+
+def create_backend(name: str = GPT_BACKEND, path: str = GPT_RECORD_PATH) -> AssistantBackend:
+    """
+    Создаёт бэкенд по имени ("openai", "record" или "replay").
+
+    :param name: Имя бэкенда.
+    :param path: Путь к файлу записей для "record" и "replay".
+    :return: Экземпляр бэкенда.
+    :raises ValueError: Если имя бэкенда неизвестно.
+    """
+    if name == "openai":
+        return OpenAIBackend()
+    if name == "record":
+        return RecordingBackend(OpenAIBackend(), path)
+    if name == "replay":
+        return ReplayBackend(path)
+    raise ValueError(f"Неизвестный бэкенд GPT: {name}")
@@ -0,0 +1,241 @@
+import json
+import logging
+import os
+import re
+import threading
+import time
+from typing import Any, Dict, List, Optional
+from dotenv import load_dotenv
+
+
+load_dotenv()
+
+# Журнал вызовов ChatGPT: по файлу на сутки рядом с GPT_USAGE_PATH (logs/gpt_usage.<день>.jsonl),
+# журналы хранятся GPT_USAGE_RETENTION_DAYS дней.
+GPT_USAGE_PATH = os.getenv("GPT_USAGE_PATH", os.path.join(os.getcwd(), "logs", "gpt_usage.jsonl"))
+GPT_USAGE_RETENTION_DAYS = int(os.getenv("GPT_USAGE_RETENTION_DAYS", 30))
+# Бюджеты токенов (prompt + completion) на один запуск и на сутки; 0 — без ограничения.
+GPT_RUN_TOKEN_BUDGET = int(os.getenv("GPT_RUN_TOKEN_BUDGET", 0))
+GPT_DAILY_TOKEN_BUDGET = int(os.getenv("GPT_DAILY_TOKEN_BUDGET", 0))
+# Поведение массовой загрузки при исчерпании бюджета: "pause" — остановить обработку оставшихся документов,
+# "degrade" — добавлять оставшиеся документы с локальной выжимкой без обращения к ChatGPT.
+GPT_BUDGET_MODE = os.getenv("GPT_BUDGET_MODE", "pause").lower()
+
+DAY_PATTERN = re.compile(r"\d{4}-\d{2}-\d{2}")
+
+logger = logging.getLogger(__name__)
+
+
+class BudgetExceededError(RuntimeError):
+    """
+    Исчерпан бюджет токенов на запуск или на сутки; запрос к ChatGPT не отправлялся.
+    """
+
+
+class UsageTracker:
+    """
+    Учёт использования ChatGPT: токены, задержка, модель и вызывающая сторона (summary/match).
+
+    Каждый вызов дописывается одной строкой JSON в журнал за сутки. Журнал открывается на дозапись, поэтому
+    несколько процессов (CLI, пакетная загрузка) пишут в него, не затирая записи друг друга. Суточные агрегаты
+    {день: {caller: {model: счётчики}}} собираются при чтении: новые строки журналов дочитываются с запомненной
+    позиции. Перед вызовом check_budget проверяет бюджеты на запуск (счётчик в памяти) и на сутки (по журналу).
+    Неудачные вызовы учитываются отдельно (failed, failed_tokens с оценкой токенов) и в бюджеты не входят.
+    """
+
+    def __init__(
+        self,
+        path: str = GPT_USAGE_PATH,
+        run_budget: int = GPT_RUN_TOKEN_BUDGET,
+        daily_budget: int = GPT_DAILY_TOKEN_BUDGET,
+        retention_days: int = GPT_USAGE_RETENTION_DAYS,
+    ):
+        self.path = path
+        self.run_budget = run_budget
+        self.daily_budget = daily_budget
+        self.retention_days = retention_days
+        self.run_tokens = 0
+        self._lock = threading.Lock()
+        self._days: Dict[str, Any] = {}
+        self._offsets: Dict[str, int] = {}
+        self._prune()
+
+    def day_path(self, day: str) -> str:
+        """
+        Путь к журналу вызовов за сутки day (ГГГГ-ММ-ДД).
+        """
+        root, ext = os.path.splitext(self.path)
+        return f"{root}.{day}{ext or '.jsonl'}"
+
+    def _logged_days(self) -> List[str]:
+        root, ext = os.path.splitext(os.path.abspath(self.path))
+        prefix, suffix = os.path.basename(root) + ".", ext or ".jsonl"
+        try:
+            names = os.listdir(os.path.dirname(root))
+        except FileNotFoundError:
+            return []
+        days = [name[len(prefix):-len(suffix)] for name in names if name.startswith(prefix) and name.endswith(suffix)]
+        return sorted(day for day in days if DAY_PATTERN.fullmatch(day))
+
+    def _prune(self) -> None:
+        days = self._logged_days()
+        for day in days[:-self.retention_days] if self.retention_days > 0 else []:
+            try:
+                os.remove(self.day_path(day))
+            except OSError as e:
+                logger.error("Не удалось удалить журнал использования за %s: %s", day, e)
+
+    def _refresh(self, day: str) -> Dict[str, Any]:
+        """
+        Дочитывает новые строки журнала за сутки (в том числе записанные другими процессами) и возвращает
+        агрегаты за эти сутки. Вызывается под self._lock.
+        """
+        offset = self._offsets.get(day, 0)
+        try:
+            with open(self.day_path(day), "rb") as f:
+                f.seek(offset)
+                data = f.read()
+        except FileNotFoundError:
+            return self._days.get(day, {})
+
+        # Только целые строки: последнюю в этот момент может дописывать другой процесс
+        complete = data.rfind(b"\n") + 1
+        self._offsets[day] = offset + complete
+        stats = self._days.setdefault(day, {})
+        for line in data[:complete].splitlines():
+            try:
+                event = json.loads(line)
+            except ValueError as e:
+                logger.error("Повреждённая строка журнала использования %s: %s", self.day_path(day), e)
+                continue
+
+            counters = stats.setdefault(event["caller"], {}).setdefault(event["model"], {
+                "calls": 0, "failed": 0, "prompt_tokens": 0, "completion_tokens": 0, "failed_tokens": 0,
+                "latency_s_total": 0.0, "latency_s_max": 0.0,
+            })
+            if event.get("error"):
+                counters["failed"] += 1
+                counters["failed_tokens"] += event["prompt_tokens"] + event["completion_tokens"]
+            else:
+                counters["calls"] += 1
+                counters["prompt_tokens"] += event["prompt_tokens"]
+                counters["completion_tokens"] += event["completion_tokens"]
+            counters["latency_s_total"] = round(counters["latency_s_total"] + event["latency_s"], 3)
+            counters["latency_s_max"] = max(counters["latency_s_max"], event["latency_s"])
+        return stats
+
+    def day_tokens(self, day: Optional[str] = None) -> int:
+        """
+        Количество токенов успешных вызовов за сутки (по умолчанию — за сегодня) во всех процессах.
+        """
+        with self._lock:
+            return self._day_tokens(day or time.strftime("%Y-%m-%d"))
+
+    def _day_tokens(self, day: str) -> int:
+        return sum(
+            counters["prompt_tokens"] + counters["completion_tokens"]
+            for models in self._refresh(day).values() for counters in models.values()
+        )
+
+    def check_budget(self, caller: str) -> None:
+        """
+        Проверяет, что бюджеты токенов ещё не исчерпаны.
+
+        :param caller: Вызывающая сторона (для сообщения об ошибке).
+        :raises BudgetExceededError: Если исчерпан бюджет на запуск или на сутки.
+        """
+        with self._lock:
+            if self.run_budget and self.run_tokens >= self.run_budget:
+                raise BudgetExceededError(
+                    f"Исчерпан бюджет токенов на запуск ({self.run_tokens}/{self.run_budget}), запрос {caller} не отправлен"
+                )
+            day_tokens = self._day_tokens(time.strftime("%Y-%m-%d")) if self.daily_budget else 0
+            if self.daily_budget and day_tokens >= self.daily_budget:
+                raise BudgetExceededError(
+                    f"Исчерпан суточный бюджет токенов ({day_tokens}/{self.daily_budget}), запрос {caller} не отправлен"
+                )
+
+    def record(
+        self,
+        caller: str,
+        model: str,
+        prompt_tokens: int,
+        completion_tokens: int,
+        latency: float,
+        error: bool = False,
+    ) -> None:
+        """
+        Учитывает один вызов ChatGPT: дописывает его в журнал за сутки.
+
+        :param caller: Вызывающая сторона ("summary", "match", ...).
+        :param model: Модель OpenAI.
+        :param prompt_tokens: Токены запроса.
+        :param completion_tokens: Токены ответа.
+        :param latency: Задержка вызова в секундах.
+        :param error: Завершился ли вызов ошибкой (такой вызов не входит в бюджеты).
+        """
+        if not error:
+            with self._lock:
+                self.run_tokens += prompt_tokens + completion_tokens
+
+        event = {
+            "ts": time.strftime("%Y-%m-%dT%H:%M:%S%z"), "caller": caller, "model": model,
+            "prompt_tokens": prompt_tokens, "completion_tokens": completion_tokens,
+            "latency_s": round(latency, 3), "error": error,
+        }
+        try:
+            path = self.day_path(time.strftime("%Y-%m-%d"))
+            os.makedirs(os.path.dirname(os.path.abspath(path)), exist_ok=True)
+            # Строка пишется одним вызовом write в режиме O_APPEND: строки разных процессов не перемешиваются
+            fd = os.open(path, os.O_WRONLY | os.O_APPEND | os.O_CREAT, 0o644)
+            try:
+                os.write(fd, (json.dumps(event, ensure_ascii=False) + "\n").encode("utf-8"))
+            finally:
+                os.close(fd)
+        except Exception as e:
+            logger.error("Ошибка при сохранении статистики использования: %s", e)
+
+    def format_report(self, days: int = 7) -> str:
+        """
+        Формирует текстовый отчёт об использовании ChatGPT за последние days дней.
+        """
+        with self._lock:
+            selected = self._logged_days()[-days:]
+            if not selected:
+                return "Статистика использования ChatGPT пока отсутствует."
+
+            lines = [f"Использование ChatGPT за последние {len(selected)} дн.:"]
+            for day in selected:
+                lines.append(f"{day}: всего токенов {self._day_tokens(day)}")
+                for caller, models in sorted(self._days.get(day, {}).items()):
+                    for model, c in sorted(models.items()):
+                        attempts = c["calls"] + c["failed"]
+                        avg_latency = c["latency_s_total"] / attempts if attempts else 0
+                        failed = f" (неудачных {c['failed']}, ~{c['failed_tokens']} токенов)" if c["failed"] else ""
+                        lines.append(
+                            f"    {caller:<8} {model}: вызовов {c['calls']}{failed}, "
+                            f"токенов {c['prompt_tokens']} + {c['completion_tokens']}, "
+                            f"задержка ср. {avg_latency:.2f} с / макс. {c['latency_s_max']:.2f} с"
+                        )
+
+            lines.append(
+                f"Текущий запуск: {self.run_tokens} токенов"
+                + (f" из {self.run_budget}" if self.run_budget else "")
+                + (f"; суточный бюджет: {self.daily_budget}" if self.daily_budget else "")
+            )
+            return "\n".join(lines)
+
+
+_usage_tracker: Optional[UsageTracker] = None
+_usage_tracker_lock = threading.Lock()
+
+
+def get_usage_tracker() -> UsageTracker:
+    """
+    Возвращает общий для процесса учёт использования (создаётся при первом обращении).
+    """
+    global _usage_tracker
+    with _usage_tracker_lock:
+        if _usage_tracker is None:
+            _usage_tracker = UsageTracker()
+    return _usage_tracker
@@ -3,13 +3,14 @@ import json
 import os
 import shutil
 import nltk
-import wget
 
 
-SYSTEM_DRIVE = os.environ.get("SystemDrive", "C:")
-GLOBAL_BASE_DIR = os.path.join(SYSTEM_DRIVE, "tempDiscription")
-GLOBAL_AUDIO_DIR = os.path.join(GLOBAL_BASE_DIR, "tempAudio")
-GLOBAL_YAML_DIR = os.path.join(GLOBAL_BASE_DIR, "tempYAML")
+# Постоянные данные (кэш артефактов, ONNX-модели): корень системного диска на Windows, ~/.cache в остальных ОС,
+# либо каталог DIARIZATION_BASE_DIR. Временные файлы задач живут в moduls.workspace.job_workspace.
+SYSTEM_DRIVE = (os.environ.get("SystemDrive", "C:") + os.sep if os.name == "nt"
+                else os.environ.get("XDG_CACHE_HOME", os.path.join(os.path.expanduser("~"), ".cache")))
+GLOBAL_BASE_DIR = os.environ.get("DIARIZATION_BASE_DIR", os.path.join(SYSTEM_DRIVE, "tempDiscription"))
+GLOBAL_CACHE_DIR = os.path.join(GLOBAL_BASE_DIR, "artifactCache")
 LANGUAGES = {
     "en": "english", "zh": "chinese", "de": "german", "es": "spanish", "ru": "russian", "ko": "korean", "fr": "french", 
     "ja": "japanese", "pt": "portuguese", "tr": "turkish", "pl": "polish", "ca": "catalan", "nl": "dutch", "ar": "arabic", 
@@ -50,18 +51,13 @@ langs_to_iso = {
 }
 
 
-def create_config(output_dir):
+def create_config(output_dir, num_workers=0, speech_rttm=None):
+    # Конфиг поставляется вместе с кодом, а модели берутся из локального реестра (python main.py prewarm)
+    from moduls.model_registry import config_path, resolve
+
     DOMAIN_TYPE = "telephonic"
-    CONFIG_LOCAL_DIRECTORY = "nemo_msdd_configs"
     CONFIG_FILE_NAME = f"diar_infer_{DOMAIN_TYPE}.yaml"
-    MODEL_CONFIG_PATH = os.path.join(CONFIG_LOCAL_DIRECTORY, CONFIG_FILE_NAME)
-
-    if not os.path.exists(MODEL_CONFIG_PATH):
-        os.makedirs(CONFIG_LOCAL_DIRECTORY, exist_ok=True)
-        CONFIG_URL = f"https://raw.githubusercontent.com/NVIDIA/NeMo/main/examples/speaker_tasks/diarization/conf/inference/{CONFIG_FILE_NAME}"
-        MODEL_CONFIG_PATH = wget.download(CONFIG_URL, MODEL_CONFIG_PATH)
-
-    config = OmegaConf.load(MODEL_CONFIG_PATH)
+    config = OmegaConf.load(config_path(CONFIG_FILE_NAME))
 
     data_dir = os.path.join(output_dir, "data")
     os.makedirs(data_dir, exist_ok=True)
@@ -72,7 +68,7 @@ def create_config(output_dir):
         "duration": None,
         "label": "infer",
         "text": "-",
-        "rttm_filepath": None,
+        "rttm_filepath": speech_rttm,
         "uem_filepath": None,
     }
     with open(os.path.join(data_dir, "input_manifest.json"), "w") as fp:
@@ -81,19 +77,22 @@ def create_config(output_dir):
 
     pretrained_vad = "vad_multilingual_marblenet"
     pretrained_speaker_model = "titanet_large"
-    config.num_workers = 0
+    config.num_workers = num_workers
     config.diarizer.manifest_filepath = os.path.join(data_dir, "input_manifest.json")
     config.diarizer.out_dir = (output_dir)  # Directory to store intermediate files and prediction outputs
-    config.diarizer.speaker_embeddings.model_path = pretrained_speaker_model
-    config.diarizer.oracle_vad = (False) # compute VAD provided with model_path to vad config
+    config.diarizer.speaker_embeddings.model_path = resolve("nemo", pretrained_speaker_model)
+    # Если участки речи уже найдены общим VAD (moduls.speech_activity), NeMo берёт их из RTTM манифеста
+    # как oracle VAD, и MarbleNet не запускается
+    config.diarizer.oracle_vad = speech_rttm is not None  # else compute VAD with vad.model_path
     config.diarizer.clustering.parameters.oracle_num_speakers = False
 
     # Here, we use our in-house pretrained NeMo VAD model
-    config.diarizer.vad.model_path = pretrained_vad
+    config.diarizer.vad.model_path = resolve("nemo", pretrained_vad) if speech_rttm is None else None
     config.diarizer.vad.parameters.onset = 0.8
     config.diarizer.vad.parameters.offset = 0.6
     config.diarizer.vad.parameters.pad_offset = -0.05
-    config.diarizer.msdd_model.model_path = ("diar_msdd_telephonic")  # Telephonic speaker diarization model
+    # Telephonic speaker diarization model
+    config.diarizer.msdd_model.model_path = resolve("nemo", "diar_msdd_telephonic")
     return config
 
 
@@ -108,9 +107,10 @@ def get_words_speaker_mapping(wrd_ts, spk_ts, word_anchor_option="start"):
     wrd_pos, turn_idx = 0, 0
     wrd_spk_mapping = []
     for wrd_dict in wrd_ts:
+        # Тайминги сегментов уже в миллисекундах (см. video_processing.transcribe_segments)
         ws, we, wrd = (
-            int(wrd_dict["start"] * 1000),
-            int(wrd_dict["end"] * 1000),
+            int(wrd_dict["start"]),
+            int(wrd_dict["end"]),
             wrd_dict["text"],
         )
         wrd_pos = get_word_ts_anchor(ws, we, word_anchor_option)
@@ -124,116 +124,144 @@ def get_words_speaker_mapping(wrd_ts, spk_ts, word_anchor_option="start"):
         wrd_spk_mapping.append({"word": wrd, "start_time": ws, "end_time": we, "speaker": sp})
     return wrd_spk_mapping
 
-def get_first_word_idx_of_sentence(word_idx, word_list, speaker_list, max_words):
-    is_word_sentence_end = (lambda x: x >= 0 and word_list[x][-1] in sentence_ending_punctuations)
-    left_idx = word_idx
-    while (
-        left_idx > 0
-        and word_idx - left_idx < max_words
-        and speaker_list[left_idx - 1] == speaker_list[left_idx]
-        and not is_word_sentence_end(left_idx - 1)
-    ): left_idx -= 1
-
-    return left_idx if left_idx == 0 or is_word_sentence_end(left_idx - 1) else -1
-
-
-def get_last_word_idx_of_sentence(word_idx, word_list, max_words):
-    is_word_sentence_end = (lambda x: x >= 0 and word_list[x][-1] in sentence_ending_punctuations)
-    right_idx = word_idx
-    while (
-        right_idx < len(word_list) - 1
-        and right_idx - word_idx < max_words
-        and not is_word_sentence_end(right_idx)
-    ): right_idx += 1
-
-    return (right_idx if right_idx == len(word_list) - 1 or is_word_sentence_end(right_idx) else -1)
-
-
 def get_realigned_ws_mapping_with_punctuation(word_speaker_mapping, max_words_in_sentence=50):
-    is_word_sentence_end = (lambda x: x >= 0 and word_speaker_mapping[x]["word"][-1] in sentence_ending_punctuations)
-    wsp_len = len(word_speaker_mapping)
-
-    words_list, speaker_list = [], []
-    for k, line_dict in enumerate(word_speaker_mapping):
-        word, speaker = line_dict["word"], line_dict["speaker"]
-        words_list.append(word)
-        speaker_list.append(speaker)
+    """
+    Выравнивает спикеров по границам предложений: если спикер сменился посреди предложения
+    (не длиннее max_words_in_sentence слов), всему предложению назначается спикер большинства.
 
+    Один линейный проход: границы предложений вычисляются заранее, начало серии слов одного спикера
+    ведётся по ходу прохода, а голоса спикеров считаются один раз на предложение (при отказе окно
+    запоминается, при согласии проход переходит за конец предложения). Совпадение с прежним квадратичным
+    обходом проверяет tests/test_realignment.py.
+    """
+    wsp_len = len(word_speaker_mapping)
+    speaker_list = [line_dict["speaker"] for line_dict in word_speaker_mapping]
+    is_sentence_end = [bool(line_dict["word"]) and line_dict["word"][-1] in sentence_ending_punctuations
+                       for line_dict in word_speaker_mapping]
+
+    # Первое слово предложения и его последнее слово (ближайший конец предложения или последнее слово записи)
+    sentence_start, start = [0] * wsp_len, 0
+    for k in range(wsp_len):
+        sentence_start[k] = start
+        if is_sentence_end[k]: start = k + 1
+
+    sentence_end, end = [wsp_len - 1] * wsp_len, wsp_len - 1
+    for k in reversed(range(wsp_len)):
+        if is_sentence_end[k]: end = k
+        sentence_end[k] = end
+
+    run_start, rejected = [0] * wsp_len, None
     k = 0
-    while k < len(word_speaker_mapping):
-        line_dict = word_speaker_mapping[k]
-        if (k < wsp_len - 1 and speaker_list[k] != speaker_list[k + 1] and not is_word_sentence_end(k)):
-            left_idx = get_first_word_idx_of_sentence(k, words_list, speaker_list, max_words_in_sentence)
-            right_idx = (get_last_word_idx_of_sentence(k, words_list, max_words_in_sentence - k + left_idx - 1)
-                if left_idx > -1 else -1)
-            
-            if min(left_idx, right_idx) == -1:
+    while k < wsp_len:
+        run_start[k] = run_start[k - 1] if k and speaker_list[k - 1] == speaker_list[k] else k
+        if k < wsp_len - 1 and speaker_list[k] != speaker_list[k + 1] and not is_sentence_end[k]:
+            # Левая граница: начало предложения, если до него не встретилась смена спикера и не больше max слов
+            left_idx = max(sentence_start[k], run_start[k], k - max_words_in_sentence)
+            right_idx = min(sentence_end[k], k + max(max_words_in_sentence - k + left_idx - 1, 0))
+            if left_idx != sentence_start[k] or right_idx != sentence_end[k] or (left_idx, right_idx) == rejected:
                 k += 1
                 continue
 
-            spk_labels = speaker_list[left_idx : right_idx + 1]
-            mod_speaker = max(set(spk_labels), key=spk_labels.count)
-            if spk_labels.count(mod_speaker) < len(spk_labels) // 2:
+            spk_counts = {}
+            for speaker in speaker_list[left_idx : right_idx + 1]:
+                spk_counts[speaker] = spk_counts.get(speaker, 0) + 1
+            mod_speaker = max(set(spk_counts), key=spk_counts.get)
+            if spk_counts[mod_speaker] < (right_idx - left_idx + 1) // 2:
+                rejected = (left_idx, right_idx)
                 k += 1
                 continue
 
             speaker_list[left_idx : right_idx + 1] = [mod_speaker] * (right_idx - left_idx + 1)
+            for i in range(left_idx, right_idx + 1):
+                run_start[i] = run_start[i - 1] if i and speaker_list[i - 1] == speaker_list[i] else i
             k = right_idx
 
         k += 1
 
-    k, realigned_list = 0, []
-    while k < len(word_speaker_mapping):
-        line_dict = word_speaker_mapping[k].copy()
-        line_dict["speaker"] = speaker_list[k]
+    realigned_list = []
+    for line_dict, speaker in zip(word_speaker_mapping, speaker_list):
+        line_dict = line_dict.copy()
+        line_dict["speaker"] = speaker
         realigned_list.append(line_dict)
-        k += 1
 
     return realigned_list
 
 
-def get_sentences_speaker_mapping(word_speaker_mapping, spk_ts):
-    sentence_checker = nltk.tokenize.PunktSentenceTokenizer().text_contains_sentbreak
+class SentenceBreakChecker:
+    """
+    Инкрементальная проверка конца предложения для get_sentences_speaker_mapping.
+
+    Punkt решает, есть ли разрыв после токена, по самому токену и следующему за ним, поэтому при добавлении
+    слова к предложению без разрыва достаточно проверить стык "последнее слово + новое слово", а не весь
+    накопленный текст. Результат совпадает с text_contains_sentbreak(текст предложения + " " + слово).
+    """
+
+    def __init__(self):
+        self.tokenizer = nltk.tokenize.PunktSentenceTokenizer()
+        self.tail = ""
+
+    def reset(self):
+        self.tail = ""
+
+    def breaks_before(self, word: str) -> bool:
+        return self.tokenizer.text_contains_sentbreak(self.tail + " " + word)
+
+    def append(self, word: str):
+        if word.strip():
+            self.tail = word
+
+
+def iter_sentences_speaker_mapping(word_speaker_mapping, spk_ts):
+    """
+    Генератор предложений {"speaker", "start_time", "end_time", "text"}: каждое предложение
+    отдаётся, как только начинается следующее.
+    """
+    sentence_checker = SentenceBreakChecker()
     s, e, spk = spk_ts[0]
     prev_spk = spk
-    snts = []
     snt = {"speaker": f"Speaker {spk}", "start_time": s, "end_time": e, "text": ""}
 
     for wrd_dict in word_speaker_mapping:
         wrd, spk = wrd_dict["word"], wrd_dict["speaker"]
         s, e = wrd_dict["start_time"], wrd_dict["end_time"]
-        if spk != prev_spk or sentence_checker(snt["text"] + " " + wrd):
-            snts.append(snt)
+        if spk != prev_spk or sentence_checker.breaks_before(wrd):
+            yield snt
             snt = {"speaker": f"Speaker {spk}",
                    "start_time": s,
                    "end_time": e,
                    "text": ""}
+            sentence_checker.reset()
         
         else: snt["end_time"] = e
         
         snt["text"] += wrd + " "
+        sentence_checker.append(wrd)
         prev_spk = spk
 
-    snts.append(snt)
-    return snts
+    yield snt
 
 
-def get_speaker_aware_transcript(sentences_speaker_mapping) -> str:
-    transcript = ""
-    previous_speaker = sentences_speaker_mapping[0]["speaker"]
-    transcript += f"{previous_speaker}: "
+def get_sentences_speaker_mapping(word_speaker_mapping, spk_ts):
+    return list(iter_sentences_speaker_mapping(word_speaker_mapping, spk_ts))
+
 
+def iter_speaker_aware_transcript(sentences_speaker_mapping):
+    """
+    Генератор фрагментов диаризированного текста: "".join(...) даёт get_speaker_aware_transcript.
+    """
+    previous_speaker = None
     for sentence_dict in sentences_speaker_mapping:
         speaker = sentence_dict["speaker"]
-        sentence = sentence_dict["text"]
+        if previous_speaker is None:
+            yield f"{speaker}: "
+        elif speaker != previous_speaker:
+            yield f"\n\n{speaker}: "
+        previous_speaker = speaker
+        yield sentence_dict["text"] + " "
 
-        if speaker != previous_speaker:
-            transcript += f"\n\n{speaker}: "
-            previous_speaker = speaker
-
-        transcript += sentence + " "
-    return transcript
 
+def get_speaker_aware_transcript(sentences_speaker_mapping) -> str:
+    return "".join(iter_speaker_aware_transcript(sentences_speaker_mapping))
 
 
 def format_timestamp(
@@ -0,0 +1,259 @@
+import contextlib
+import gc
+import itertools
+import logging
+import os
+import sys
+import threading
+import time
+from typing import Any, Callable, Dict, Hashable, Iterator, Optional
+
+
+# Резидентный пул моделей (Whisper, NeMo MSDD, пунктуация, demucs): модель загружается один раз на процесс
+# и выгружается, если не использовалась MODEL_POOL_IDLE_SECONDS секунд или если суммарный объём загруженных
+# моделей превышает MODEL_POOL_MAX_BYTES (0 — без ограничения). MODEL_POOL_ENABLED=0 возвращает прежнее
+# поведение: модель загружается на каждый вызов и сразу выгружается.
+MODEL_POOL_ENABLED = os.environ.get("MODEL_POOL_ENABLED", "1") == "1"
+MODEL_POOL_IDLE_SECONDS = float(os.environ.get("MODEL_POOL_IDLE_SECONDS", 15 * 60))
+MODEL_POOL_MAX_BYTES = int(os.environ.get("MODEL_POOL_MAX_BYTES", 0))
+
+logger = logging.getLogger(__name__)
+
+
+def memory_in_use() -> int:
+    """
+    Текущий объём памяти процесса (RSS) плюс память, занятая на GPU через torch, в байтах.
+    """
+    rss = 0
+    try:
+        import psutil
+        rss = psutil.Process().memory_info().rss
+    except ImportError:
+        if os.path.exists("/proc/self/statm"):
+            with open("/proc/self/statm") as f:
+                rss = int(f.read().split()[1]) * os.sysconf("SC_PAGE_SIZE")
+
+    # torch импортируется только если его уже загрузил кто-то другой
+    torch = sys.modules.get("torch")
+    if torch is not None and torch.cuda.is_available():
+        rss += torch.cuda.memory_allocated()
+    return rss
+
+
+def model_size(model: Any) -> Optional[int]:
+    """
+    Размер параметров и буферов модели torch в байтах: самой модели или torch-модулей в атрибутах
+    объекта-обёртки (PunctuationRunner, NeuralDiarizer). None, если модулей torch нет (CTranslate2, ONNX Runtime).
+    """
+    torch = sys.modules.get("torch")
+    if torch is None:
+        return None
+    if isinstance(model, torch.nn.Module):
+        modules = [model]
+    else:
+        modules = [value for value in getattr(model, "__dict__", {}).values() if isinstance(value, torch.nn.Module)]
+    if not modules:
+        return None
+    tensors = {id(t): t for module in modules for t in itertools.chain(module.parameters(), module.buffers())}
+    return sum(t.numel() * t.element_size() for t in tensors.values())
+
+
+def release_memory() -> None:
+    """
+    Возвращает освободившуюся память: сборка мусора и очистка кэша CUDA.
+    """
+    gc.collect()
+    torch = sys.modules.get("torch")
+    if torch is not None and torch.cuda.is_available():
+        torch.cuda.empty_cache()
+
+
+class _PoolEntry:
+    def __init__(self, model: Any, size: int, exclusive: bool):
+        self.model = model
+        self.size = size
+        self.exclusive = exclusive
+        self.leases = 0
+        self.last_used = time.monotonic()
+        self.lock = threading.Lock()
+
+
+class ModelPool:
+    """
+    Реестр загруженных моделей на процесс.
+
+    Модель выдаётся через lease(key, loader): при первом обращении вызывается loader, дальше возвращается
+    тот же экземпляр. Модели с exclusive=True (не потокобезопасные, например NeMo и пунктуация) выдаются
+    одному потребителю за раз, остальные — параллельно. Выданная модель не выгружается; свободные
+    выгружаются по таймауту простоя (фоновый поток) и, начиная с давно не использовавшихся, при превышении
+    max_bytes.
+
+    Размер модели для max_bytes — сумма параметров и буферов torch (model_size). Для моделей без torch-модулей
+    (Whisper на CTranslate2, ONNX Runtime) он оценивается по приросту памяти процесса при загрузке, куда
+    попадает и память, выделенная в это же время другими потоками; при параллельных этапах пакетной
+    загрузки такая оценка приблизительна, и вытеснение по max_bytes для этих моделей неточно.
+    """
+
+    def __init__(
+        self,
+        idle_seconds: float = MODEL_POOL_IDLE_SECONDS,
+        max_bytes: int = MODEL_POOL_MAX_BYTES,
+        enabled: bool = MODEL_POOL_ENABLED,
+    ):
+        self.idle_seconds = idle_seconds
+        self.max_bytes = max_bytes
+        self.enabled = enabled
+        self.load_seconds = 0.0
+        self._entries: Dict[Hashable, _PoolEntry] = {}
+        self._loading: Dict[Hashable, threading.Lock] = {}
+        self._lock = threading.Lock()
+        self._reaper: Optional[threading.Thread] = None
+
+    def _load(self, key: Hashable, loader: Callable[[], Any], exclusive: bool) -> _PoolEntry:
+        before = memory_in_use()
+        started = time.perf_counter()
+        model = loader()
+        elapsed = time.perf_counter() - started
+        size = model_size(model)
+        if size is None:
+            size = max(memory_in_use() - before, 0)
+        self.load_seconds += elapsed
+        logger.info("Модель %s загружена за %.1f с (~%d МБ).", key, elapsed, size // 2 ** 20)
+        return _PoolEntry(model, size, exclusive)
+
+    def _acquire_entry(self, key: Hashable, loader: Callable[[], Any], exclusive: bool) -> _PoolEntry:
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is not None:
+                entry.leases += 1
+                return entry
+            loading = self._loading.setdefault(key, threading.Lock())
+
+        # Загрузка одной модели не блокирует выдачу других; параллельный запрос той же модели ждёт её
+        with loading:
+            with self._lock:
+                entry = self._entries.get(key)
+                if entry is not None:
+                    entry.leases += 1
+                    return entry
+
+            try:
+                entry = self._load(key, loader, exclusive)
+                with self._lock:
+                    entry.leases += 1
+                    self._entries[key] = entry
+                    self._evict_over_budget()
+            finally:
+                # Блокировка загрузки удаляется и при ошибке loader, следующий запрос загрузит модель заново
+                with self._lock:
+                    self._loading.pop(key, None)
+        self._start_reaper()
+        return entry
+
+    @contextlib.contextmanager
+    def lease(self, key: Hashable, loader: Callable[[], Any], exclusive: bool = False) -> Iterator[Any]:
+        """
+        Выдаёт модель на время блока with.
+
+        :param key: Ключ модели (например, ("whisper", "large", "cuda", "float16")).
+        :param loader: Функция загрузки модели, вызывается при отсутствии модели в пуле.
+        :param exclusive: Выдавать модель только одному потребителю за раз.
+        """
+        if not self.enabled:
+            model = loader()
+            try:
+                yield model
+            finally:
+                del model
+                release_memory()
+            return
+
+        entry = self._acquire_entry(key, loader, exclusive)
+        try:
+            if entry.exclusive:
+                with entry.lock:
+                    yield entry.model
+            else:
+                yield entry.model
+        finally:
+            with self._lock:
+                entry.leases -= 1
+                entry.last_used = time.monotonic()
+
+    def _unload(self, key: Hashable, reason: str) -> None:
+        entry = self._entries.pop(key)
+        logger.info("Модель %s выгружена (%s).", key, reason)
+        del entry.model
+
+    def _evict_over_budget(self) -> None:
+        if not self.max_bytes:
+            return
+        total = sum(entry.size for entry in self._entries.values())
+        for key in sorted(self._entries, key=lambda k: self._entries[k].last_used):
+            if total <= self.max_bytes:
+                break
+            entry = self._entries[key]
+            if entry.leases:
+                continue
+            total -= entry.size
+            self._unload(key, f"превышен лимит памяти пула {self.max_bytes // 2 ** 20} МБ")
+        release_memory()
+
+    def evict_idle(self) -> None:
+        """
+        Выгружает модели, которые не использовались дольше idle_seconds.
+        """
+        now = time.monotonic()
+        with self._lock:
+            expired = [key for key, entry in self._entries.items()
+                       if not entry.leases and now - entry.last_used >= self.idle_seconds]
+            for key in expired:
+                self._unload(key, f"простой дольше {self.idle_seconds:.0f} с")
+        if expired:
+            release_memory()
+
+    def clear(self) -> None:
+        """
+        Выгружает все свободные модели.
+        """
+        with self._lock:
+            for key in [key for key, entry in self._entries.items() if not entry.leases]:
+                self._unload(key, "очистка пула")
+        release_memory()
+
+    def _start_reaper(self) -> None:
+        if self.idle_seconds <= 0:
+            return
+        with self._lock:
+            if self._reaper is not None:
+                return
+            self._reaper = threading.Thread(target=self._reap, name="model-pool-reaper", daemon=True)
+            self._reaper.start()
+
+    def _reap(self) -> None:
+        interval = min(max(self.idle_seconds / 4, 1), 60)
+        while True:
+            time.sleep(interval)
+            self.evict_idle()
+
+    def loaded(self) -> Dict[Hashable, int]:
+        """
+        Загруженные модели и их оценочный размер в байтах.
+        """
+        with self._lock:
+            return {key: entry.size for key, entry in self._entries.items()}
+
+
+_model_pool: Optional[ModelPool] = None
+_model_pool_lock = threading.Lock()
+
+
+def get_model_pool() -> ModelPool:
+    """
+    Возвращает общий для процесса пул моделей (создаётся при первом обращении).
+    """
+    global _model_pool
+    with _model_pool_lock:
+        if _model_pool is None:
+            _model_pool = ModelPool()
+    return _model_pool
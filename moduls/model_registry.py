@@ -0,0 +1,311 @@
+import hashlib
+import json
+import logging
+import os
+import threading
+from typing import Dict, List, Optional, Tuple
+from moduls import helpers_diaraize as helpers
+
+
+# Локальный реестр моделей: все веса пайплайна (NeMo, Whisper, пунктуация, эмбеддинги FAISS, demucs) заранее
+# скачиваются командой prewarm в MODELS_DIR. Если есть lock-файл (или MODELS_OFFLINE=1), во время обработки
+# отсутствующая модель — ошибка, а не скачивание; без lock-файла модели, как и раньше, скачиваются по имени.
+MODELS_DIR = os.environ.get("MODELS_DIR", os.path.join(helpers.GLOBAL_BASE_DIR, "models"))
+# Lock-файл: ревизии и контрольные суммы SHA-256 скачанных файлов. prewarm скачивает ровно записанные в нём
+# ревизии и новые модели в него не добавляет (только prewarm --update-lock), поэтому lock-файл из репозитория
+# даёт одинаковые модели на всех хостах.
+MODELS_LOCK_PATH = os.environ.get("MODELS_LOCK_PATH",
+                                  os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))),
+                                               "models.lock.json"))
+# 1 — работа без сети: отсутствующая в реестре модель — ошибка, библиотекам (huggingface_hub, transformers)
+# запрещены сетевые запросы, prewarm только проверяет уже скачанные модели.
+MODELS_OFFLINE = os.environ.get("MODELS_OFFLINE", "0") == "1"
+# Модели Whisper, которые готовит prewarm (через запятую).
+PREWARM_WHISPER_MODELS = os.environ.get("PREWARM_WHISPER_MODELS", "large,medium.en")
+# Модель эмбеддингов для индексов FAISS (core.storage.faiss_controller).
+FAISS_EMBEDDINGS_MODEL = os.environ.get("FAISS_EMBEDDINGS_MODEL",
+                                        "sentence-transformers/paraphrase-multilingual-MiniLM-L12-v2")
+
+# Конфигурации, поставляемые вместе с кодом (moduls/configs), и их контрольные суммы.
+CONFIG_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), "configs")
+BUNDLED_CONFIGS = {
+    "diar_infer_telephonic.yaml": "6a07004c6b18c72a3d9180850d2711cfa547a1ac6982ca4f9112ba9ba6225cb6",
+}
+
+# Модели NeMo MSDD (см. helpers.create_config) и классы для их загрузки.
+NEMO_MODELS = {
+    "vad_multilingual_marblenet": "EncDecClassificationModel",
+    "titanet_large": "EncDecSpeakerLabelModel",
+    "diar_msdd_telephonic": "EncDecDiarLabelModel",
+}
+# Из репозиториев Hugging Face скачиваются только веса PyTorch и файлы токенизатора/конфигурации.
+HF_ALLOW_PATTERNS = ["*.json", "*.txt", "*.model", "*.safetensors", "pytorch_model.bin", "*/config.json"]
+WHISPER_ALLOW_PATTERNS = ["config.json", "preprocessor_config.json", "model.bin", "tokenizer.json", "vocabulary.*"]
+HASH_BLOCK = 1 << 20
+
+logger = logging.getLogger(__name__)
+
+_lock_lock = threading.Lock()
+_lock: Optional[dict] = None
+_verified_configs = set()
+_warned = set()
+
+
+def apply_environment() -> None:
+    """
+    Направляет кэши библиотек в MODELS_DIR и в офлайн-режиме запрещает им сетевые запросы.
+
+    Вызывается до импорта huggingface_hub и transformers (см. main.py): они читают переменные при импорте.
+    """
+    # Чекпойнты demucs скачиваются через torch.hub
+    os.environ.setdefault("TORCH_HOME", os.path.join(MODELS_DIR, "torch"))
+    if MODELS_OFFLINE:
+        os.environ.setdefault("HF_HUB_OFFLINE", "1")
+        os.environ.setdefault("TRANSFORMERS_OFFLINE", "1")
+
+
+def artifact_id(kind: str, name: str) -> str:
+    return f"{kind}:{name}"
+
+
+def registry_entries() -> List[Tuple[str, str]]:
+    """
+    Модели, которые использует пайплайн при текущих настройках: (вид, имя).
+    """
+    from moduls.fast_diarization import FAST_EMBEDDING_MODEL
+    from moduls.punctuation import PUNCTUATION_MODEL
+    from moduls.source_separation import DEMUCS_MODEL
+
+    entries = [("nemo", name) for name in NEMO_MODELS]
+    if FAST_EMBEDDING_MODEL not in NEMO_MODELS:
+        entries.append(("nemo", FAST_EMBEDDING_MODEL))
+    entries += [("whisper", name.strip()) for name in PREWARM_WHISPER_MODELS.split(",") if name.strip()]
+    entries += [("hf", PUNCTUATION_MODEL), ("hf", FAISS_EMBEDDINGS_MODEL), ("demucs", DEMUCS_MODEL)]
+    return entries
+
+
+def sha256_file(path: str) -> str:
+    digest = hashlib.sha256()
+    with open(path, "rb") as f:
+        for block in iter(lambda: f.read(HASH_BLOCK), b""):
+            digest.update(block)
+    return digest.hexdigest()
+
+
+def artifact_size(path: str) -> int:
+    if os.path.isfile(path):
+        return os.path.getsize(path)
+    return sum(os.path.getsize(os.path.join(root, name)) for root, _, files in os.walk(path) for name in files)
+
+
+def file_checksums(path: str) -> Dict[str, str]:
+    """
+    Контрольные суммы артефакта: одного файла или всех файлов каталога (пути относительно каталога).
+    """
+    if os.path.isfile(path):
+        return {os.path.basename(path): sha256_file(path)}
+    checksums = {}
+    for root, _, files in os.walk(path):
+        for name in files:
+            full = os.path.join(root, name)
+            checksums[os.path.relpath(full, path).replace(os.sep, "/")] = sha256_file(full)
+    return checksums
+
+
+def load_lock(path: str = MODELS_LOCK_PATH) -> dict:
+    """
+    Читает lock-файл реестра (один раз на процесс): {идентификатор: {"revision", "path", "files", ...}}.
+    """
+    global _lock
+    with _lock_lock:
+        if _lock is None:
+            try:
+                with open(path, "r", encoding="utf-8") as f:
+                    _lock = json.load(f)
+            except FileNotFoundError:
+                _lock = {}
+        return _lock
+
+
+def save_lock(lock: dict, path: str = MODELS_LOCK_PATH) -> None:
+    global _lock
+    tmp_path = f"{path}.{os.getpid()}.tmp"
+    with open(tmp_path, "w", encoding="utf-8") as f:
+        json.dump(lock, f, ensure_ascii=False, indent=2, sort_keys=True)
+        f.write("\n")
+    os.replace(tmp_path, path)
+    with _lock_lock:
+        _lock = lock
+
+
+def resolve(kind: str, name: str) -> str:
+    """
+    Путь к локальной копии модели из реестра.
+
+    Если lock-файл есть или включён MODELS_OFFLINE, модели скачивает только prewarm: отсутствующая в lock-файле
+    или в MODELS_DIR модель сразу даёт RuntimeError, а не скачивание посреди обработки. Без lock-файла
+    возвращается имя модели, и библиотека скачивает её сама (с предупреждением), как до появления реестра.
+    """
+    lock = load_lock()
+    entry = lock.get(artifact_id(kind, name))
+    if entry is not None:
+        path = os.path.join(MODELS_DIR, entry["path"])
+        if os.path.exists(path):
+            return path
+
+    if MODELS_OFFLINE or lock:
+        if entry is None:
+            raise RuntimeError(f"Модели {artifact_id(kind, name)} нет в lock-файле {MODELS_LOCK_PATH}: "
+                               "выполните python main.py prewarm --update-lock")
+        raise RuntimeError(f"Модель {artifact_id(kind, name)} не подготовлена: выполните python main.py prewarm")
+    if artifact_id(kind, name) not in _warned:
+        _warned.add(artifact_id(kind, name))
+        logger.warning("Lock-файла моделей нет: %s будет скачана при первом использовании "
+                       "(python main.py prewarm --update-lock готовит модели заранее).", artifact_id(kind, name))
+    return name
+
+
+def config_path(name: str) -> str:
+    """
+    Путь к поставляемой с кодом конфигурации; при первом обращении проверяется её контрольная сумма.
+    """
+    path = os.path.join(CONFIG_DIR, name)
+    if name not in _verified_configs:
+        if sha256_file(path) != BUNDLED_CONFIGS[name]:
+            raise RuntimeError(f"Контрольная сумма конфигурации {path} не совпадает с реестром")
+        _verified_configs.add(name)
+    return path
+
+
+def _nemo_class(class_name: str):
+    import nemo.collections.asr.models as asr_models
+
+    return getattr(asr_models, class_name)
+
+
+def load_nemo_model(name: str, class_name: str, device: str = "cpu"):
+    """
+    Загружает модель NeMo из реестра (.nemo) или, без lock-файла, по имени из NGC.
+    """
+    cls = _nemo_class(class_name)
+    path = resolve("nemo", name)
+    if path.endswith(".nemo"):
+        return cls.restore_from(path, map_location=device)
+    return cls.from_pretrained(path, map_location=device)
+
+
+def _hf_snapshot(repo_id: str, revision: Optional[str], allow_patterns: List[str]) -> str:
+    from huggingface_hub import snapshot_download
+
+    return snapshot_download(repo_id, revision=revision, cache_dir=os.path.join(MODELS_DIR, "hub"),
+                             allow_patterns=allow_patterns)
+
+
+def _repo_id_from_snapshot(path: str) -> str:
+    # <cache_dir>/models--<организация>--<модель>/snapshots/<ревизия>
+    return os.path.basename(os.path.dirname(os.path.dirname(path)))[len("models--"):].replace("--", "/")
+
+
+def _fetch(kind: str, name: str, entry: Optional[dict]) -> dict:
+    """
+    Скачивает артефакт (ревизию из lock-файла, если она записана) и возвращает его запись для lock-файла.
+    """
+    if kind == "nemo":
+        path = os.path.join(MODELS_DIR, "nemo", f"{name}.nemo")
+        if not os.path.exists(path):
+            os.makedirs(os.path.dirname(path), exist_ok=True)
+            model = _nemo_class(NEMO_MODELS.get(name, "EncDecSpeakerLabelModel")).from_pretrained(
+                name, map_location="cpu")
+            model.save_to(f"{path}.tmp")
+            os.replace(f"{path}.tmp", path)
+        return {"path": os.path.relpath(path, MODELS_DIR)}
+
+    if kind == "whisper":
+        if entry is not None:
+            path = _hf_snapshot(entry["repo_id"], entry["revision"], WHISPER_ALLOW_PATTERNS)
+        else:
+            import faster_whisper
+
+            path = faster_whisper.download_model(name, cache_dir=os.path.join(MODELS_DIR, "hub"))
+        return {"path": os.path.relpath(path, MODELS_DIR), "repo_id": _repo_id_from_snapshot(path),
+                "revision": os.path.basename(path)}
+
+    if kind == "hf":
+        path = _hf_snapshot(name, entry["revision"] if entry else None, HF_ALLOW_PATTERNS)
+        return {"path": os.path.relpath(path, MODELS_DIR), "repo_id": name, "revision": os.path.basename(path)}
+
+    if kind == "demucs":
+        import torch
+        from moduls.source_separation import _load_demucs
+
+        _load_demucs(name, "cpu")
+        path = os.path.join(torch.hub.get_dir(), "checkpoints")
+        return {"path": os.path.relpath(path, MODELS_DIR)}
+
+    raise ValueError(f"Неизвестный вид модели: {kind}")
+
+
+def _warm(kind: str, name: str) -> None:
+    """
+    Загружает модель из реестра один раз: проверяет, что локальная копия рабочая, без обращений к сети.
+    """
+    path = resolve(kind, name)
+    if kind == "nemo":
+        load_nemo_model(name, NEMO_MODELS.get(name, "EncDecSpeakerLabelModel"))
+    elif kind == "whisper":
+        import faster_whisper
+
+        faster_whisper.WhisperModel(path, device="cpu", compute_type="int8")
+    elif kind == "hf":
+        from transformers import AutoConfig, AutoTokenizer
+
+        AutoConfig.from_pretrained(path)
+        AutoTokenizer.from_pretrained(path)
+
+
+def prewarm(verify_only: bool = False, warm: bool = True, update_lock: bool = False) -> Tuple[bool, str]:
+    """
+    Готовит все модели реестра: скачивает в MODELS_DIR ревизии из lock-файла, сверяет контрольные суммы
+    с lock-файлом и загружает каждую модель один раз.
+
+    :param verify_only: Только проверить контрольные суммы уже скачанных моделей, ничего не скачивая.
+    :param warm: Загрузить каждую модель после скачивания.
+    :param update_lock: Добавить в lock-файл отсутствующие в нём модели (текущие ревизии); без него такие
+        модели — ошибка, чтобы хосты не закрепляли каждый свою последнюю ревизию.
+    :return: (все ли модели готовы, отчёт по моделям).
+    """
+    if MODELS_OFFLINE and not verify_only:
+        raise RuntimeError("prewarm скачивает модели и недоступен при MODELS_OFFLINE=1 (используйте --verify)")
+
+    for name in BUNDLED_CONFIGS:
+        config_path(name)
+    lock = dict(load_lock())
+    lines, failed = [], False
+    for kind, name in registry_entries():
+        key = artifact_id(kind, name)
+        entry = lock.get(key)
+        try:
+            if entry is None and (verify_only or not update_lock):
+                raise RuntimeError("нет в lock-файле (добавляется командой prewarm --update-lock)")
+            if verify_only:
+                fetched = entry
+            else:
+                fetched = _fetch(kind, name, entry)
+            checksums = file_checksums(os.path.join(MODELS_DIR, fetched["path"]))
+            if entry is not None and entry.get("files") and checksums != entry["files"]:
+                changed = sorted(set(checksums.items()) ^ set(entry["files"].items()))
+                raise RuntimeError(f"контрольные суммы не совпадают с lock-файлом: {changed[0][0]} ...")
+            if entry is None:
+                lock[key] = dict(fetched, files=checksums)
+                save_lock(lock)
+            if warm and not verify_only:
+                _warm(kind, name)
+            size = artifact_size(os.path.join(MODELS_DIR, fetched["path"]))
+            lines.append(f"{key}: готово ({len(checksums)} файлов, {size / 2**20:.0f} МБ)")
+        except Exception as e:
+            failed = True
+            logger.error("Модель %s: %s", key, e)
+            lines.append(f"{key}: ошибка: {e}")
+
+    lines.append("Модели готовы к работе без сети." if not failed else "Часть моделей не подготовлена.")
+    return not failed, "\n".join(lines)
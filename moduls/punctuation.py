@@ -0,0 +1,230 @@
+import logging
+import os
+import threading
+from typing import Callable, Iterable, Iterator, List, Optional, Tuple
+from moduls import helpers_diaraize as helpers
+from moduls.execution_profile import get_execution_profile
+from moduls.model_registry import resolve
+from moduls.model_pool import get_model_pool
+
+
+# Модель восстановления пунктуации (классификация токенов, как в deepmultilingualpunctuation).
+PUNCTUATION_MODEL = os.environ.get("PUNCTUATION_MODEL", "kredor/punctuate-all")
+# Среда выполнения модели:
+#   torch - модель transformers как есть (по умолчанию);
+#   int8  - динамическое квантование линейных слоёв torch в int8 (только CPU);
+#   onnx  - экспорт в ONNX и int8-квантование через optimum[onnxruntime] (только CPU).
+PUNCTUATION_BACKEND = os.environ.get("PUNCTUATION_BACKEND", "torch").lower()
+# Текст размечается потоком фрагментов по PUNCTUATION_CHUNK_WORDS слов (и не длиннее предела подтокенов модели);
+# последние PUNCTUATION_OVERLAP_WORDS слов фрагмента повторяются в начале следующего и размечаются там, где у них
+# есть правый контекст.
+PUNCTUATION_CHUNK_WORDS = int(os.environ.get("PUNCTUATION_CHUNK_WORDS", 230))
+PUNCTUATION_OVERLAP_WORDS = int(os.environ.get("PUNCTUATION_OVERLAP_WORDS", 5))
+# Количество фрагментов в одном прогоне модели.
+PUNCTUATION_BATCH_SIZE = int(os.environ.get("PUNCTUATION_BATCH_SIZE", 8))
+# Каталог экспортированных и квантованных ONNX-моделей.
+PUNCTUATION_ONNX_DIR = os.environ.get("PUNCTUATION_ONNX_DIR", os.path.join(helpers.GLOBAL_BASE_DIR, "onnxModels"))
+
+BACKENDS = ("torch", "int8", "onnx")
+# Предел длины входа, если токенизатор его не сообщает (model_max_length не задан).
+DEFAULT_MAX_TOKENS = 512
+
+logger = logging.getLogger(__name__)
+
+
+def iter_word_chunks(words: Iterable[str], chunk_words: int = PUNCTUATION_CHUNK_WORDS,
+                     overlap_words: int = PUNCTUATION_OVERLAP_WORDS, max_tokens: int = 0,
+                     token_count: Optional[Callable[[str], int]] = None) -> Iterator[Tuple[List[str], int]]:
+    """
+    Делит поток слов на перекрывающиеся фрагменты, не читая его целиком.
+
+    Элемент может содержать несколько слов (сегмент Whisper): размер фрагмента считается в словах
+    через пробел и, если задан max_tokens, в подтокенах модели (token_count элемента), чтобы фрагмент
+    не обрезался токенизатором. Хвост фрагмента (не больше overlap_words слов, но хотя бы один элемент,
+    если элементов больше одного и он помещается в предел подтокенов) повторяется в начале следующего.
+
+    :param max_tokens: Предел подтокенов во фрагменте (0 — без предела).
+    :param token_count: Число подтокенов элемента (обязательно при max_tokens).
+    :return: Генератор пар (фрагмент, keep): метки первых keep элементов берутся из этого фрагмента.
+    """
+    chunk, sizes, tokens = [], [], []
+    for word in words:
+        size = max(len(word.split()), 1)
+        word_tokens = token_count(word) if max_tokens else 0
+        if chunk and (sum(sizes) + size > chunk_words or (max_tokens and sum(tokens) + word_tokens > max_tokens)):
+            carry, carried, carried_tokens = 0, 0, 0
+            while carry < len(chunk) - 1 and (carry == 0 or carried + sizes[-carry - 1] <= overlap_words):
+                if max_tokens and carried_tokens + tokens[-carry - 1] + word_tokens > max_tokens:
+                    break
+                carried += sizes[-carry - 1]
+                carried_tokens += tokens[-carry - 1]
+                carry += 1
+            if overlap_words <= 0:
+                carry = 0
+            yield chunk, len(chunk) - carry
+            chunk, sizes, tokens = chunk[len(chunk) - carry:], sizes[len(sizes) - carry:], tokens[len(tokens) - carry:]
+        chunk.append(word)
+        sizes.append(size)
+        tokens.append(word_tokens)
+    if chunk:
+        yield chunk, len(chunk)
+
+
+_tokenizers = threading.local()
+
+
+def thread_tokenizer(model_name: str = PUNCTUATION_MODEL):
+    """
+    Токенизатор модели пунктуации для текущего потока: по нему фрагменты режутся по подтокенам
+    (быстрый токенизатор нельзя вызывать из нескольких потоков одновременно).
+    """
+    tokenizers = _tokenizers.__dict__
+    if model_name not in tokenizers:
+        from transformers import AutoTokenizer
+
+        tokenizers[model_name] = AutoTokenizer.from_pretrained(resolve("hf", model_name))
+    return tokenizers[model_name]
+
+
+def chunk_token_limit(tokenizer) -> int:
+    """
+    Сколько подтокенов слов помещается во вход модели (без служебных токенов).
+    """
+    max_length = tokenizer.model_max_length if tokenizer.model_max_length < 10 ** 6 else DEFAULT_MAX_TOKENS
+    return max_length - tokenizer.num_special_tokens_to_add()
+
+
+def word_token_count(tokenizer, word: str) -> int:
+    return len(tokenizer([word], is_split_into_words=True, add_special_tokens=False)["input_ids"])
+
+
+class PunctuationRunner:
+    """
+    Загруженная модель пунктуации: размечает пакет фрагментов за один прогон.
+
+    Каждый элемент фрагмента передаётся токенизатору как отдельное слово (is_split_into_words), и элемент
+    получает метку своего последнего подтокена, как в deepmultilingualpunctuation.PunctuationModel.predict.
+    """
+
+    def __init__(self, tokenizer, model, device: str = "cpu"):
+        self.tokenizer = tokenizer
+        self.model = model
+        self.device = device
+        self.id2label = model.config.id2label
+
+    def label_chunks(self, chunks: List[List[str]]) -> List[List[str]]:
+        import torch
+
+        # Фрагменты почти одинаковой длины, поэтому дополнение до самого длинного в пакете невелико
+        encoded = self.tokenizer(chunks, is_split_into_words=True, padding=True, truncation=True,
+                                 return_tensors="pt")
+        inputs = {name: tensor.to(self.device) for name, tensor in encoded.items()}
+        with torch.no_grad():
+            predictions = self.model(**inputs).logits.argmax(-1).cpu().numpy()
+
+        labels = []
+        for i, chunk in enumerate(chunks):
+            # Элементы без токенов (пустые или обрезанные по длине модели) остаются без знака
+            chunk_labels = ["0"] * len(chunk)
+            labelled = set()
+            for position, word_id in enumerate(encoded.word_ids(i)):
+                if word_id is not None:
+                    chunk_labels[word_id] = self.id2label[int(predictions[i, position])]
+                    labelled.add(word_id)
+            truncated = sum(1 for j, word in enumerate(chunk) if word.strip() and j not in labelled)
+            if truncated:
+                logger.warning("Фрагмент длиннее входа модели пунктуации: %d из %d элементов обрезаны "
+                               "и остаются без знака.", truncated, len(chunk))
+            labels.append(chunk_labels)
+        return labels
+
+
+def _load_onnx(model_name: str):
+    import onnxruntime
+    from optimum.onnxruntime import ORTModelForTokenClassification, ORTQuantizer
+    from optimum.onnxruntime.configuration import AutoQuantizationConfig
+
+    export_dir = os.path.join(PUNCTUATION_ONNX_DIR, model_name.replace("/", "--"))
+    if not os.path.exists(os.path.join(export_dir, "model_quantized.onnx")):
+        logger.info("Экспорт модели пунктуации %s в ONNX (int8)...", model_name)
+        model = ORTModelForTokenClassification.from_pretrained(resolve("hf", model_name), export=True)
+        model.save_pretrained(export_dir)
+        quantizer = ORTQuantizer.from_pretrained(export_dir)
+        quantizer.quantize(save_dir=export_dir,
+                           quantization_config=AutoQuantizationConfig.avx2(is_static=False, per_channel=False))
+
+    options = onnxruntime.SessionOptions()
+    options.intra_op_num_threads = get_execution_profile().threads("punctuate")
+    return ORTModelForTokenClassification.from_pretrained(export_dir, file_name="model_quantized.onnx",
+                                                          session_options=options)
+
+
+def load_punctuation_runner(model_name: str = PUNCTUATION_MODEL, backend: str = PUNCTUATION_BACKEND,
+                            device: str = "cpu") -> PunctuationRunner:
+    """
+    Загружает модель пунктуации в выбранной среде выполнения.
+
+    int8 и onnx работают только на CPU; на GPU используется torch. Если optimum не установлен,
+    onnx заменяется на int8.
+    """
+    import torch
+    from transformers import AutoModelForTokenClassification, AutoTokenizer
+
+    if backend not in BACKENDS:
+        raise ValueError(f"Неизвестная среда выполнения пунктуации: {backend}")
+    if backend != "torch" and device != "cpu":
+        logger.warning("Среда %s доступна только на CPU, пунктуация выполняется в torch.", backend)
+        backend = "torch"
+
+    model_path = resolve("hf", model_name)
+    tokenizer = AutoTokenizer.from_pretrained(model_path)
+    if backend == "onnx":
+        try:
+            return PunctuationRunner(tokenizer, _load_onnx(model_name))
+        except ImportError:
+            logger.warning("optimum[onnxruntime] не установлен, пунктуация выполняется в int8 torch.")
+            backend = "int8"
+
+    model = AutoModelForTokenClassification.from_pretrained(model_path).eval()
+    if backend == "int8":
+        model = torch.quantization.quantize_dynamic(model, {torch.nn.Linear}, dtype=torch.qint8)
+    return PunctuationRunner(tokenizer, model.to(device), device)
+
+
+def iter_punctuation_labels(
+    words: Iterable[str],
+    device: str = "cpu",
+    model_name: str = PUNCTUATION_MODEL,
+    backend: str = PUNCTUATION_BACKEND,
+    batch_size: int = PUNCTUATION_BATCH_SIZE,
+    chunk_words: int = PUNCTUATION_CHUNK_WORDS,
+    overlap_words: int = PUNCTUATION_OVERLAP_WORDS,
+) -> Iterator[str]:
+    """
+    Размечает поток слов знаками пунктуации ("0" — без знака, иначе ".", ",", "?", "-", ":" ...).
+
+    Фрагменты из iter_word_chunks (не длиннее входа модели в подтокенах) собираются в пакеты по batch_size
+    и размечаются одним прогоном модели из пула моделей; метки отдаются по мере готовности пакетов. Время
+    растёт линейно с длиной текста, а память ограничена одним пакетом.
+
+    :return: Генератор меток, по одной на каждое слово words в том же порядке.
+    """
+    pool = get_model_pool()
+    key = ("punctuation", model_name, backend, device)
+
+    def label(pending):
+        with pool.lease(key, lambda: load_punctuation_runner(model_name, backend, device), exclusive=True) as runner:
+            batch_labels = runner.label_chunks([chunk for chunk, _ in pending])
+        for (_, keep), chunk_labels in zip(pending, batch_labels):
+            yield from chunk_labels[:keep]
+
+    tokenizer = thread_tokenizer(model_name)
+    pending = []
+    for chunk, keep in iter_word_chunks(words, chunk_words, overlap_words, chunk_token_limit(tokenizer),
+                                        lambda word: word_token_count(tokenizer, word)):
+        pending.append((chunk, keep))
+        if len(pending) == batch_size:
+            yield from label(pending)
+            pending = []
+    if pending:
+        yield from label(pending)
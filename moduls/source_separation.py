@@ -0,0 +1,138 @@
+import logging
+import os
+import numpy as np
+from moduls.audio_stream import SAMPLE_RATE
+from moduls.model_pool import get_model_pool
+from moduls.model_registry import resolve
+
+
+# Модель demucs для отделения вокала.
+DEMUCS_MODEL = os.environ.get("DEMUCS_MODEL", "htdemucs")
+# Аудио передаётся в demucs фрагментами SEPARATION_CHUNK_SECONDS с перекрытием SEPARATION_OVERLAP_SECONDS
+# (на перекрытии фрагменты сшиваются линейным переходом), поэтому память не зависит от длительности записи.
+SEPARATION_CHUNK_SECONDS = float(os.environ.get("SEPARATION_CHUNK_SECONDS", 60))
+SEPARATION_OVERLAP_SECONDS = float(os.environ.get("SEPARATION_OVERLAP_SECONDS", 2))
+# Запись с оценкой SNR не ниже порога считается чистой, и отделение вокала пропускается; 0 — отделять всегда.
+SEPARATION_SKIP_SNR_DB = float(os.environ.get("SEPARATION_SKIP_SNR_DB", 25))
+
+# Длина кадра для оценки SNR (в сэмплах, 32 мс при 16 кГц).
+SNR_FRAME = 512
+
+logger = logging.getLogger(__name__)
+
+
+def estimate_snr_db(audio_waveform: np.ndarray, frame: int = SNR_FRAME) -> float:
+    """
+    Грубая оценка отношения сигнал/шум записи по энергии кадров.
+
+    Уровень речи — 95-й перцентиль энергии кадров, уровень фона — 10-й. В паузах чистой записи
+    почти тишина, и оценка высокая; музыка или шум под речью поднимают фон и снижают оценку.
+
+    :param audio_waveform: Аудио 16 кГц моно.
+    :return: Оценка SNR в дБ.
+    """
+    frames = len(audio_waveform) // frame
+    if frames < 10:
+        return 0.0
+
+    energy = np.square(audio_waveform[:frames * frame].reshape(frames, frame), dtype=np.float64).mean(axis=1)
+    noise, speech = np.percentile(energy, [10, 95])
+    return float(10 * np.log10((speech + 1e-10) / (noise + 1e-10)))
+
+
+def needs_separation(audio_waveform: np.ndarray, skip_snr_db: float = SEPARATION_SKIP_SNR_DB) -> bool:
+    """
+    Решает, стоит ли отделять вокал: на чистых записях demucs не улучшает распознавание,
+    а на CPU это самый дорогой этап.
+    """
+    if skip_snr_db <= 0:
+        return True
+
+    snr = estimate_snr_db(audio_waveform)
+    if snr >= skip_snr_db:
+        logger.info("SNR записи %.1f дБ не ниже %.1f дБ: отделение вокала пропущено.", snr, skip_snr_db)
+        return False
+
+    logger.info("SNR записи %.1f дБ: требуется отделение вокала.", snr)
+    return True
+
+
+def _load_demucs(model_name: str, device: str):
+    from demucs.pretrained import get_model
+
+    model = get_model(model_name)
+    model.eval()
+    return model.to(device)
+
+
+def separate_vocals(
+    audio_waveform: np.ndarray,
+    device: str,
+    model_name: str = DEMUCS_MODEL,
+    chunk_seconds: float = SEPARATION_CHUNK_SECONDS,
+    overlap_seconds: float = SEPARATION_OVERLAP_SECONDS,
+) -> np.ndarray:
+    """
+    Отделяет вокал моделью demucs в текущем процессе (модель берётся из пула моделей).
+
+    Запись обрабатывается фрагментами: каждый фрагмент переводится в формат модели (44.1 кГц стерео),
+    разделяется, и дорожка вокала возвращается в 16 кГц моно. Нормализация (среднее и std) общая
+    для всей записи, как в CLI demucs.
+
+    :param audio_waveform: Аудио 16 кГц моно float32.
+    :param device: Устройство для запуска модели.
+    :return: Вокал 16 кГц моно float32 той же длины.
+    """
+    import torch
+    import torchaudio
+    from demucs.apply import apply_model
+
+    chunk = int(chunk_seconds * SAMPLE_RATE)
+    overlap = min(int(overlap_seconds * SAMPLE_RATE), chunk // 2)
+    mean, std = float(audio_waveform.mean()), float(audio_waveform.std()) or 1.0
+    vocals = np.empty(len(audio_waveform), dtype=np.float32)
+    fade_in = np.linspace(0.0, 1.0, overlap, dtype=np.float32)
+
+    # Чекпойнт demucs должен быть подготовлен prewarm: иначе torch.hub скачал бы его посреди обработки
+    resolve("demucs", model_name)
+    with get_model_pool().lease(("demucs", model_name, device), lambda: _load_demucs(model_name, device),
+                                exclusive=True) as model:
+        vocals_index = model.sources.index("vocals")
+        start = 0
+        while start < len(audio_waveform):
+            end = min(start + chunk, len(audio_waveform))
+            mix = torch.from_numpy(np.ascontiguousarray(audio_waveform[start:end]))
+            mix = torchaudio.functional.resample((mix - mean) / std, SAMPLE_RATE, model.samplerate)
+            mix = mix.unsqueeze(0).repeat(model.audio_channels, 1)
+
+            with torch.no_grad():
+                sources = apply_model(model, mix[None], device=device, split=True, overlap=0.25, progress=False)[0]
+            part = torchaudio.functional.resample(sources[vocals_index].mean(0).cpu(), model.samplerate, SAMPLE_RATE)
+            part = part.numpy()[:end - start] * std + mean
+            if len(part) < end - start:
+                part = np.pad(part, (0, end - start - len(part)))
+
+            # Перекрытие с предыдущим фрагментом сшивается линейным переходом
+            if start > 0 and overlap:
+                part[:overlap] = vocals[start:start + overlap] * (1 - fade_in) + part[:overlap] * fade_in
+            vocals[start:end] = part
+
+            if end == len(audio_waveform):
+                break
+            start = end - overlap
+
+    return vocals
+
+
+def isolate_vocals(audio_waveform: np.ndarray, device: str, skip_snr_db: float = SEPARATION_SKIP_SNR_DB) -> np.ndarray:
+    """
+    Отделяет вокал, если запись этого требует (needs_separation); при ошибке demucs возвращает исходное аудио.
+    """
+    if not needs_separation(audio_waveform, skip_snr_db):
+        return audio_waveform
+
+    try:
+        return separate_vocals(audio_waveform, device)
+    except Exception as e:
+        logger.warning("Source splitting failed, using original audio: %s", e)
+        return audio_waveform
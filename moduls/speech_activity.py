@@ -0,0 +1,129 @@
+import logging
+import os
+from typing import List, Optional, Tuple
+import numpy as np
+from moduls.audio_stream import SAMPLE_RATE
+from moduls.timeline import TURN_DTYPE, save_rttm
+
+
+# 1 — общий VAD: участки речи находятся один раз (Silero VAD из faster-whisper) и задают как клипы Whisper
+# (вместо его собственного VAD), так и oracle VAD для NeMo MSDD (вместо MarbleNet) и быстрого уровня диаризации.
+SHARED_VAD = os.environ.get("SHARED_VAD", "0") == "1"
+
+# VAD выполняется блоками, чтобы не переводить многочасовую запись (например, np.memmap WAV) в float целиком.
+VAD_BLOCK_SECONDS = 600
+VAD_MIN_SILENCE_MS = 300
+VAD_SPEECH_PAD_MS = 100
+# Участок речи не длиннее окна Whisper: пакетный конвейер принимает клипы до 30 с.
+MAX_REGION_SECONDS = 30
+PCM_SCALE = 32768.0
+
+logger = logging.getLogger(__name__)
+
+Regions = List[Tuple[int, int]]
+
+
+def as_float(samples: np.ndarray) -> np.ndarray:
+    if samples.dtype == np.int16:
+        return samples.astype(np.float32) / PCM_SCALE
+    return np.asarray(samples, dtype=np.float32)
+
+
+def vad_params() -> dict:
+    """
+    Параметры общего VAD для ключей кэша сегментов и RTTM (без общего VAD пусто, ключи не меняются).
+    """
+    return {"vad": "shared"} if SHARED_VAD else {}
+
+
+def speech_regions(audio: np.ndarray) -> Regions:
+    """
+    Участки речи (в сэмплах) по Silero VAD из faster-whisper, каждый не длиннее MAX_REGION_SECONDS.
+
+    :param audio: Аудио 16 кГц моно: float32 или int16 (в том числе np.memmap файла WAV).
+    """
+    from faster_whisper.vad import VadOptions, get_speech_timestamps
+
+    options = VadOptions(min_silence_duration_ms=VAD_MIN_SILENCE_MS, speech_pad_ms=VAD_SPEECH_PAD_MS,
+                         max_speech_duration_s=MAX_REGION_SECONDS)
+    block = VAD_BLOCK_SECONDS * SAMPLE_RATE
+    regions = []
+    for block_start in range(0, len(audio), block):
+        for chunk in get_speech_timestamps(as_float(audio[block_start:block_start + block]), options):
+            start, end = block_start + chunk["start"], block_start + chunk["end"]
+            # Участок, разрезанный границей блока, склеивается обратно
+            if (regions and regions[-1][1] >= start - 1
+                    and end - regions[-1][0] <= MAX_REGION_SECONDS * SAMPLE_RATE):
+                regions[-1] = (regions[-1][0], end)
+            else:
+                regions.append((start, end))
+    return regions
+
+
+def merge_regions(regions: Regions, new_regions: Regions, offset: int = 0) -> None:
+    """
+    Дописывает участки следующего окна к участкам записи (на перекрытии окон участки объединяются).
+
+    :param offset: Начало окна в сэмплах записи.
+    """
+    for start, end in new_regions:
+        start, end = start + offset, end + offset
+        if regions and start <= regions[-1][1]:
+            regions[-1] = (regions[-1][0], max(regions[-1][1], end))
+        else:
+            regions.append((start, end))
+
+
+def speech_samples(regions: Regions) -> int:
+    return sum(end - start for start, end in regions)
+
+
+def whisper_clips(regions: Regions, batched: bool = True):
+    """
+    Участки речи в формате clip_timestamps faster-whisper.
+
+    :param batched: Для BatchedInferencePipeline — словари {"start", "end"} в сэмплах, соседние участки
+        сгруппированы в клипы до 30 с (как после его собственного VAD); для WhisperModel — плоский список
+        начал и концов в секундах.
+    """
+    if not batched:
+        return [round(sample / SAMPLE_RATE, 3) for region in regions for sample in region]
+
+    from faster_whisper.vad import VadOptions, merge_segments
+
+    segments = [{"start": start, "end": end} for start, end in regions]
+    clips = merge_segments(segments, VadOptions(max_speech_duration_s=MAX_REGION_SECONDS, speech_pad_ms=0))
+    return [{"start": clip["start"], "end": clip["end"]} for clip in clips]
+
+
+def write_speech_rttm(regions: Regions, rttm_path: str, file_id: str = "mono_file") -> str:
+    """
+    Записывает участки речи в RTTM (один условный спикер) — разметку для oracle VAD NeMo.
+    """
+    turns = np.empty(len(regions), dtype=TURN_DTYPE)
+    turns["start"] = [start * 1000 // SAMPLE_RATE for start, _ in regions]
+    turns["end"] = [end * 1000 // SAMPLE_RATE for _, end in regions]
+    turns["speaker"] = 0
+    return save_rttm(turns, rttm_path, file_id)
+
+
+def silent_turns(total_samples: int) -> np.ndarray:
+    """
+    Одна реплика на всю запись для записи без речи, чтобы сопоставление слов со спикерами не падало.
+    """
+    turns = np.empty(1, dtype=TURN_DTYPE)
+    turns[0] = (0, total_samples * 1000 // SAMPLE_RATE, 0)
+    return turns
+
+
+def describe_savings(regions: Regions, total_samples: int, vad_seconds: float) -> str:
+    """
+    Отчёт об экономии общего VAD по файлу: доля речи и сколько тишины пропускают Whisper и диаризация.
+
+    :param vad_seconds: Время, затраченное на общий VAD.
+    """
+    speech = speech_samples(regions)
+    silence = max(total_samples - speech, 0)
+    return (f"Общий VAD ({vad_seconds:.1f} с, один проход вместо двух): речь {speech / SAMPLE_RATE:.0f} с "
+            f"из {total_samples / SAMPLE_RATE:.0f} с (участков: {len(regions)}); Whisper и диаризация пропускают "
+            f"{silence / SAMPLE_RATE:.0f} с тишины ({silence / max(total_samples, 1):.0%}).")
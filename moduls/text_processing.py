@@ -1,11 +1,41 @@
 import json
 import logging
 import os
-from typing import Optional, Dict, Any
+import re
+from concurrent.futures import ThreadPoolExecutor
+from typing import Optional, Dict, Any, List, Callable, Iterable
+from moduls.audit_log import get_audit_log
+from moduls.gpt_usage import GPT_BUDGET_MODE, BudgetExceededError
+from moduls.token_budget import count_tokens, split_by_speaker_turns, truncate_to_tokens
 
 
 # Список обязательных ключей, которые должны присутствовать в итоговом словаре.
 REQUIRED_KEYS = ["type", "name", "description", "stack", "skils", "telephone", "email", "telegram"]
+# Контактные поля извлекаются локально (extract_contacts), ChatGPT запрашивает только смысловые поля.
+CONTACT_KEYS = ["telephone", "email", "telegram"]
+
+# Регулярные выражения для локального извлечения контактов.
+EMAIL_PATTERN = re.compile(r"\b[A-Za-z0-9._%+-]+@[A-Za-z0-9.-]+\.[A-Za-z]{2,}\b")
+PHONE_PATTERN = re.compile(
+    r"(?<![\w+])(?:\+7|8|\+\d{1,3})[\s-]?\(?\d{3}\)?[\s-]?\d{3}[\s-]?\d{2}[\s-]?\d{2}(?!\d)"
+)
+TELEGRAM_PATTERN = re.compile(r"(?:(?<![\w@.])@|\bt\.me/)([A-Za-z][A-Za-z0-9_]{3,31})\b(?![@.]\w)")
+
+# Бюджет токенов на один запрос: текст длиннее этого порога обрабатывается по частям (map-reduce).
+SUMMARY_CHUNK_TOKENS = 3000
+# Максимальное количество параллельных запросов к ChatGPT при обработке по частям.
+SUMMARY_MAX_WORKERS = 4
+# Поля, значения которых при слиянии частичных результатов объединяются, а не выбираются.
+MERGED_LIST_KEYS = ["stack", "skils"]
+# Пакетный режим: несколько коротких документов отправляются в ChatGPT одним запросом.
+PACK_MAX_TOKENS = 3000
+PACK_MAX_DOCS = 8
+# Размер описания в локальной выжимке (используется при исчерпании бюджета токенов).
+LOCAL_SUMMARY_DESCRIPTION_TOKENS = 300
+# Сколько символов мусора допускается перед открывающей '{' в потоковом режиме.
+STREAM_MAX_PREAMBLE = 200
+# Значения, которые ChatGPT возвращает при отсутствии данных.
+EMPTY_VALUES = ["", "null", "none", "отсутствует", "неизвестно"]
 
 
 # =====================================================================
@@ -21,10 +51,8 @@ def prepare_summary_request(text: str) -> str:
         - "Description" (краткое резюме кандидата или описание проекта)
         - "Stack" (перечень фреймворков и технологий)
         - "Skils" (ключевые навыки)
-        - "telephone" (контактный телефон)
-        - "email" (адрес электронной почты)
-        - "telegram" (контакт в Telegram)
 
+    Контакты (телефон, email, telegram) в запрос не включаются: они извлекаются локально через extract_contacts.
     Если какая-либо информация отсутствует, необходимо вернуть значение null.
 
     :param text: Исходный текст собеседования.
@@ -34,7 +62,7 @@ def prepare_summary_request(text: str) -> str:
         "Анализируй предоставленный текст.\n"
         "Твоя задача — извлечь информацию и вернуть строго JSON-объект с ровно следующими ключами "
         "(все ключи должны быть в нижнем регистре):\n"
-        "  \"name\", \"description\", \"stack\", \"skils\", \"telephone\", \"email\", \"telegram\".\n\n"
+        "  \"name\", \"description\", \"stack\", \"skils\".\n\n"
         "Правила заполнения:\n"
         "1. Поля \"stack\", \"skils\" и \"description\" должны содержать только сухую техническую информацию.\n"
         "   - \"description\": краткое, но полное описание проекта или опыта, сосредоточенное на технологических "
@@ -46,13 +74,145 @@ def prepare_summary_request(text: str) -> str:
         "2. Поле \"name\":\n"
         "   - Если текст описывает проект, значение должно быть названием проекта;\n"
         "   - Если текст относится к кандидату, значение должно быть именем кандидата.\n"
-        "3. Поля \"telephone\", \"email\" и \"telegram\" должны содержать предоставленные данные "
-        "или значение \"отсутствует\", если данных нет.\n"
-        "4. Возвращай только JSON без каких-либо пояснений или дополнительного текста.\n\n"
+        "3. Возвращай только JSON без каких-либо пояснений или дополнительного текста.\n\n"
         "Вот текст для анализа:\n"
     )
 
-    return prompt
+    return prompt + text
+
+
+def prepare_chunk_summary_request(chunk: str, chunk_idx: int, chunks_total: int) -> str:
+    """
+    Подготавливает запрос для ChatGPT по одному фрагменту длинного текста (этап map).
+
+    В отличие от prepare_summary_request, ChatGPT предупреждается, что видит лишь часть текста,
+    поэтому должен возвращать null для полей, информации о которых во фрагменте нет,
+    а не додумывать их.
+
+    :param chunk: Фрагмент текста.
+    :param chunk_idx: Номер фрагмента (с 1).
+    :param chunks_total: Общее количество фрагментов.
+    :return: Запрос в виде строки, готовый для отправки в ChatGPT.
+    """
+    prompt = (
+        f"Ниже приведён фрагмент {chunk_idx} из {chunks_total} длинного текста (например, расшифровки собеседования).\n"
+        "Извлеки из этого фрагмента информацию и верни строго JSON-объект с ровно следующими ключами "
+        "(все ключи должны быть в нижнем регистре):\n"
+        "  \"name\", \"description\", \"stack\", \"skils\".\n\n"
+        "Правила заполнения:\n"
+        "1. Учитывай только то, что явно сказано в этом фрагменте. Если информации для поля нет, верни null.\n"
+        "2. \"description\": краткое техническое описание опыта или проекта из фрагмента.\n"
+        "3. \"stack\" и \"skils\": технологии и навыки через запятую.\n"
+        "4. \"name\": имя кандидата или название проекта, если оно прозвучало.\n"
+        "5. Возвращай только JSON без каких-либо пояснений или дополнительного текста.\n\n"
+        "Вот фрагмент для анализа:\n"
+    )
+
+    return prompt + chunk
+
+
+def prepare_packed_summary_request(documents: Dict[str, str]) -> str:
+    """
+    Подготавливает один запрос для ChatGPT сразу по нескольким коротким документам.
+
+    Документы разделяются заголовками с их идентификаторами; ChatGPT должен вернуть JSON-массив,
+    в котором каждый элемент содержит "doc_id" и те же смысловые поля, что и в prepare_summary_request.
+
+    :param documents: Словарь {идентификатор документа: текст}.
+    :return: Запрос в виде строки, готовый для отправки в ChatGPT.
+    """
+    prompt = (
+        f"Ниже приведены {len(documents)} независимых документов (резюме кандидатов или описания проектов). "
+        "Каждый документ начинается со строки \"### doc_id: <идентификатор>\".\n"
+        "Для КАЖДОГО документа извлеки информацию и верни строго JSON-массив объектов, по одному на документ, "
+        "с ровно следующими ключами (все ключи должны быть в нижнем регистре):\n"
+        "  \"doc_id\", \"name\", \"description\", \"stack\", \"skils\".\n\n"
+        "Правила заполнения:\n"
+        "1. \"doc_id\" — идентификатор документа из его заголовка без изменений.\n"
+        "2. Поля \"stack\", \"skils\" и \"description\" должны содержать только сухую техническую информацию.\n"
+        "   - \"description\": краткое, но полное описание проекта или опыта, сосредоточенное на технологических "
+        "аспектах, включая годы работы, основные функции и цели.\n"
+        "   - \"stack\": список технологий и инструментов, используемых в проекте или необходимых кандидату.\n"
+        "   - \"skils\": полное описание технических навыков и умений, относящихся к проекту или кандидату.\n"
+        "3. Поле \"name\": название проекта или имя кандидата.\n"
+        "4. Не смешивай информацию из разных документов.\n"
+        "5. Возвращай только JSON-массив без каких-либо пояснений или дополнительного текста.\n\n"
+        "Документы:\n"
+    )
+    blocks = [f"### doc_id: {doc_id}\n{text.strip()}" for doc_id, text in documents.items()]
+    return prompt + "\n\n".join(blocks)
+
+
+# =====================================================================
+# Локальное извлечение контактов
+# =====================================================================
+def _join_unique(values: Iterable[str]) -> Optional[str]:
+    unique = []
+    for value in values:
+        if value not in unique:
+            unique.append(value)
+    return ", ".join(unique) if unique else None
+
+
+def extract_contacts(text: str) -> Dict[str, Optional[str]]:
+    """
+    Извлекает контакты из текста регулярными выражениями, без обращения к ChatGPT.
+
+    Находит телефоны (российские и международные форматы), адреса электронной почты
+    и Telegram-ники (@nick или ссылка t.me/nick). Если найдено несколько значений,
+    они объединяются через запятую в порядке появления.
+
+    :param text: Исходный текст.
+    :return: Словарь с ключами "telephone", "email", "telegram"; для ненайденных контактов значение None.
+    """
+    return {
+        "telephone": _join_unique(match.group(0).strip() for match in PHONE_PATTERN.finditer(text)),
+        "email": _join_unique(match.group(0) for match in EMAIL_PATTERN.finditer(text)),
+        "telegram": _join_unique("@" + match.group(1) for match in TELEGRAM_PATTERN.finditer(text)),
+    }
+
+
+def call_chatgpt_stream(
+    assistant: Any,
+    prompt: str,
+    on_field: Optional[Callable[[str, Any], None]] = None,
+) -> Dict[str, Any]:
+    """
+    Отправляет запрос в ChatGPT в потоковом режиме и разбирает JSON-ответ по мере поступления.
+
+    Каждое поле передаётся в on_field сразу после того, как его значение полностью получено.
+    Как только ответ оказывается некорректным (или объект закрыт), поток закрывается,
+    чтобы не тратить токены на остаток генерации.
+
+    Предполагается, что объект assistant реализует метод stream_message, возвращающий
+    итератор фрагментов ответа.
+
+    :param assistant: Объект, реализующий взаимодействие с ChatGPT.
+    :param prompt: Подготовленный запрос для ChatGPT.
+    :param on_field: Необязательный обработчик (ключ, значение) для каждого готового поля.
+    :return: Словарь с данными, извлеченными из ответа.
+    :raises ValueError: Если ответ не является корректным JSON-объектом.
+    """
+    parser = IncrementalJSONParser(on_field=on_field)
+    stream = assistant.stream_message(prompt)
+    try:
+        for delta in stream:
+            parser.feed(delta)
+            if parser.done:
+                break
+
+    except ValueError as e:
+        logging.error("Некорректный потоковый ответ от ChatGPT, генерация прервана: %s", e)
+        raise
+
+    except Exception as e:
+        logging.error("Ошибка при отправке запроса в ChatGPT: %s", e)
+        raise
+
+    finally:
+        stream.close()
+
+    return parser.close()
 
 
 def call_chatgpt(assistant: Any, prompt: str) -> str:
@@ -77,7 +237,7 @@ def call_chatgpt(assistant: Any, prompt: str) -> str:
 # =====================================================================
 # Извлеякекаем словарь из ответа ChatGPT
 # =====================================================================
-def extract_json_from_text(text: str) -> Optional[str]:
+def extract_json_from_text(text: str, brackets: str = "{}") -> Optional[str]:
     """
     Извлекает JSON-подстроку из общего текста.
 
@@ -85,10 +245,11 @@ def extract_json_from_text(text: str) -> Optional[str]:
     если они найдены. Если не удается найти корректную JSON-подстроку, возвращает None.
 
     :param text: Исходный текст, содержащий JSON и, возможно, лишний текст.
+    :param brackets: Открывающая и закрывающая скобки ("{}" для объекта, "[]" для массива).
     :return: Подстрока, содержащая JSON, или None, если не найдено.
     """
-    start = text.find('{')
-    end = text.rfind('}')
+    start = text.find(brackets[0])
+    end = text.rfind(brackets[1])
     if start == -1 or end == -1 or end <= start:
         return None
     return text[start:end+1]
@@ -123,12 +284,210 @@ def parse_chatgpt_response(response: str) -> Dict[str, Any]:
             raise ValueError("Извлеченный JSON из ответа ChatGPT некорректен")
 
 
-def normalize_summary_dict(summary: dict) -> dict:
+def split_packed_response(response: str) -> Dict[str, Dict[str, Any]]:
+    """
+    Разбирает ответ ChatGPT на пакетный запрос и раскладывает его по документам.
+
+    Ответ разбирается через parse_chatgpt_response; поддерживаются массив объектов с "doc_id",
+    объект {"documents": [...]} и объект, ключами которого являются идентификаторы документов.
+
+    :param response: Строка-ответ от ChatGPT.
+    :return: Словарь {идентификатор документа: словарь полей} (без нормализации).
+    :raises ValueError: Если не удается найти корректный JSON.
+    """
+    first_array, first_object = response.find("["), response.find("{")
+    brackets = "[]" if first_array != -1 and (first_object == -1 or first_array < first_object) else "{}"
+    parsed = parse_chatgpt_response(extract_json_from_text(response, brackets) or response)
+
+    if isinstance(parsed, dict) and isinstance(parsed.get("documents"), list):
+        parsed = parsed["documents"]
+
+    if isinstance(parsed, dict):
+        return {str(doc_id): item for doc_id, item in parsed.items() if isinstance(item, dict)}
+
+    results = {}
+    for item in parsed:
+        if isinstance(item, dict) and item.get("doc_id") is not None:
+            doc_id = str(item.pop("doc_id"))
+            results[doc_id] = item
+    return results
+
+
+class IncrementalJSONParser:
+    """
+    Инкрементальный парсер JSON-объекта верхнего уровня для потокового ответа ChatGPT.
+
+    Текст подаётся частями через feed. Как только значение очередного поля полностью получено,
+    оно разбирается через json.loads и отдаётся в on_field, не дожидаясь конца ответа.
+    Допускается короткая преамбула перед '{' (например, "```json"), всё остальное считается
+    ошибкой и прерывает разбор исключением ValueError как можно раньше.
+    """
+
+    def __init__(self, on_field: Optional[Callable[[str, Any], None]] = None, max_preamble: int = STREAM_MAX_PREAMBLE):
+        self.on_field = on_field
+        self.max_preamble = max_preamble
+        self.result: Dict[str, Any] = {}
+        self.done = False
+        self._buffer = ""
+        self._pos = 0
+        self._state = "preamble"
+        self._key = None
+
+    def feed(self, chunk: str) -> List[tuple]:
+        """
+        Добавляет очередной фрагмент ответа.
+
+        :param chunk: Фрагмент текста.
+        :return: Список пар (ключ, значение) для полей, завершившихся в этом фрагменте.
+        :raises ValueError: Если ответ уже не может быть корректным JSON-объектом.
+        """
+        if self.done:
+            return []
+
+        self._buffer += chunk
+        completed = []
+        while not self.done:
+            field = self._step()
+            if field is None:
+                break
+            if field is not True:
+                completed.append(field)
+
+        # Отбрасываем уже разобранную часть буфера
+        self._buffer = self._buffer[self._pos:]
+        self._pos = 0
+        return completed
+
+    def close(self) -> Dict[str, Any]:
+        """
+        Завершает разбор.
+
+        :return: Словарь со всеми разобранными полями.
+        :raises ValueError: Если объект не был закрыт.
+        """
+        if not self.done:
+            raise ValueError("Ответ от ChatGPT оборвался до окончания JSON-объекта")
+        return self.result
+
+    def _skip_whitespace(self) -> bool:
+        while self._pos < len(self._buffer) and self._buffer[self._pos].isspace():
+            self._pos += 1
+        return self._pos < len(self._buffer)
+
+    def _step(self):
+        """
+        Выполняет один переход автомата. Возвращает None, если данных недостаточно,
+        True при переходе без готового поля и пару (ключ, значение) при завершении поля.
+        """
+        if self._state == "preamble":
+            start = self._buffer.find("{", self._pos)
+            if start == -1:
+                if len(self._buffer.strip()) > self.max_preamble:
+                    raise ValueError("Ответ от ChatGPT не начинается с JSON-объекта")
+                return None
+            if len(self._buffer[:start].strip()) > self.max_preamble:
+                raise ValueError("Ответ от ChatGPT не начинается с JSON-объекта")
+            self._pos = start + 1
+            self._state = "key"
+            return True
+
+        if not self._skip_whitespace():
+            return None
+        char = self._buffer[self._pos]
+
+        if self._state in ("key", "key_or_end"):
+            if char == "}" and (self._state == "key_or_end" or not self.result):
+                self._pos += 1
+                self.done = True
+                return True
+            if char == "," and self._state == "key_or_end":
+                self._pos += 1
+                self._state = "key"
+                return True
+            if char != '"' or self._state == "key_or_end":
+                raise ValueError(f"Неожиданный символ {char!r} в JSON-ответе от ChatGPT")
+
+            end = self._find_string_end(self._pos)
+            if end == -1:
+                return None
+            self._key = json.loads(self._buffer[self._pos:end + 1])
+            self._pos = end + 1
+            self._state = "colon"
+            return True
+
+        if self._state == "colon":
+            if char != ":":
+                raise ValueError(f"Ожидалось ':' после ключа {self._key!r} в JSON-ответе от ChatGPT")
+            self._pos += 1
+            self._state = "value"
+            return True
+
+        # self._state == "value"
+        end = self._find_value_end(self._pos)
+        if end == -1:
+            return None
+        raw_value = self._buffer[self._pos:end].strip()
+        try:
+            value = json.loads(raw_value)
+        except json.JSONDecodeError as e:
+            raise ValueError(f"Некорректное значение поля {self._key!r} в JSON-ответе от ChatGPT: {e}")
+
+        self.result[self._key] = value
+        if self.on_field is not None:
+            self.on_field(self._key, value)
+        field = (self._key, value)
+        self._pos = end
+        self._state = "key_or_end"
+        return field
+
+    def _find_string_end(self, start: int) -> int:
+        """Возвращает индекс закрывающей кавычки строки, начинающейся в start, или -1."""
+        pos = start + 1
+        while pos < len(self._buffer):
+            char = self._buffer[pos]
+            if char == "\\":
+                pos += 2
+                continue
+            if char == '"':
+                return pos
+            pos += 1
+        return -1
+
+    def _find_value_end(self, start: int) -> int:
+        """
+        Возвращает индекс ',' или '}' верхнего уровня, завершающих значение, или -1,
+        если значение ещё не получено целиком.
+        """
+        depth, pos = 0, start
+        while pos < len(self._buffer):
+            char = self._buffer[pos]
+            if char == '"':
+                pos = self._find_string_end(pos)
+                if pos == -1:
+                    return -1
+            elif char in "[{":
+                depth += 1
+            elif char in "]}":
+                if depth == 0:
+                    return pos if char == "}" else self._unexpected(char)
+                depth -= 1
+            elif char == "," and depth == 0:
+                return pos
+            pos += 1
+        return -1
+
+    def _unexpected(self, char: str) -> int:
+        raise ValueError(f"Неожиданный символ {char!r} в JSON-ответе от ChatGPT")
+
+
+def normalize_summary_dict(summary: dict, contacts: Optional[Dict[str, Optional[str]]] = None) -> dict:
     """
     Нормализует входной словарь, приводя все ключи к нижнему регистру и объединяя дублирующие варианты.
+    Контакты, найденные локально (extract_contacts), имеют приоритет над значениями из ответа ChatGPT.
     Если обязательный ключ отсутствует или его значение пустое, устанавливает его значение как "Неизвестно".
 
     :param summary: Словарь, полученный после парсинга ответа ChatGPT.
+    :param contacts: Необязательный словарь контактов, извлечённых локально.
     :return: Нормализованный словарь с ключами в нижнем регистре и заполненными обязательными полями.
     """
     # Создадим новый словарь с ключами в нижнем регистре
@@ -142,6 +501,10 @@ def normalize_summary_dict(summary: dict) -> dict:
         else:
             normalized[lower_key] = value
 
+    for key in CONTACT_KEYS:
+        if contacts and contacts.get(key):
+            normalized[key] = contacts[key]
+
     # Для каждого обязательного ключа, если он отсутствует или пустой, устанавливаем "Неизвестно"
     for req_key in REQUIRED_KEYS:
         if req_key not in normalized or not normalized[req_key]:
@@ -150,48 +513,323 @@ def normalize_summary_dict(summary: dict) -> dict:
     return normalized
 
 
+def _is_empty_value(value: Any) -> bool:
+    return value is None or (isinstance(value, str) and value.strip().lower() in EMPTY_VALUES) or value == []
+
+
+def merge_partial_summaries(partials: List[Dict[str, Any]]) -> Dict[str, Any]:
+    """
+    Объединяет частичные словари, полученные по фрагментам текста, в один словарь (этап reduce).
+
+    Правила слияния:
+      - "stack" и "skils": значения всех фрагментов объединяются без повторов с сохранением порядка;
+      - "description": непустые описания фрагментов склеиваются по порядку;
+      - остальные поля (name, type, контакты): берётся первое непустое значение.
+
+    :param partials: Список словарей в порядке следования фрагментов.
+    :return: Словарь со всеми ключами из REQUIRED_KEYS (до нормализации).
+    """
+    merged: Dict[str, Any] = {}
+    list_values: Dict[str, List[str]] = {key: [] for key in MERGED_LIST_KEYS}
+    descriptions: List[str] = []
+
+    for partial in partials:
+        for key, value in partial.items():
+            key = key.lower()
+            if _is_empty_value(value):
+                continue
+
+            if key in MERGED_LIST_KEYS:
+                items = value if isinstance(value, list) else str(value).split(",")
+                for item in items:
+                    item = str(item).strip()
+                    if item and item.lower() not in (seen.lower() for seen in list_values[key]):
+                        list_values[key].append(item)
+
+            elif key == "description":
+                if str(value).strip() not in descriptions:
+                    descriptions.append(str(value).strip())
+
+            elif key not in merged:
+                merged[key] = value
+
+    for key, items in list_values.items():
+        merged[key] = ", ".join(items) if items else None
+    merged["description"] = " ".join(descriptions) if descriptions else None
+
+    for req_key in REQUIRED_KEYS:
+        merged.setdefault(req_key, None)
+
+    return merged
+
+
+def local_summary(text: str) -> Dict[str, Any]:
+    """
+    Формирует упрощённую выжимку без обращения к ChatGPT (режим деградации при исчерпании бюджета).
+
+    Контакты извлекаются локально, описанием служит начало текста, именем — первая короткая строка.
+
+    :param text: Исходный текст.
+    :return: Нормализованный словарь с ключами из REQUIRED_KEYS.
+    """
+    first_line = next((line.strip() for line in text.splitlines() if line.strip()), "")
+    summary = {
+        "name": first_line if 0 < len(first_line) <= 80 else None,
+        "description": truncate_to_tokens(" ".join(text.split()), LOCAL_SUMMARY_DESCRIPTION_TOKENS),
+    }
+    return normalize_summary_dict(summary, extract_contacts(text))
+
+
 def log_gpt_response(text: str, data: dict) -> None:
-    log_path = os.path.join(os.getcwd(), "log_GPT_response.txt")
-    with open(log_path, "a", encoding="utf-8") as f:
-        f.write("исходный текст:\n")
-        f.write(f"{text}\n")
-        f.write("Выходной словарь:\n")
-        for key in data:
-            f.write(f"{key} : {data[key]}\n")
-        f.write("\n")
+    """
+    Записывает результат анализа текста в журнал аудита (moduls.audit_log).
+
+    Запись выполняется в фоновом потоке и не блокирует обработку; вместо полного текста
+    сохраняется его хэш (полный текст — только при GPT_AUDIT_KEEP_TEXT=1).
+
+    :param text: Исходный текст, отправленный на анализ.
+    :param data: Итоговый словарь.
+    """
+    get_audit_log().record(text, data)
 
 
 # =====================================================================
 # Ключевой пайплайн анализа и парсинга текста
 # =====================================================================
-def process_text_summary(text: str, assistant: Any) -> Dict[str, Any]:
+def _summarize_chunk(
+    assistant: Any,
+    chunk: str,
+    chunk_idx: int,
+    chunks_total: int,
+    stream: bool = False,
+) -> Optional[Dict[str, Any]]:
+    """
+    Обрабатывает один фрагмент текста. Ошибки не пробрасываются, чтобы один неудачный фрагмент
+    не ломал обработку всего текста.
+    """
+    try:
+        prompt = prepare_chunk_summary_request(chunk, chunk_idx, chunks_total)
+        if stream:
+            return call_chatgpt_stream(assistant, prompt)
+        response = call_chatgpt(assistant, prompt)
+        return parse_chatgpt_response(response)
+
+    except BudgetExceededError:
+        raise
+
+    except Exception as e:
+        logging.error("Ошибка при обработке фрагмента %d/%d: %s", chunk_idx, chunks_total, e)
+        return None
+
+
+def process_text_summary_chunked(
+    text: str,
+    assistant: Any,
+    max_chunk_tokens: int = SUMMARY_CHUNK_TOKENS,
+    max_workers: int = SUMMARY_MAX_WORKERS,
+    stream: bool = False,
+) -> Dict[str, Any]:
+    """
+    Обрабатывает длинный текст по частям (map-reduce).
+
+    Функция выполняет следующие этапы:
+      1. Делит текст на фрагменты по границам реплик спикеров так, чтобы каждый укладывался в бюджет токенов.
+      2. Параллельно отправляет фрагменты в ChatGPT и парсит частичные JSON-ответы
+         (время обработки определяется самым медленным фрагментом, а не длиной всего текста).
+      3. Объединяет частичные словари через merge_partial_summaries.
+
+    :param text: Исходная строка (как правило, диаризированная расшифровка).
+    :param assistant: Объект ассистента, который осуществляет взаимодействие с ChatGPT.
+    :param max_chunk_tokens: Бюджет токенов на один фрагмент.
+    :param max_workers: Максимальное количество параллельных запросов.
+    :param stream: Использовать потоковый режим (некорректные ответы прерываются досрочно).
+    :return: Объединённый (ещё не нормализованный) словарь.
+    :raises ValueError: Если ни один фрагмент не удалось обработать.
+    """
+    chunks = split_by_speaker_turns(text, max_chunk_tokens)
+    logging.info("Текст разбит на %d фрагментов (бюджет %d токенов на фрагмент).", len(chunks), max_chunk_tokens)
+
+    with ThreadPoolExecutor(max_workers=max(1, min(max_workers, len(chunks)))) as executor:
+        futures = [
+            executor.submit(_summarize_chunk, assistant, chunk, idx, len(chunks), stream)
+            for idx, chunk in enumerate(chunks, start=1)
+        ]
+        partials = [future.result() for future in futures]
+
+    partials = [partial for partial in partials if partial]
+    if not partials:
+        raise ValueError("Не удалось обработать ни один фрагмент текста")
+
+    return merge_partial_summaries(partials)
+
+
+def _pack_documents(texts: Dict[str, str], max_tokens: int, max_docs: int) -> List[Dict[str, str]]:
+    """
+    Жадно группирует документы в пакеты по бюджету токенов. Документ, который сам не помещается
+    в бюджет пакета, возвращается отдельным пакетом из одного документа.
+    """
+    packs, current, current_tokens = [], {}, 0
+    for doc_id, text in texts.items():
+        tokens = count_tokens(text)
+        if current and (current_tokens + tokens > max_tokens or len(current) >= max_docs):
+            packs.append(current)
+            current, current_tokens = {}, 0
+
+        current[doc_id] = text
+        current_tokens += tokens
+
+    if current:
+        packs.append(current)
+    return packs
+
+
+def _summarize_pack(assistant: Any, pack: Dict[str, str]) -> Dict[str, Dict[str, Any]]:
+    """
+    Отправляет пакет документов одним запросом. Ошибки не пробрасываются: документы пакета,
+    для которых нет результата, затем обрабатываются по одному.
+    """
+    try:
+        response = call_chatgpt(assistant, prepare_packed_summary_request(pack))
+        return split_packed_response(response)
+
+    except BudgetExceededError:
+        raise
+
+    except Exception as e:
+        logging.error("Ошибка при пакетной обработке документов %s: %s", list(pack), e)
+        return {}
+
+
+def process_text_summaries_packed(
+    texts: Dict[str, str],
+    assistant: Any,
+    max_pack_tokens: int = PACK_MAX_TOKENS,
+    max_pack_docs: int = PACK_MAX_DOCS,
+    max_workers: int = SUMMARY_MAX_WORKERS,
+    on_budget_exceeded: str = GPT_BUDGET_MODE,
+) -> Dict[str, Dict[str, Any]]:
+    """
+    Обрабатывает несколько коротких документов, объединяя их в пакетные запросы к ChatGPT.
+
+    Функция выполняет следующие этапы:
+      1. Группирует документы в пакеты по бюджету токенов (документы длиннее бюджета идут отдельно).
+      2. Параллельно отправляет пакеты в ChatGPT и раскладывает ответы по документам (split_packed_response).
+      3. Нормализует результат каждого документа через normalize_summary_dict с локально извлечёнными контактами.
+      4. Документы, результат для которых в ответе отсутствует, обрабатываются по одному через process_text_summary.
+      5. При исчерпании бюджета токенов оставшиеся документы пропускаются (on_budget_exceeded="pause")
+         или получают локальную выжимку без ChatGPT (on_budget_exceeded="degrade").
+
+    :param texts: Словарь {идентификатор документа: текст}.
+    :param assistant: Объект ассистента, который осуществляет взаимодействие с ChatGPT.
+    :param max_pack_tokens: Бюджет токенов на тексты одного пакета.
+    :param max_pack_docs: Максимальное количество документов в пакете.
+    :param max_workers: Максимальное количество параллельных запросов.
+    :param on_budget_exceeded: Поведение при исчерпании бюджета токенов: "pause" или "degrade".
+    :return: Словарь {идентификатор документа: итоговый словарь}; документы, которые не удалось
+             обработать, в результат не попадают.
+    """
+    texts = {str(doc_id): text for doc_id, text in texts.items()}
+    packs = [pack for pack in _pack_documents(texts, max_pack_tokens, max_pack_docs) if len(pack) > 1]
+    packed_ids = [doc_id for pack in packs for doc_id in pack]
+    logging.info("Пакетная обработка: %d документов в %d запросах.", len(packed_ids), len(packs))
+
+    partials: Dict[str, Dict[str, Any]] = {}
+    budget_exceeded = False
+    if packs:
+        with ThreadPoolExecutor(max_workers=max(1, min(max_workers, len(packs)))) as executor:
+            futures = [executor.submit(_summarize_pack, assistant, pack) for pack in packs]
+            for pack, future in zip(packs, futures):
+                try:
+                    result = future.result()
+                except BudgetExceededError as e:
+                    logging.warning("%s", e)
+                    budget_exceeded = True
+                    continue
+                partials.update({doc_id: item for doc_id, item in result.items() if doc_id in pack})
+
+    results = {}
+    for doc_id, text in texts.items():
+        if doc_id in partials:
+            summary_dict = normalize_summary_dict(partials[doc_id], extract_contacts(text))
+            log_gpt_response(text, summary_dict)
+            results[doc_id] = summary_dict
+            continue
+
+        if not budget_exceeded:
+            if doc_id in packed_ids:
+                logging.warning("Результат для документа %s отсутствует в пакетном ответе, повторный запрос.", doc_id)
+            try:
+                results[doc_id] = process_text_summary(text, assistant)
+                continue
+            except BudgetExceededError as e:
+                logging.warning("%s", e)
+                budget_exceeded = True
+            except Exception as e:
+                logging.error("Ошибка при обработке документа %s: %s", doc_id, e)
+                continue
+
+        # Бюджет токенов исчерпан: либо останавливаемся, либо деградируем до локальной выжимки
+        if on_budget_exceeded == "degrade":
+            results[doc_id] = local_summary(text)
+        else:
+            logging.warning("Документ %s пропущен: исчерпан бюджет токенов.", doc_id)
+
+    return results
+
+
+def process_text_summary(
+    text: str,
+    assistant: Any,
+    stream: bool = False,
+    on_field: Optional[Callable[[str, Any], None]] = None,
+) -> Dict[str, Any]:
     """
     Основная функция для обработки текста с помощью ChatGPT.
 
     Функция выполняет следующие этапы:
-      1. Подготовка запроса для ChatGPT с использованием входного текста.
+      1. Подготовка запроса для ChatGPT с использованием входного текста
+         (текст длиннее SUMMARY_CHUNK_TOKENS обрабатывается по частям через process_text_summary_chunked).
       2. Отправка запроса в ChatGPT через объект ассистента.
       3. Получение ответа и его парсинг в словарь.
       4. Валидация итогового словаря на наличие всех необходимых ключей.
     
     :param text: Исходная строка с информацией, которую необходимо проанализировать.
     :param assistant: Объект ассистента, который осуществляет взаимодействие с ChatGPT.
+    :param stream: Потоковый режим: ответ разбирается по мере генерации, поля отдаются в on_field
+                   сразу после получения, а некорректный ответ прерывается досрочно.
+    :param on_field: Необязательный обработчик (ключ, значение) для потокового режима.
     :return: Итоговый словарь с ключами: Type, Name, Description, Stack, Skils, Телефон, email, telegram.
     """
-    # Шаг 1: Подготовка запроса для ChatGPT
-    prompt = prepare_summary_request(text)
-    logging.debug("Подготовленный запрос для ChatGPT: %s", prompt)
-    
-    # Шаг 2: Отправка запроса в ChatGPT через ассистента
-    response = call_chatgpt(assistant, prompt)
-    logging.debug("Получен ответ от ChatGPT: %s", response)
-    
-    # Шаг 3: Парсинг ответа в словарь (с предварительным выделением JSON, если необходимо)
-    summary_dict = parse_chatgpt_response(response)
-    logging.debug("Распарсенный словарь: %s", summary_dict)
+    # Контакты извлекаются локально, ChatGPT запрашивает только смысловые поля
+    contacts = extract_contacts(text)
+    logging.debug("Локально извлечённые контакты: %s", contacts)
+
+    # Длинные тексты (например, часовые собеседования) не помещаются в один запрос
+    if count_tokens(text) > SUMMARY_CHUNK_TOKENS:
+        summary_dict = process_text_summary_chunked(text, assistant, stream=stream)
+        logging.debug("Объединённый словарь по фрагментам: %s", summary_dict)
+
+    else:
+        # Шаг 1: Подготовка запроса для ChatGPT
+        prompt = prepare_summary_request(text)
+        logging.debug("Подготовленный запрос для ChatGPT: %s", prompt)
+
+        if stream:
+            # Шаги 2-3: Потоковая отправка запроса и разбор ответа по мере поступления
+            summary_dict = call_chatgpt_stream(assistant, prompt, on_field)
+            logging.debug("Распарсенный словарь (потоковый режим): %s", summary_dict)
+
+        else:
+            # Шаг 2: Отправка запроса в ChatGPT через ассистента
+            response = call_chatgpt(assistant, prompt)
+            logging.debug("Получен ответ от ChatGPT: %s", response)
+
+            # Шаг 3: Парсинг ответа в словарь (с предварительным выделением JSON, если необходимо)
+            summary_dict = parse_chatgpt_response(response)
+            logging.debug("Распарсенный словарь: %s", summary_dict)
     
     # Шаг 4: Валидация итогового словаря - добавление недостающих ключей со значением None
-    summary_dict = normalize_summary_dict(summary_dict)
+    summary_dict = normalize_summary_dict(summary_dict, contacts)
     logging.debug("Валидированный итоговый словарь: %s", summary_dict)
     log_gpt_response(text, summary_dict)
 
@@ -0,0 +1,132 @@
+import os
+from typing import List, Sequence, Union
+import numpy as np
+
+
+# Реплики спикеров (из RTTM): начало и конец в миллисекундах, номер спикера.
+TURN_DTYPE = np.dtype([("start", np.int64), ("end", np.int64), ("speaker", np.int32)])
+ANCHORS = ("start", "mid", "end", "overlap")
+
+
+def load_rttm(rttm_path: str) -> np.ndarray:
+    """
+    Читает RTTM-файл NeMo в структурированный массив реплик (TURN_DTYPE), отсортированный по началу.
+
+    Строка RTTM: "SPEAKER <файл> 1 <начало, с> <длительность, с> <NA> <NA> speaker_<N> <NA> <NA>".
+    """
+    fields = np.loadtxt(rttm_path, dtype=str, usecols=(3, 4, 7), ndmin=2, comments=None)
+    turns = np.empty(len(fields), dtype=TURN_DTYPE)
+    if not len(fields):
+        return turns
+
+    turns["start"] = (fields[:, 0].astype(np.float64) * 1000).astype(np.int64)
+    turns["end"] = turns["start"] + (fields[:, 1].astype(np.float64) * 1000).astype(np.int64)
+    turns["speaker"] = np.char.rpartition(fields[:, 2], "_")[:, 2].astype(np.int32)
+    return np.sort(turns, order="start", kind="stable")
+
+
+def save_rttm(turns: np.ndarray, rttm_path: str, file_id: str = "mono_file") -> str:
+    """
+    Записывает реплики (TURN_DTYPE) в RTTM-файл в формате NeMo (читается обратно load_rttm).
+    """
+    os.makedirs(os.path.dirname(os.path.abspath(rttm_path)), exist_ok=True)
+    with open(rttm_path, "w") as f:
+        for start, end, speaker in turns.tolist():
+            f.write(f"SPEAKER {file_id} 1   {start / 1000:.3f}   {(end - start) / 1000:.3f} <NA> <NA> "
+                    f"speaker_{speaker} <NA> <NA>\n")
+    return rttm_path
+
+
+def to_turns(speaker_ts: Union[np.ndarray, Sequence[Sequence[int]]]) -> np.ndarray:
+    """
+    Приводит реплики к TURN_DTYPE: принимает как структурированный массив, так и список [начало, конец, спикер].
+    """
+    if isinstance(speaker_ts, np.ndarray) and speaker_ts.dtype == TURN_DTYPE:
+        return speaker_ts
+    return np.array([tuple(turn) for turn in speaker_ts], dtype=TURN_DTYPE)
+
+
+def word_anchors(starts: np.ndarray, ends: np.ndarray, anchor: str = "start") -> np.ndarray:
+    if anchor == "end":
+        return ends
+    if anchor == "mid":
+        return (starts + ends) / 2
+    return starts
+
+
+def assign_speakers(starts: np.ndarray, ends: np.ndarray, turns: np.ndarray, anchor: str = "start") -> np.ndarray:
+    """
+    Назначает спикеров всем словам сразу.
+
+    Для якорей start/mid/end слово получает первую реплику, которая заканчивается не раньше якоря слова
+    (слова после последней реплики — последнюю реплику), как в последовательном обходе
+    helpers.get_words_speaker_mapping. Поиск — searchsorted по накопленному максимуму концов реплик.
+    Для anchor="overlap" слово получает спикера с наибольшим суммарным пересечением со словом;
+    слово, не пересекающееся ни с одной репликой, назначается по якорю start.
+
+    :param starts: Начала слов (мс) в порядке следования.
+    :param ends: Концы слов (мс).
+    :param turns: Реплики (TURN_DTYPE), отсортированные по началу.
+    :param anchor: "start", "mid", "end" или "overlap".
+    :return: Массив номеров спикеров той же длины, что и starts.
+    """
+    if anchor not in ANCHORS:
+        raise ValueError(f"Неизвестный якорь слова: {anchor}")
+    starts, ends = np.asarray(starts), np.asarray(ends)
+    if not len(turns):
+        raise ValueError("Нет ни одной реплики спикера")
+
+    # Концы реплик (перекрывающаяся речь) и якоря слов (mid/end у длинных сегментов) могут идти не по порядку.
+    # Последовательный обход никогда не возвращается к предыдущей реплике, что равносильно поиску
+    # по накопленным максимумам концов реплик и якорей слов.
+    max_end = np.maximum.accumulate(turns["end"])
+    position = np.maximum.accumulate(word_anchors(starts, ends, "start" if anchor == "overlap" else anchor))
+    turn_idx = np.minimum(np.searchsorted(max_end, position, side="left"), len(turns) - 1)
+    speakers = turns["speaker"][turn_idx]
+    if anchor != "overlap" or not len(starts):
+        return speakers
+
+    # Кандидаты для слова — реплики [lo, hi): начинаются до конца слова и заканчиваются после его начала
+    lo = np.searchsorted(max_end, starts, side="right")
+    hi = np.searchsorted(turns["start"], ends, side="left")
+    counts = np.maximum(hi - lo, 0)
+    if not counts.any():
+        return speakers
+
+    word_idx = np.repeat(np.arange(len(starts)), counts)
+    offsets = np.arange(len(word_idx)) - np.repeat(np.cumsum(counts) - counts, counts)
+    pair_turns = np.repeat(lo, counts) + offsets
+    overlap = (np.minimum(ends[word_idx], turns["end"][pair_turns])
+               - np.maximum(starts[word_idx], turns["start"][pair_turns]))
+    positive = overlap > 0
+    word_idx, pair_speakers, overlap = word_idx[positive], turns["speaker"][pair_turns][positive], overlap[positive]
+
+    # Суммируем пересечения по парам (слово, спикер) и берём для каждого слова пару с наибольшей суммой
+    pair_keys, inverse = np.unique(np.stack([word_idx, pair_speakers]), axis=1, return_inverse=True)
+    totals = np.bincount(inverse.ravel(), weights=overlap)
+    order = np.lexsort((-totals, pair_keys[0]))
+    first = order[np.r_[True, pair_keys[0][order][1:] != pair_keys[0][order][:-1]]]
+    speakers = speakers.copy()
+    speakers[pair_keys[0][first]] = pair_keys[1][first]
+    return speakers
+
+
+def words_speaker_mapping(word_timestamps: List[dict], speaker_ts, anchor: str = "start") -> List[dict]:
+    """
+    Векторизованная замена helpers.get_words_speaker_mapping.
+
+    :param word_timestamps: Сегменты {"text", "start", "end"} с таймингами в миллисекундах.
+    :param speaker_ts: Реплики (TURN_DTYPE или список [начало, конец, спикер]).
+    :param anchor: Якорь слова: "start", "mid", "end" или "overlap".
+    :return: Список {"word", "start_time", "end_time", "speaker"}.
+    """
+    if not word_timestamps:
+        return []
+
+    starts = np.fromiter((w["start"] for w in word_timestamps), dtype=np.int64, count=len(word_timestamps))
+    ends = np.fromiter((w["end"] for w in word_timestamps), dtype=np.int64, count=len(word_timestamps))
+    speakers = assign_speakers(starts, ends, to_turns(speaker_ts), anchor).tolist()
+    return [
+        {"word": w["text"], "start_time": w["start"], "end_time": w["end"], "speaker": speaker}
+        for w, speaker in zip(word_timestamps, speakers)
+    ]
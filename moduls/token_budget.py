@@ -0,0 +1,162 @@
+import logging
+import re
+from typing import List
+
+
+logger = logging.getLogger(__name__)
+
+# Модель, под которую считаются токены по умолчанию (совпадает с моделью GPTAssistant).
+DEFAULT_MODEL = "gpt-3.5-turbo"
+
+# Грубая оценка для случая, когда tiktoken не установлен: для смешанного русско-английского текста
+# один токен в среднем соответствует ~3 символам.
+CHARS_PER_TOKEN = 3
+
+# Граница реплик в диаризированном тексте (get_speaker_aware_transcript разделяет спикеров пустой строкой).
+SPEAKER_TURN_SEPARATOR = re.compile(r"\n\s*\n")
+SENTENCE_SEPARATOR = re.compile(r"(?<=[.!?…])\s+")
+
+try:
+    import tiktoken
+except ImportError:
+    tiktoken = None
+    logger.info("tiktoken не установлен, количество токенов оценивается по длине текста.")
+
+_encodings = {}
+
+
+def _get_encoding(model: str):
+    """
+    Возвращает (и кэширует) кодировщик tiktoken для модели или None, если tiktoken недоступен.
+    """
+    if tiktoken is None:
+        return None
+
+    if model not in _encodings:
+        try:
+            _encodings[model] = tiktoken.encoding_for_model(model)
+        except KeyError:
+            _encodings[model] = tiktoken.get_encoding("cl100k_base")
+
+    return _encodings[model]
+
+
+def count_tokens(text: str, model: str = DEFAULT_MODEL) -> int:
+    """
+    Считает количество токенов в тексте для указанной модели.
+
+    :param text: Исходный текст.
+    :param model: Название модели OpenAI.
+    :return: Количество токенов (точное при наличии tiktoken, иначе оценка по длине).
+    """
+    if not text:
+        return 0
+
+    encoding = _get_encoding(model)
+    if encoding is None:
+        return len(text) // CHARS_PER_TOKEN + 1
+
+    return len(encoding.encode(text))
+
+
+def truncate_to_tokens(text: str, max_tokens: int, model: str = DEFAULT_MODEL, suffix: str = "…") -> str:
+    """
+    Обрезает текст до заданного количества токенов, стараясь не разрывать слова.
+
+    :param text: Исходный текст.
+    :param max_tokens: Максимальное количество токенов.
+    :param model: Название модели OpenAI.
+    :param suffix: Маркер, добавляемый к обрезанному тексту.
+    :return: Исходный текст, если он укладывается в бюджет, иначе обрезанный текст с маркером.
+    """
+    if not text or count_tokens(text, model) <= max_tokens:
+        return text
+
+    encoding = _get_encoding(model)
+    if encoding is None:
+        cut = text[:max(max_tokens, 0) * CHARS_PER_TOKEN]
+    else:
+        cut = encoding.decode(encoding.encode(text)[:max(max_tokens, 0)])
+
+    # Не оставляем обрубок слова в конце
+    if " " in cut:
+        cut = cut.rsplit(" ", 1)[0]
+
+    return cut.rstrip(" ,;:") + suffix
+
+
+def _split_oversized(text: str, max_tokens: int, model: str) -> List[str]:
+    """
+    Делит одну слишком длинную реплику сначала по предложениям, затем (если и предложение длинное) по словам.
+    """
+    pieces = []
+    for sentence in SENTENCE_SEPARATOR.split(text):
+        if count_tokens(sentence, model) <= max_tokens:
+            pieces.append(sentence)
+            continue
+
+        words, current = sentence.split(), []
+        for word in words:
+            if current and count_tokens(" ".join(current + [word]), model) > max_tokens:
+                pieces.append(" ".join(current))
+                current = []
+            current.append(word)
+
+        if current:
+            pieces.append(" ".join(current))
+
+    return _pack(pieces, max_tokens, model, " ")
+
+
+def _pack(pieces: List[str], max_tokens: int, model: str, separator: str) -> List[str]:
+    """
+    Жадно упаковывает последовательные фрагменты в чанки, не превышающие max_tokens.
+    """
+    chunks, current, current_tokens = [], [], 0
+    separator_tokens = count_tokens(separator, model) if separator.strip() else 1
+    for piece in pieces:
+        piece_tokens = count_tokens(piece, model)
+        if current and current_tokens + separator_tokens + piece_tokens > max_tokens:
+            chunks.append(separator.join(current))
+            current, current_tokens = [], 0
+
+        current.append(piece)
+        current_tokens += piece_tokens + (separator_tokens if len(current) > 1 else 0)
+
+    if current:
+        chunks.append(separator.join(current))
+
+    return chunks
+
+
+def split_by_speaker_turns(text: str, max_tokens: int, model: str = DEFAULT_MODEL) -> List[str]:
+    """
+    Делит диаризированный текст на чанки, каждый из которых укладывается в бюджет токенов.
+
+    Разрез выполняется только по границам реплик спикеров ("Speaker N: ..."), поэтому реплика
+    не разрывается между чанками. Реплика, которая сама по себе превышает бюджет, делится по
+    предложениям, а затем по словам; метка спикера повторяется в начале каждой её части.
+    Для обычного текста без реплик границами служат абзацы.
+
+    :param text: Диаризированный текст (или обычный текст).
+    :param max_tokens: Бюджет токенов на один чанк.
+    :param model: Название модели OpenAI.
+    :return: Список чанков в исходном порядке.
+    """
+    turns = [turn.strip() for turn in SPEAKER_TURN_SEPARATOR.split(text) if turn.strip()]
+
+    pieces = []
+    for turn in turns:
+        if count_tokens(turn, model) <= max_tokens:
+            pieces.append(turn)
+            continue
+
+        speaker, _, body = turn.partition(": ")
+        if body and speaker.startswith("Speaker"):
+            label = f"{speaker}: "
+            parts = _split_oversized(body, max_tokens - count_tokens(label, model), model)
+            pieces.extend(label + part for part in parts)
+        else:
+            pieces.extend(_split_oversized(turn, max_tokens, model))
+
+    return _pack(pieces, max_tokens, model, "\n\n")
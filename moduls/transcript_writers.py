@@ -0,0 +1,169 @@
+import json
+import os
+import socket
+from abc import ABC, abstractmethod
+from contextlib import ExitStack
+from typing import Any, Dict, Iterable, Iterator, TextIO, Tuple, Union
+from moduls.helpers_diaraize import format_timestamp
+
+
+# Форматы диаризированного транскрипта и расширения их файлов.
+TRANSCRIPT_FORMATS = {"txt": ".txt", "srt": ".srt", "vtt": ".vtt", "jsonl": ".jsonl"}
+
+
+class TranscriptWriter(ABC):
+    """
+    Пишет предложения {"speaker", "start_time", "end_time", "text"} (тайминги в мс) в текстовый поток
+    по одному, не собирая транскрипт целиком. Поток — любой объект с методом write (файл, StringIO,
+    socket.makefile("w")); закрывает его вызывающий код.
+    """
+
+    def __init__(self, stream: TextIO):
+        self.stream = stream
+        self.count = 0
+
+    def write(self, sentence: dict) -> None:
+        self.count += 1
+        self.stream.write(self.format(sentence))
+
+    @abstractmethod
+    def format(self, sentence: dict) -> str:
+        ...
+
+    def finish(self) -> None:
+        self.stream.flush()
+
+
+class TextTranscriptWriter(TranscriptWriter):
+    """
+    Текст с указанием спикеров, как helpers.get_speaker_aware_transcript.
+    """
+
+    def __init__(self, stream: TextIO):
+        super().__init__(stream)
+        self.previous_speaker = None
+
+    def format(self, sentence: dict) -> str:
+        speaker, prefix = sentence["speaker"], ""
+        if self.previous_speaker is None:
+            prefix = f"{speaker}: "
+        elif speaker != self.previous_speaker:
+            prefix = f"\n\n{speaker}: "
+        self.previous_speaker = speaker
+        return prefix + sentence["text"] + " "
+
+
+class SrtTranscriptWriter(TranscriptWriter):
+    """
+    Субтитры SRT, как helpers.write_srt.
+    """
+
+    def format(self, sentence: dict) -> str:
+        start = format_timestamp(int(sentence["start_time"]), always_include_hours=True, decimal_marker=",")
+        end = format_timestamp(int(sentence["end_time"]), always_include_hours=True, decimal_marker=",")
+        text = sentence["text"].strip().replace("-->", "->")
+        return f"{self.count}\n{start} --> {end}\n{sentence['speaker']}: {text}\n\n"
+
+
+class VttTranscriptWriter(TranscriptWriter):
+    """
+    Субтитры WebVTT; спикер передаётся тегом голоса <v>.
+    """
+
+    def write(self, sentence: dict) -> None:
+        if not self.count:
+            self.stream.write("WEBVTT\n\n")
+        super().write(sentence)
+
+    def format(self, sentence: dict) -> str:
+        start = format_timestamp(int(sentence["start_time"]), always_include_hours=True)
+        end = format_timestamp(int(sentence["end_time"]), always_include_hours=True)
+        text = sentence["text"].strip().replace("-->", "->").replace("&", "&amp;").replace("<", "&lt;")
+        return f"{start} --> {end}\n<v {sentence['speaker']}>{text}\n\n"
+
+    def finish(self) -> None:
+        if not self.count:
+            self.stream.write("WEBVTT\n\n")
+        super().finish()
+
+
+class JsonlTranscriptWriter(TranscriptWriter):
+    """
+    По одному JSON-объекту предложения на строку.
+    """
+
+    def format(self, sentence: dict) -> str:
+        record = {
+            "speaker": sentence["speaker"],
+            "start_time": int(sentence["start_time"]),
+            "end_time": int(sentence["end_time"]),
+            "text": sentence["text"],
+        }
+        return json.dumps(record, ensure_ascii=False) + "\n"
+
+
+WRITERS = {
+    "txt": TextTranscriptWriter,
+    "srt": SrtTranscriptWriter,
+    "vtt": VttTranscriptWriter,
+    "jsonl": JsonlTranscriptWriter,
+}
+
+
+def write_transcript(sentences: Iterable[dict], outputs: Union[Dict[str, Any], Iterable[Tuple[str, Any]]]) -> int:
+    """
+    Записывает предложения сразу во все форматы за один проход по генератору.
+
+    :param sentences: Предложения (например, helpers.iter_sentences_speaker_mapping).
+    :param outputs: Формат из TRANSCRIPT_FORMATS -> путь к файлу, открытый текстовый поток или сокет
+        (словарь или пары, если один формат нужен в нескольких местах). Файлы и сокеты, открытые здесь,
+        здесь же и закрываются.
+    :return: Количество предложений.
+    """
+    outputs = list(outputs.items() if isinstance(outputs, dict) else outputs)
+    unknown = {fmt for fmt, _ in outputs} - set(WRITERS)
+    if unknown:
+        raise ValueError(f"Неизвестные форматы транскрипта: {', '.join(sorted(unknown))}")
+
+    with ExitStack() as stack:
+        writers = [WRITERS[fmt](stack.enter_context(open_output(target)) if _needs_open(target) else target)
+                   for fmt, target in outputs]
+        count = 0
+        for sentence in sentences:
+            for writer in writers:
+                writer.write(sentence)
+            count += 1
+        for writer in writers:
+            writer.finish()
+    return count
+
+
+def _needs_open(target: Any) -> bool:
+    return isinstance(target, (str, os.PathLike, socket.socket))
+
+
+def open_output(target: Any) -> TextIO:
+    """
+    Открывает путь к файлу (каталоги создаются) или сокет как текстовый поток UTF-8.
+    """
+    if isinstance(target, socket.socket):
+        return target.makefile("w", encoding="utf-8", newline="\n")
+    os.makedirs(os.path.dirname(os.path.abspath(target)), exist_ok=True)
+    return open(target, "w", encoding="utf-8", newline="\n")
+
+
+def output_paths(output_dir: str, base_name: str, formats: Iterable[str]) -> Dict[str, str]:
+    """
+    Пути к файлам транскрипта в output_dir: <base_name>.<расширение формата>.
+    """
+    return {fmt: os.path.join(output_dir, base_name + TRANSCRIPT_FORMATS[fmt]) for fmt in formats}
+
+
+def read_sentences(path: str) -> Iterator[dict]:
+    """
+    Читает предложения из файла JSONL (JsonlTranscriptWriter) по одному.
+    """
+    with open(path, "r", encoding="utf-8") as f:
+        for line in f:
+            if line.strip():
+                yield json.loads(line)
@@ -1,8 +1,24 @@
 from nemo.collections.asr.models.msdd_models import NeuralDiarizer
-from deepmultilingualpunctuation import PunctuationModel
-from moduls import helpers_diaraize as helpers
-import logging, os, re, subprocess
+from moduls import helpers_diaraize as helpers, timeline
+from moduls.artifact_cache import ArtifactCache
+from moduls.audio_stream import (SAMPLE_RATE, STREAM_DIARIZATION, STREAM_MIN_DURATION_SECONDS,
+                                 STREAM_OVERLAP_SECONDS, STREAM_WINDOW_SECONDS, IncrementalWavWriter, SegmentStitcher,
+                                 extract_audio_pcm, find_ffmpeg, iter_pcm_windows, open_wav_memmap, probe_duration)
+from moduls.execution_profile import get_execution_profile
+from moduls.fast_diarization import DIARIZATION_TIER, StreamingDiarizer, diarization_params, diarize_fast
+from moduls import model_registry
+from moduls.model_pool import get_model_pool
+from moduls.punctuation import PUNCTUATION_BACKEND, PUNCTUATION_MODEL, iter_punctuation_labels
+from moduls.source_separation import (DEMUCS_MODEL, SEPARATION_CHUNK_SECONDS, SEPARATION_OVERLAP_SECONDS,
+                                      isolate_vocals, needs_separation)
+from moduls.speech_activity import (SHARED_VAD, describe_savings, merge_regions, silent_turns, speech_regions,
+                                    vad_params, whisper_clips, write_speech_rttm)
+from moduls.transcript_writers import read_sentences, write_transcript
+from moduls.workspace import job_workspace
+from typing import Any, Dict, Iterable, Iterator, List, Optional, Tuple
+import contextlib, hashlib, io, json, logging, os, re, subprocess, time
 import faster_whisper
+import numpy as np
 import torch
 import torchaudio
 
@@ -47,139 +63,512 @@ def start_extract_audio(video: str, audio_dir_path: str) -> str:
 
 
 mtypes = {"cpu": "int8", "cuda": "float16"}
+# Как сегмент Whisper сопоставляется с репликами спикеров: "start", "mid", "end" или "overlap" (наибольшее пересечение).
+WORD_SPEAKER_ANCHOR = os.environ.get("WORD_SPEAKER_ANCHOR", "start")
+# Выравнивание спикеров по границам восстановленных предложений (helpers.get_realigned_ws_mapping_with_punctuation):
+# предложение до SPEAKER_REALIGNMENT_MAX_WORDS слов со сменой спикера посередине отдаётся спикеру большинства.
+SPEAKER_REALIGNMENT = os.environ.get("SPEAKER_REALIGNMENT", "0") == "1"
+SPEAKER_REALIGNMENT_MAX_WORDS = int(os.environ.get("SPEAKER_REALIGNMENT_MAX_WORDS", 50))
 
+_artifact_cache = None
 
-def start_diarize(audio, no_stem=True, suppress_numerals=False, model_name="medium.en", 
-                  batch_size=8, language=None, device=None):
-    
-    device = device if device else ("cuda" if torch.cuda.is_available() else "cpu")
-    language = helpers.process_language_arg(language, model_name)
 
-    if no_stem:
-        # Isolate vocals from the rest of the audio
-        return_code = subprocess.run([
-            "demucs",
-            "-n", "htdemucs",
-            "--two-stems=vocals",
-            audio,
-            "-o", helpers.GLOBAL_AUDIO_DIR,
-            "--device", device
-        ])
-
-        if return_code != 0:
-            logging.warning("Source splitting failed, using original audio file. "
-                            "Use --no-stem argument to disable it."
-                            )
-            vocal_target = audio
-        else:
-            vocal_target = os.path.join(
-                                        helpers.GLOBAL_AUDIO_DIR,
-                                        "htdemucs",
-                                        os.path.splitext(os.path.basename(audio))[0],
-                                        "vocals.wav"
-                                        )
-    else: vocal_target = audio
-
-    print(1)
-    # Transcribe the audio file
-    whisper_model = faster_whisper.WhisperModel(model_name, device=device, compute_type=mtypes[device])
-    whisper_pipeline = faster_whisper.BatchedInferencePipeline(whisper_model)
-    audio_waveform = faster_whisper.decode_audio(vocal_target)
-    suppress_tokens = (helpers.find_numeral_symbol_tokens(whisper_model.hf_tokenizer)
-                       if suppress_numerals
-                       else [-1])
+def get_artifact_cache() -> ArtifactCache:
+    """
+    Возвращает общий для процесса кэш артефактов видео-пайплайна (в helpers.GLOBAL_CACHE_DIR).
+    """
+    global _artifact_cache
+    if _artifact_cache is None:
+        _artifact_cache = ArtifactCache(helpers.GLOBAL_CACHE_DIR)
+    return _artifact_cache
+
+
+def lease_whisper(model_name: str, device: str):
+    """
+    Выдаёт модель faster-whisper из пула моделей (загружается один раз на процесс).
+
+    :return: Контекстный менеджер, возвращающий WhisperModel.
+    """
+    # Число потоков CTranslate2 задаётся профилем выполнения (0 — выбор библиотеки)
+    cpu_threads = get_execution_profile().threads("transcribe") if device == "cpu" else 0
+    return get_model_pool().lease(
+        ("whisper", model_name, device, mtypes[device], cpu_threads),
+        lambda: faster_whisper.WhisperModel(model_registry.resolve("whisper", model_name), device=device, compute_type=mtypes[device],
+                                            cpu_threads=cpu_threads),
+    )
+
+
+def suppress_tokens_for(whisper_model, suppress_numerals: bool) -> List[int]:
+    return (helpers.find_numeral_symbol_tokens(whisper_model.hf_tokenizer)
+            if suppress_numerals
+            else [-1])
+
+
+def transcribe_segments(whisper_model, whisper_pipeline, audio_waveform: np.ndarray, language: Optional[str],
+                        batch_size: int, suppress_tokens: List[int], offset_ms: int = 0,
+                        speech: Optional[List[Tuple[int, int]]] = None) -> Tuple[List[dict], str]:
+    """
+    Транскрибирует аудио уже загруженной моделью faster-whisper.
+
+    :param offset_ms: Сдвиг таймингов (начало окна в потоковом режиме).
+    :param speech: Участки речи общего VAD (в сэмплах audio_waveform) вместо собственного VAD faster-whisper.
+    :return: (список сегментов {"text", "start", "end", "speaker"} с таймингами в мс, определённый язык).
+    """
+    if speech is not None and not speech:
+        # Речи нет: Whisper не запускается, язык остаётся неизвестным (None), если не задан
+        return [], language
 
+    clips = {} if speech is None else {"clip_timestamps": whisper_clips(speech, batched=batch_size > 0)}
     if batch_size > 0: transcript_segments, info = whisper_pipeline.transcribe(
                                                                                audio_waveform,
                                                                                language,
                                                                                suppress_tokens=suppress_tokens,
                                                                                batch_size = batch_size,
+                                                                               **clips,
                                                                               )
     
     else: transcript_segments, info = whisper_model.transcribe(
                                                                audio_waveform,
                                                                language,
                                                                suppress_tokens=suppress_tokens,
-                                                               vad_filter=True,
+                                                               vad_filter=speech is None,
+                                                               **clips,
                                                               )
-    # так можно получить текст на этом этапе
-    # full_transcript = "".join(segment.text for segment in transcript_segments)
-    print(2)
-    # clear gpu vram
-    del whisper_model, whisper_pipeline
-    torch.cuda.empty_cache()
-    print(3)
+
     # Заменяем CTC forced alignment на простой mapping из faster-whisper сегментов
     word_timestamps = []
     for segment in transcript_segments:
         word_timestamps.append({
             "text": segment.text.strip(),
-            "start": int(segment.start * 1000),
-            "end": int(segment.end * 1000),
+            "start": offset_ms + int(segment.start * 1000),
+            "end": offset_ms + int(segment.end * 1000),
             "speaker": "unknown"
         })
+    return word_timestamps, info.language
+
+
+def transcribe(audio_waveform: np.ndarray, model_name: str, language: Optional[str], batch_size: int,
+               suppress_numerals: bool, device: str,
+               speech: Optional[List[Tuple[int, int]]] = None) -> Tuple[List[dict], str]:
+    """
+    Транскрибирует аудио с помощью faster-whisper.
+
+    :param speech: Участки речи общего VAD (см. detect_speech).
+    :return: (список сегментов {"text", "start", "end", "speaker"} с таймингами в мс, определённый язык).
+    """
+    with lease_whisper(model_name, device) as whisper_model:
+        whisper_pipeline = faster_whisper.BatchedInferencePipeline(whisper_model)
+        return transcribe_segments(whisper_model, whisper_pipeline, audio_waveform, language, batch_size,
+                                   suppress_tokens_for(whisper_model, suppress_numerals), speech=speech)
+
+
+def detect_speech(audio_waveform: np.ndarray) -> Tuple[Optional[List[Tuple[int, int]]], str]:
+    """
+    Общий VAD (SHARED_VAD=1): один проход Silero VAD, участки которого задают и клипы Whisper,
+    и oracle VAD диаризации.
+
+    :return: (участки речи в сэмплах или None без общего VAD, отчёт о сэкономленной обработке тишины).
+    """
+    if not SHARED_VAD:
+        return None, ""
+    started = time.perf_counter()
+    speech = speech_regions(audio_waveform)
+    return speech, describe_savings(speech, len(audio_waveform), time.perf_counter() - started)
+
+
+def bind_msdd_config(msdd_model: NeuralDiarizer, cfg) -> None:
+    """
+    Переключает загруженную модель NeMo MSDD на манифест, рабочий каталог и режим VAD из cfg
+    (helpers.create_config) так же, как NeuralDiarizer.__call__: веса моделей не перезагружаются.
+    Модель VAD MarbleNet загружается при первом вызове без oracle VAD.
+    """
+    clustering = msdd_model.clustering_embedding.clus_diar_model
+    for target in (msdd_model._cfg, clustering._cfg):
+        target.num_workers = cfg.num_workers
+        target.diarizer.manifest_filepath = cfg.diarizer.manifest_filepath
+        target.diarizer.out_dir = cfg.diarizer.out_dir
+        target.diarizer.oracle_vad = cfg.diarizer.oracle_vad
+        target.diarizer.vad.model_path = cfg.diarizer.vad.model_path
+    msdd_model.transfer_diar_params_to_model_params(msdd_model.msdd_model, msdd_model._cfg)
+
+    if cfg.diarizer.oracle_vad:
+        clustering.has_vad_model = False
+    else:
+        if getattr(clustering, "_vad_model", None) is None:
+            clustering._vad_params = clustering._cfg.diarizer.vad.parameters
+            clustering._init_vad_model()
+        clustering.has_vad_model = True
+
+
+def diarize_file(temp_path: str, device: str, tier: str = DIARIZATION_TIER,
+                 speech: Optional[List[Tuple[int, int]]] = None) -> str:
+    """
+    Выполняет диаризацию файла temp_path/mono_file.wav: NeMo MSDD или, при tier="fast",
+    быстрым уровнем (fast_diarization.diarize_fast по отображённому в память файлу).
+
+    Модель NeMo MSDD хранится в пуле по модели и устройству; манифест, рабочий каталог и режим VAD
+    этого вызова передаются ей перед запуском (bind_msdd_config), поэтому вызовы с разными temp_path
+    переиспользуют одну загруженную модель.
+
+    :param speech: Участки речи общего VAD (см. detect_speech): для MSDD передаются как oracle VAD.
+    :return: Путь к RTTM-файлу с разметкой спикеров.
+    """
+    rttm_path = os.path.join(temp_path, "pred_rttms", "mono_file.rttm")
+    wav_path = os.path.join(temp_path, "mono_file.wav")
+    if speech is not None and not speech:
+        return timeline.save_rttm(silent_turns(len(open_wav_memmap(wav_path))), rttm_path)
+    if tier == "fast":
+        return timeline.save_rttm(diarize_fast(open_wav_memmap(wav_path), device, regions=speech), rttm_path)
+
+    speech_rttm = write_speech_rttm(speech, os.path.join(temp_path, "speech.rttm")) if speech is not None else None
+    # create_config пишет манифест в temp_path; модель NeMo MSDD берётся из пула и переключается на него
+    cfg = helpers.create_config(temp_path, num_workers=get_execution_profile().dataloader_workers,
+                                speech_rttm=speech_rttm)
+    with get_model_pool().lease(("msdd", cfg.diarizer.msdd_model.model_path, device),
+                                lambda: NeuralDiarizer(cfg=cfg).to(device), exclusive=True) as msdd_model:
+        bind_msdd_config(msdd_model, cfg)
+        msdd_model.diarize()
+    return rttm_path
+
+
+def diarize_waveform(audio_waveform: np.ndarray, temp_path: str, device: str, tier: str = DIARIZATION_TIER,
+                     speech: Optional[List[Tuple[int, int]]] = None) -> str:
+    """
+    Выполняет диаризацию NeMo MSDD или быстрым уровнем.
+
+    :param audio_waveform: Аудио 16 кГц моно.
+    :param temp_path: Рабочий каталог NeMo.
+    :param device: Устройство для запуска моделей.
+    :param tier: Уровень диаризации: "msdd" или "fast" (по умолчанию DIARIZATION_TIER).
+    :param speech: Участки речи общего VAD (см. detect_speech).
+    :return: Путь к RTTM-файлу с разметкой спикеров.
+    """
+    if tier == "fast":
+        return timeline.save_rttm(diarize_fast(np.asarray(audio_waveform), device, regions=speech),
+                                  os.path.join(temp_path, "pred_rttms", "mono_file.rttm"))
 
     # convert audio to mono for NeMo combatibility
-    temp_path = helpers.GLOBAL_YAML_DIR
     os.makedirs(temp_path, exist_ok=True)
     torchaudio.save(
         os.path.join(temp_path, "mono_file.wav"),
-        torch.from_numpy(audio_waveform).unsqueeze(0).float(),
-        16000,
+        torch.from_numpy(np.asarray(audio_waveform)).unsqueeze(0).float(),
+        SAMPLE_RATE,
         channels_first=True,
     )
-    print(4)
-    # Initialize NeMo MSDD diarization model
-    msdd_model = NeuralDiarizer(cfg=helpers.create_config(temp_path)).to(device)
-    msdd_model.diarize()
-    del msdd_model
-    torch.cuda.empty_cache()
-    print(5)
-    # Reading timestamps <> Speaker Labels mapping
-    speaker_ts = []
-    with open(os.path.join(temp_path, "pred_rttms", "mono_file.rttm"), "r") as f:
-        lines = f.readlines()
-        for line in lines:
-            line_list = line.split(" ")
-            s = int(float(line_list[5]) * 1000)
-            e = s + int(float(line_list[8]) * 1000)
-            speaker_ts.append([s, e, int(line_list[11].split("_")[-1])])
-    wsm = helpers.get_words_speaker_mapping(word_timestamps, speaker_ts, "start")
-    print(6)
-    if info.language in helpers.punct_model_langs:
+    return diarize_file(temp_path, device, tier, speech)
+
+
+def read_rttm(rttm_path: str) -> np.ndarray:
+    """
+    Читает RTTM-файл в структурированный массив реплик (timeline.TURN_DTYPE: начало и конец в мс, номер спикера).
+    """
+    return timeline.load_rttm(rttm_path)
+
+
+def build_sentences(word_timestamps: List[dict], speaker_ts, detected_language: str,
+                    device: Optional[str] = None) -> Iterator[dict]:
+    """
+    Сопоставляет сегменты со спикерами, восстанавливает пунктуацию и разбивает текст на предложения.
+
+    :param device: Устройство для модели пунктуации (по умолчанию CUDA, если доступна).
+    :return: Генератор предложений {"speaker", "start_time", "end_time", "text"}.
+    """
+    device = device if device else ("cuda" if torch.cuda.is_available() else "cpu")
+    wsm = timeline.words_speaker_mapping(word_timestamps, speaker_ts, WORD_SPEAKER_ANCHOR)
+    if detected_language in helpers.punct_model_langs:
         # restoring punctuation in the transcript to help realign the sentences
-        punct_model = PunctuationModel(model="kredor/punctuate-all")
-        words_list = list(map(lambda x: x["word"], wsm))
-        labled_words = punct_model.predict(words_list, chunk_size=230)
+        labels = iter_punctuation_labels((word_dict["word"] for word_dict in wsm), device)
         ending_puncts = ".?!"
         model_puncts = ".,;:!?"
 
         # We don't want to punctuate U.S.A. with a period. Right?
         is_acronym = lambda x: re.fullmatch(r"\b(?:[a-zA-Z]\.){2,}", x)
-        for word_dict, labeled_tuple in zip(wsm, labled_words):
+        for word_dict, label in zip(wsm, labels):
             word = word_dict["word"]
             if (
                 word
-                and labeled_tuple[1] in ending_puncts
+                and label in ending_puncts
                 and (word[-1] not in model_puncts or is_acronym(word))
             ):
-                word += labeled_tuple[1]
+                word += label
                 if word.endswith(".."):
                     word = word.rstrip(".")
                 word_dict["word"] = word
 
     else: logging.warning(
-            f"Punctuation restoration is not available for {info.language} language."
+            f"Punctuation restoration is not available for {detected_language} language."
             " Using the original punctuation."
         )
-    print(7)
-    # wsm = get_realigned_ws_mapping_with_punctuation(wsm)
-    ssm = helpers.get_sentences_speaker_mapping(wsm, speaker_ts)
-
-    # Записываем транскрипцию в файл
-    diarized_text = helpers.get_speaker_aware_transcript(ssm)
-    helpers.cleanup(temp_path)
-    print(8)
+
+    if SPEAKER_REALIGNMENT:
+        wsm = helpers.get_realigned_ws_mapping_with_punctuation(wsm, SPEAKER_REALIGNMENT_MAX_WORDS)
+    return helpers.iter_sentences_speaker_mapping(wsm, speaker_ts)
+
+
+def build_transcript(word_timestamps: List[dict], speaker_ts, detected_language: str,
+                     device: Optional[str] = None) -> str:
+    """
+    Сопоставляет сегменты со спикерами, восстанавливает пунктуацию и собирает диаризированный текст.
+    """
+    return helpers.get_speaker_aware_transcript(build_sentences(word_timestamps, speaker_ts, detected_language,
+                                                                device))
+
+
+def emit_transcript(sentences: Iterable[dict], outputs: Optional[Dict[str, Any]] = None,
+                    cache: Optional[ArtifactCache] = None, key: Optional[str] = None) -> str:
+    """
+    Записывает предложения за один проход во все запрошенные форматы (transcript_writers.write_transcript)
+    и в кэш артефактов (transcript.txt и sentences.jsonl под ключом key).
+
+    :param outputs: Формат ("txt", "srt", "vtt", "jsonl") -> путь, текстовый поток или сокет.
+    :return: Диаризированный текст.
+    """
+    text = io.StringIO()
+    targets = [("txt", text)] + list((outputs or {}).items())
+    if cache is not None:
+        entry_dir = cache.entry_dir(key)
+        targets += [("txt", os.path.join(entry_dir, "transcript.txt")),
+                    ("jsonl", os.path.join(entry_dir, "sentences.jsonl"))]
+
+    write_transcript(sentences, targets)
+    if cache is not None:
+        cache.commit(key, "transcript.txt", "sentences.jsonl")
+    return text.getvalue()
+
+
+def cached_transcript(cache: ArtifactCache, key: str, outputs: Optional[Dict[str, Any]] = None) -> Optional[str]:
+    """
+    Возвращает диаризированный текст из кэша и, если запрошены outputs, записывает их из кэшированных
+    предложений. None, если текста (или нужных для outputs предложений) в кэше нет.
+    """
+    diarized_text = cache.get_text(key, "transcript.txt")
+    if diarized_text is None or not outputs:
+        return diarized_text
+
+    sentences_path = cache.get(key, "sentences.jsonl")
+    if sentences_path is None:
+        return None
+    write_transcript(read_sentences(sentences_path), outputs)
+    return diarized_text
+
+
+def transcript_params() -> dict:
+    """
+    Дополнительные параметры ключа кэша транскрипта: уровень диаризации, выравнивание спикеров и модель пунктуации
+    попадают в ключ, только если отличаются от значений по умолчанию, поэтому ранее сохранённые транскрипты
+    остаются действительными.
+    """
+    params = dict(diarization_params())
+    if SPEAKER_REALIGNMENT:
+        params["realignment"] = SPEAKER_REALIGNMENT_MAX_WORDS
+    if PUNCTUATION_MODEL != "kredor/punctuate-all" or PUNCTUATION_BACKEND != "torch":
+        params.update(punctuation_model=PUNCTUATION_MODEL, punctuation_backend=PUNCTUATION_BACKEND)
+    return params
+
+
+def asr_params(no_stem: bool, model_name: str, language: Optional[str], batch_size: int,
+               suppress_numerals: bool) -> dict:
+    """
+    Параметры распознавания для ключей кэша сегментов и транскрипта.
+    """
+    return dict(no_stem=no_stem, model_name=model_name, language=language,
+                batch_size=batch_size, suppress_numerals=suppress_numerals, **vad_params())
+
+
+def transcript_key_params(no_stem: bool, model_name: str, language: Optional[str], batch_size: int,
+                          suppress_numerals: bool) -> dict:
+    """
+    Параметры ключа кэша транскрипта: привязка слов к спикерам, параметры распознавания и transcript_params.
+    Общие для start_diarize и потокового режима (к ним он добавляет размеры окна и перекрытия).
+    """
+    return dict(anchor=WORD_SPEAKER_ANCHOR, **transcript_params(),
+                **asr_params(no_stem, model_name, language, batch_size, suppress_numerals))
+
+
+def stage_keys(content_hash: str, no_stem: bool, model_name: str, language: Optional[str], batch_size: int,
+               suppress_numerals: bool) -> dict:
+    """
+    Ключи кэша артефактов для этапов extraction_text и start_diarize (audio, vocals, segments, rttm, transcript).
+    """
+    return {
+        "audio": ArtifactCache.stage_key("audio", content_hash, sample_rate=SAMPLE_RATE),
+        "vocals": ArtifactCache.stage_key("vocals", content_hash, no_stem=no_stem, model=DEMUCS_MODEL,
+                                          chunk_seconds=SEPARATION_CHUNK_SECONDS,
+                                          overlap_seconds=SEPARATION_OVERLAP_SECONDS),
+        "segments": ArtifactCache.stage_key("segments", content_hash,
+                                            **asr_params(no_stem, model_name, language, batch_size,
+                                                         suppress_numerals)),
+        "rttm": ArtifactCache.stage_key("rttm", content_hash, no_stem=no_stem, **diarization_params(),
+                                        **vad_params()),
+        "transcript": ArtifactCache.stage_key("transcript", content_hash,
+                                              **transcript_key_params(no_stem, model_name, language, batch_size,
+                                                                      suppress_numerals)),
+    }
+
+
+def start_diarize(audio, no_stem=True, suppress_numerals=False, model_name="medium.en", 
+                  batch_size=8, language=None, device=None, cache: Optional[ArtifactCache] = None,
+                  content_hash: Optional[str] = None, outputs: Optional[Dict[str, Any]] = None):
+    """
+    Транскрибирует и диаризирует аудио.
+
+    Если передан кэш артефактов, результаты этапов (вокал, сегменты Whisper, RTTM, итоговый текст)
+    сохраняются в нём под ключами из content_hash и параметров этапа, а уже посчитанные этапы
+    пропускаются.
+
+    :param audio: Путь к аудиофайлу или numpy-массив 16 кГц моно float32 (см. extract_audio_pcm).
+    :param cache: Необязательный кэш артефактов.
+    :param content_hash: Хэш содержимого исходного видео (по умолчанию — хэш аудиофайла).
+    :param outputs: Дополнительные форматы транскрипта (см. emit_transcript).
+    :return: Диаризированный текст.
+    """
+    device = device if device else ("cuda" if torch.cuda.is_available() else "cpu")
+    language = helpers.process_language_arg(language, model_name)
+    audio_waveform = audio if isinstance(audio, np.ndarray) else None
+
+    keys = {}
+    if cache is not None:
+        if content_hash is None:
+            content_hash = (hashlib.sha256(audio_waveform.tobytes()).hexdigest()
+                            if audio_waveform is not None else cache.content_hash(audio))
+        keys = stage_keys(content_hash, no_stem, model_name, language, batch_size, suppress_numerals)
+        diarized_text = cached_transcript(cache, keys["transcript"], outputs)
+        if diarized_text is not None:
+            return diarized_text
+
+    segments_data = cache.get_text(keys["segments"], "segments.json") if cache is not None else None
+    rttm_path = cache.get(keys["rttm"], "mono_file.rttm") if cache is not None else None
+
+    # Аудио нужно только если хотя бы один из тяжёлых этапов не взят из кэша
+    speech = None
+    if segments_data is None or rttm_path is None:
+        vocals_cached = cache.get(keys["vocals"], "vocals.npy") if cache is not None and no_stem else None
+        if vocals_cached is not None:
+            audio_waveform = np.load(vocals_cached)
+
+        else:
+            if audio_waveform is None:
+                audio_waveform = faster_whisper.decode_audio(audio)
+
+            # Отделение вокала в процессе (demucs из пула моделей); чистые записи его пропускают
+            if no_stem and needs_separation(audio_waveform):
+                logging.info("Отделение вокала (demucs)...")
+                separated = isolate_vocals(audio_waveform, device, skip_snr_db=0)
+                if separated is not audio_waveform and cache is not None:
+                    np.save(os.path.join(cache.entry_dir(keys["vocals"]), "vocals.npy"), separated)
+                    cache.commit(keys["vocals"], "vocals.npy")
+                audio_waveform = separated
+
+        speech, vad_report = detect_speech(audio_waveform)
+        if vad_report:
+            logging.info(vad_report)
+
+    if segments_data is None:
+        logging.info("Транскрибация (Whisper %s)...", model_name)
+        word_timestamps, detected_language = transcribe(audio_waveform, model_name, language, batch_size,
+                                                        suppress_numerals, device, speech)
+        segments_data = json.dumps({"language": detected_language, "segments": word_timestamps}, ensure_ascii=False)
+        if cache is not None:
+            cache.put_text(keys["segments"], "segments.json", segments_data)
+
+    segments = json.loads(segments_data)
+    if rttm_path is None:
+        logging.info("Диаризация (NeMo MSDD)...")
+        # Рабочий каталог NeMo (mono_file.wav, манифест, pred_rttms) свой у каждой задачи и удаляется по выходу
+        with job_workspace("diarize") as temp_path:
+            rttm_path = diarize_waveform(audio_waveform, temp_path, device, speech=speech)
+            speaker_ts = read_rttm(rttm_path)
+            if cache is not None:
+                cache.put_file(keys["rttm"], "mono_file.rttm", rttm_path)
+
+    else: speaker_ts = read_rttm(rttm_path)
+    del audio_waveform
+
+    logging.info("Восстановление пунктуации и сборка текста...")
+    diarized_text = emit_transcript(build_sentences(segments["segments"], speaker_ts, segments["language"], device),
+                                    outputs, cache, keys.get("transcript"))
+    return diarized_text
+
+
+def start_diarize_streaming(source: str, no_stem=True, suppress_numerals=False, model_name="medium.en",
+                            batch_size=8, language=None, device=None, window_seconds: float = STREAM_WINDOW_SECONDS,
+                            overlap_seconds: float = STREAM_OVERLAP_SECONDS, outputs: Optional[Dict[str, Any]] = None,
+                            cache: Optional[ArtifactCache] = None, transcript_key: Optional[str] = None) -> str:
+    """
+    Транскрибирует и диаризирует длинную запись, не загружая её в память целиком.
+
+    Аудио читается из ffmpeg окнами window_seconds с перекрытием overlap_seconds; каждое окно
+    транскрибируется Whisper, а сегменты склеиваются без дублей на границах (SegmentStitcher).
+
+    При STREAM_DIARIZATION=windowed (по умолчанию) окно сразу после Whisper проходит VAD и получает
+    эмбеддинги спикеров (StreamingDiarizer); после последнего окна эмбеддинги кластеризуются глобально
+    по ограниченной выборке, поэтому номера спикеров согласованы по всей записи. В памяти, кроме окна
+    и моделей, остаются только эмбеддинги и сегменты Whisper (единицы МБ на час).
+    При STREAM_DIARIZATION=full окна дописываются в mono_file.wav (рабочий каталог на диске, а не в tmpfs),
+    и уровень DIARIZATION_TIER (NeMo MSDD точнее) выполняется один раз по всему файлу; пик его памяти
+    растёт с длительностью записи. Замер — benchmarks/bench_streaming_memory.py --diarize.
+    При no_stem вокал отделяется в каждом окне, без проверки SNR: решение по отдельным окнам смешало бы
+    в записи участки с отделённым вокалом и без него, и один голос попал бы в разные акустические условия
+    для кластеризации спикеров, а решение по первому окну не годится для всей записи.
+
+    :param source: Путь к видео- или аудиофайлу.
+    :param window_seconds: Длина окна Whisper в секундах.
+    :param overlap_seconds: Перекрытие соседних окон в секундах.
+    :param outputs: Дополнительные форматы транскрипта (см. emit_transcript).
+    :param cache: Кэш артефактов, в который сохраняется транскрипт под ключом transcript_key.
+    :return: Диаризированный текст.
+    """
+    device = device if device else ("cuda" if torch.cuda.is_available() else "cpu")
+    language = helpers.process_language_arg(language, model_name)
+    stitcher = SegmentStitcher(int(overlap_seconds * 1000))
+    diarizer = (StreamingDiarizer(device, int(overlap_seconds * SAMPLE_RATE))
+                if STREAM_DIARIZATION == "windowed" else None)
+
+    with job_workspace("diarize", tmpfs=False) as temp_path:
+        with lease_whisper(model_name, device) as whisper_model, \
+                (IncrementalWavWriter(os.path.join(temp_path, "mono_file.wav")) if diarizer is None
+                 else contextlib.nullcontext()) as writer:
+            whisper_pipeline = faster_whisper.BatchedInferencePipeline(whisper_model)
+            suppress_tokens = suppress_tokens_for(whisper_model, suppress_numerals)
+            # Участки речи общего VAD по всей записи (для диаризации) и время VAD
+            speech, vad_seconds, total_samples = ([] if SHARED_VAD else None), 0.0, 0
+            for start, window in iter_pcm_windows(source, window_seconds, overlap_seconds):
+                if no_stem:
+                    window = isolate_vocals(window, device, skip_snr_db=0)
+                if writer is not None:
+                    writer.write(start, window)
+                total_samples = start + len(window)
+                window_speech = None
+                if SHARED_VAD:
+                    started = time.perf_counter()
+                    window_speech = speech_regions(window)
+                    vad_seconds += time.perf_counter() - started
+                    merge_regions(speech, window_speech, start)
+                start_ms = start * 1000 // SAMPLE_RATE
+                logging.info("Транскрибация окна %.0f–%.0f с...",
+                             start_ms / 1000, start_ms / 1000 + len(window) / SAMPLE_RATE)
+                segments, detected_language = transcribe_segments(whisper_model, whisper_pipeline, window, language,
+                                                                  batch_size, suppress_tokens, offset_ms=start_ms,
+                                                                  speech=window_speech)
+                # Язык определяется по первому окну и фиксируется для остальных
+                language = language or detected_language
+                stitcher.add(segments, start_ms, start_ms + len(window) * 1000 // SAMPLE_RATE)
+                if diarizer is not None:
+                    diarizer.add(start, window, window_speech)
+                del window
+
+        if speech is not None:
+            logging.info(describe_savings(speech, total_samples, vad_seconds))
+        if diarizer is not None:
+            logging.info("Диаризация: кластеризация эмбеддингов всех окон...")
+            speaker_ts = diarizer.finish()
+        else:
+            logging.info("Диаризация (%s) по всей записи...", DIARIZATION_TIER)
+            speaker_ts = read_rttm(diarize_file(temp_path, device, speech=speech))
+
+    logging.info("Восстановление пунктуации и сборка текста...")
+    diarized_text = emit_transcript(build_sentences(stitcher.finish(), speaker_ts, language, device),
+                                    outputs, cache, transcript_key)
     return diarized_text
 
 
@@ -187,25 +576,71 @@ def extraction_text(
     video: str,
     model_name: str = "large",
     language = "ru",
+    use_cache: bool = True,
+    streaming: Optional[bool] = None,
+    outputs: Optional[Dict[str, Any]] = None,
 ) -> str:
     """
     Точка входа для пайплайна извлечения текста из видео.
     Извлекает аудио, выполняет диаризацию, восстанавливает текст с таймингами и спикерами.
 
+    При use_cache результаты этапов сохраняются в кэше артефактов (get_artifact_cache) по хэшу
+    содержимого видео, и повторная обработка того же видео пропускает неизменившиеся этапы.
+
     :param video: Путь к видеофайлу.
-    :param no_stem: Флаг, указывающий, нужно ли извлекать вокал.
-    :param suppress_numerals: Удалять ли цифры из текста.
     :param model_name: Название модели whisper.
-    :param batch_size: Размер батча.
     :param language: Язык аудио.
-    :param device: Устройство для запуска моделей.
+    :param use_cache: Использовать кэш артефактов.
+    :param streaming: Потоковый режим для многочасовых записей (см. start_diarize_streaming);
+        по умолчанию включается для записей длиннее STREAM_MIN_DURATION_SECONDS.
+    :param outputs: Форматы транскрипта, которые пишутся за тот же проход: формат ("txt", "srt", "vtt",
+        "jsonl") -> путь к файлу, текстовый поток или сокет (пути по шаблону — transcript_writers.output_paths).
     :return: Полный текст с таймингами и указанием спикеров.
     """
-    # 1. Извлечение аудио из видео
-    audio_path = start_extract_audio(video, helpers.GLOBAL_AUDIO_DIR)
+    get_execution_profile().apply()
+    cache = get_artifact_cache() if use_cache else None
+    video_hash = cache.content_hash(video) if cache is not None else None
+
+    if streaming is None and find_ffmpeg() is not None:
+        duration = probe_duration(video)
+        streaming = duration is not None and duration > STREAM_MIN_DURATION_SECONDS
+
+    if streaming and find_ffmpeg() is not None:
+        # Параметры по умолчанию start_diarize_streaming: no_stem=True, batch_size=8, suppress_numerals=False
+        key_params = transcript_key_params(True, model_name, helpers.process_language_arg(language, model_name),
+                                           8, False)
+        if STREAM_DIARIZATION == "windowed":
+            key_params.update(diarization_params("windowed"))
+        transcript_key = cache.stage_key("transcript", video_hash, streaming=True, separation="always",
+                                         window_seconds=STREAM_WINDOW_SECONDS, overlap_seconds=STREAM_OVERLAP_SECONDS,
+                                         **key_params) if cache is not None else None
+        diarized_text = cached_transcript(cache, transcript_key, outputs) if cache is not None else None
+        if diarized_text is None:
+            diarized_text = start_diarize_streaming(video, model_name=model_name, language=language,
+                                                    outputs=outputs, cache=cache, transcript_key=transcript_key)
+        return diarized_text
+
+    audio_key = cache.stage_key("audio", video_hash, sample_rate=SAMPLE_RATE) if cache is not None else None
+    audio_cached = cache.get(audio_key, "audio.npy") if cache is not None else None
+
+    # 1. Извлечение аудио из видео: сразу в 16 кГц моно PCM, если доступен ffmpeg,
+    # иначе через MP3 локальным tools/ffmpeg.exe
+    if audio_cached is not None:
+        audio = np.load(audio_cached)
+
+    elif find_ffmpeg() is not None:
+        audio = extract_audio_pcm(video)
+        if cache is not None:
+            np.save(os.path.join(cache.entry_dir(audio_key), "audio.npy"), audio)
+            cache.commit(audio_key, "audio.npy")
+
+    else:
+        with job_workspace("audio") as audio_dir:
+            audio = faster_whisper.decode_audio(start_extract_audio(video, audio_dir))
 
     # Выполняем диаризацию. Сохраняем путь до файл с диаризацией диалога.
-    diarized_text = start_diarize(audio = audio_path, model_name=model_name, language=language)
+    diarized_text = start_diarize(audio = audio, model_name=model_name, language=language,
+                                  cache=cache, content_hash=video_hash, outputs=outputs)
 
     print("COOL!!!", diarized_text)
     return diarized_text
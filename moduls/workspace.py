@@ -0,0 +1,116 @@
+import atexit
+import contextlib
+import logging
+import os
+import shutil
+import tempfile
+import threading
+from typing import Iterator, Set, Tuple
+
+
+# Каталог рабочих каталогов задач (mono_file.wav, манифест и выходные файлы NeMo, MP3 от ffmpeg).
+# По умолчанию — tmpfs /dev/shm, если он есть и в нём свободно не меньше WORKSPACE_TMPFS_MIN_FREE_BYTES,
+# иначе системный временный каталог.
+WORKSPACE_DIR = os.environ.get("WORKSPACE_DIR", "")
+WORKSPACE_TMPFS_MIN_FREE_BYTES = int(os.environ.get("WORKSPACE_TMPFS_MIN_FREE_BYTES", 2 << 30))
+TMPFS_DIR = "/dev/shm"
+
+logger = logging.getLogger(__name__)
+
+_slots: Set[Tuple[str, str, int]] = set()
+_slots_lock = threading.Lock()
+_swept: Set[str] = set()
+
+
+def free_bytes(path: str) -> int:
+    try:
+        return shutil.disk_usage(path).free
+    except OSError:
+        return 0
+
+
+def workspace_root(tmpfs: bool = True) -> str:
+    """
+    Каталог для рабочих каталогов задач: WORKSPACE_DIR, tmpfs (если разрешён и в нём достаточно места)
+    или системный временный каталог.
+    """
+    if WORKSPACE_DIR:
+        return WORKSPACE_DIR
+    if (tmpfs and os.path.isdir(TMPFS_DIR) and os.access(TMPFS_DIR, os.W_OK)
+            and free_bytes(TMPFS_DIR) >= WORKSPACE_TMPFS_MIN_FREE_BYTES):
+        return TMPFS_DIR
+    return tempfile.gettempdir()
+
+
+def _pid_alive(pid: int) -> bool:
+    if os.name == "nt":
+        # На Windows проверка без psutil ненадёжна: каталоги чужих процессов не трогаем
+        return True
+    try:
+        os.kill(pid, 0)
+    except ProcessLookupError:
+        return False
+    except PermissionError:
+        return True
+    return True
+
+
+def sweep_stale_workspaces(root: str) -> None:
+    """
+    Удаляет рабочие каталоги процессов, которые завершились, не успев прибрать за собой (например, по kill -9).
+    """
+    try:
+        names = os.listdir(root)
+    except OSError:
+        return
+    for name in names:
+        parts = name.split("-")
+        if len(parts) != 4 or parts[0] != "vdws" or not parts[2].isdigit() or int(parts[2]) == os.getpid():
+            continue
+        if not _pid_alive(int(parts[2])):
+            logger.info("Удаление брошенного рабочего каталога %s", name)
+            shutil.rmtree(os.path.join(root, name), ignore_errors=True)
+
+
+@contextlib.contextmanager
+def job_workspace(kind: str = "diarize", tmpfs: bool = True) -> Iterator[str]:
+    """
+    Выдаёт отдельный рабочий каталог задачи и удаляет его по выходу из блока (в том числе при ошибке).
+
+    Каталоги — слоты вида vdws-<kind>-<pid>-<номер>: одновременные задачи процесса получают разные слоты,
+    а освободившийся слот переиспользуется следующей задачей. Поэтому модель NeMo в пуле, привязанная
+    к каталогу, загружается один раз на слот, а не на каждую задачу. PID в имени разводит процессы
+    одного хоста; каталоги завершившихся процессов удаляются при первом обращении к корню.
+
+    :param kind: Назначение каталога (часть имени слота).
+    :param tmpfs: Разрешить размещение в tmpfs (для многочасовых записей лучше диск).
+    :return: Путь к пустому каталогу.
+    """
+    root = workspace_root(tmpfs)
+    with _slots_lock:
+        if root not in _swept:
+            _swept.add(root)
+            sweep_stale_workspaces(root)
+        index = 0
+        while (root, kind, index) in _slots:
+            index += 1
+        _slots.add((root, kind, index))
+
+    path = os.path.join(root, f"vdws-{kind}-{os.getpid()}-{index}")
+    shutil.rmtree(path, ignore_errors=True)
+    os.makedirs(path)
+    try:
+        yield path
+    finally:
+        shutil.rmtree(path, ignore_errors=True)
+        with _slots_lock:
+            _slots.discard((root, kind, index))
+
+
+def _cleanup_on_exit() -> None:
+    with _slots_lock:
+        for root, kind, index in list(_slots):
+            shutil.rmtree(os.path.join(root, f"vdws-{kind}-{os.getpid()}-{index}"), ignore_errors=True)
+
+
+atexit.register(_cleanup_on_exit)
@@ -0,0 +1,134 @@
+"""
+Совпадение helpers.get_realigned_ws_mapping_with_punctuation с прежней квадратичной реализацией
+(обход через поиск первого и последнего слова предложения для каждой смены спикера).
+"""
+import random
+import pytest
+from moduls import helpers_diaraize as helpers
+
+
+def legacy_first_word_idx(word_idx, word_list, speaker_list, max_words):
+    is_word_sentence_end = (lambda x: x >= 0 and word_list[x][-1] in helpers.sentence_ending_punctuations)
+    left_idx = word_idx
+    while (
+        left_idx > 0
+        and word_idx - left_idx < max_words
+        and speaker_list[left_idx - 1] == speaker_list[left_idx]
+        and not is_word_sentence_end(left_idx - 1)
+    ): left_idx -= 1
+
+    return left_idx if left_idx == 0 or is_word_sentence_end(left_idx - 1) else -1
+
+
+def legacy_last_word_idx(word_idx, word_list, max_words):
+    is_word_sentence_end = (lambda x: x >= 0 and word_list[x][-1] in helpers.sentence_ending_punctuations)
+    right_idx = word_idx
+    while (
+        right_idx < len(word_list) - 1
+        and right_idx - word_idx < max_words
+        and not is_word_sentence_end(right_idx)
+    ): right_idx += 1
+
+    return (right_idx if right_idx == len(word_list) - 1 or is_word_sentence_end(right_idx) else -1)
+
+
+def legacy_realignment(word_speaker_mapping, max_words_in_sentence=50):
+    is_word_sentence_end = (lambda x: x >= 0 and word_speaker_mapping[x]["word"][-1]
+                            in helpers.sentence_ending_punctuations)
+    wsp_len = len(word_speaker_mapping)
+    words_list = [line_dict["word"] for line_dict in word_speaker_mapping]
+    speaker_list = [line_dict["speaker"] for line_dict in word_speaker_mapping]
+
+    k = 0
+    while k < len(word_speaker_mapping):
+        if k < wsp_len - 1 and speaker_list[k] != speaker_list[k + 1] and not is_word_sentence_end(k):
+            left_idx = legacy_first_word_idx(k, words_list, speaker_list, max_words_in_sentence)
+            right_idx = (legacy_last_word_idx(k, words_list, max_words_in_sentence - k + left_idx - 1)
+                         if left_idx > -1 else -1)
+            if min(left_idx, right_idx) == -1:
+                k += 1
+                continue
+
+            spk_labels = speaker_list[left_idx:right_idx + 1]
+            mod_speaker = max(set(spk_labels), key=spk_labels.count)
+            if spk_labels.count(mod_speaker) < len(spk_labels) // 2:
+                k += 1
+                continue
+
+            speaker_list[left_idx:right_idx + 1] = [mod_speaker] * (right_idx - left_idx + 1)
+            k = right_idx
+        k += 1
+
+    realigned_list = []
+    for line_dict, speaker in zip(word_speaker_mapping, speaker_list):
+        line_dict = line_dict.copy()
+        line_dict["speaker"] = speaker
+        realigned_list.append(line_dict)
+    return realigned_list
+
+
+def synthetic(words: int, rng: random.Random, speakers: int = 3, sentence_words: int = 12, switch: float = 0.1):
+    """Случайный транскрипт: предложения в среднем по sentence_words слов, смена спикера с вероятностью switch."""
+    mapping, speaker = [], 0
+    for i in range(words):
+        if rng.random() < switch:
+            speaker = rng.randrange(speakers)
+        word = "word"
+        if rng.random() < 1 / sentence_words:
+            word += rng.choice(".?!")
+        elif rng.random() < 0.05:
+            word += ","
+        mapping.append({"word": word, "start_time": i * 300, "end_time": i * 300 + 250, "speaker": speaker})
+    return mapping
+
+
+def from_words(text: str, speakers):
+    return [{"word": word, "start_time": i * 300, "end_time": i * 300 + 250, "speaker": speaker}
+            for i, (word, speaker) in enumerate(zip(text.split(), speakers))]
+
+
+def assert_same(mapping, max_words):
+    result = helpers.get_realigned_ws_mapping_with_punctuation(mapping, max_words)
+    assert result == legacy_realignment(mapping, max_words)
+    return result
+
+
+def test_empty():
+    assert assert_same([], 50) == []
+
+
+def test_single_word():
+    assert assert_same(from_words("привет", [1]), 50) == from_words("привет", [1])
+
+
+def test_single_speaker():
+    mapping = from_words("один два три. четыре пять? шесть", [0] * 6)
+    assert assert_same(mapping, 50) == mapping
+
+
+def test_minority_speaker_inside_sentence():
+    mapping = from_words("я думаю что это так. да", [0, 0, 1, 0, 0, 1])
+    assert [line["speaker"] for line in assert_same(mapping, 50)] == [0, 0, 0, 0, 0, 1]
+
+
+def test_input_not_modified():
+    mapping = from_words("я думаю что это так.", [0, 0, 1, 0, 0])
+    assert_same(mapping, 50)
+    assert [line["speaker"] for line in mapping] == [0, 0, 1, 0, 0]
+
+
+@pytest.mark.parametrize("max_words", [0, 1, 2, 3, 4, 5, 6])
+def test_max_words_in_sentence_reached(max_words):
+    # Предложение из 6 слов: при max_words меньше его длины выравнивание не применяется
+    mapping = from_words("а б в г д е. ж", [0, 0, 0, 1, 0, 0, 1])
+    result = assert_same(mapping, max_words)
+    if max_words < 5:
+        assert result == mapping
+
+
+def test_random_transcripts():
+    rng = random.Random(0)
+    for _ in range(3000):
+        mapping = synthetic(rng.randrange(0, 300), rng, speakers=rng.choice((1, 2, 3, 5)),
+                            sentence_words=rng.choice((2, 3, 12, 40, 200)), switch=rng.choice((0.02, 0.1, 0.5)))
+        assert_same(mapping, rng.choice((0, 1, 2, 5, 12, 50)))